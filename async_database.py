@@ -0,0 +1,805 @@
+import asyncio
+import asyncpg
+import logging
+import sys
+import time
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime
+from config import DB_CONFIG
+from database import (
+    PREPARED_STATEMENTS, ENROLLMENT_MESSAGES, BULK_ENROLL_SQL,
+    IMPORT_COLUMNS, IMPORT_STAGE_SQL, IMPORT_VALIDATE_SQL, IMPORT_INSERT_SQL,
+    read_import_records, PAGE_SIZE, USER_PAGE_SORTS, COURSE_PAGE_SORTS, OFFERING_PAGE_SORTS,
+    sort_keyset, page_query, page_result, CHANGE_CHANNEL, parse_changes,
+    STUDENT_COURSES_SQL, STUDENT_COURSE_KEYSET, student_dashboard_query, _REFERENCE_WRITE,
+)
+from query_metrics import QueryMetrics, caller_name
+from reference_cache import ReferenceCache
+
+logger = logging.getLogger(__name__)
+
+_PLUMBING = {'execute_query', 'fetch_all', 'fetch_one', 'fetch_iter', 'execute_prepared'}
+
+# asyncpg takes the whole batch as three arrays instead of an execute_values VALUES list
+BULK_ENROLL_ASYNC_SQL = BULK_ENROLL_SQL.replace(
+    "VALUES %s", "SELECT * FROM unnest($1::integer[], $2::integer[], $3::integer[])"
+)
+
+
+def numbered_params(query):
+    """Rewrite the %s placeholders produced by page_query as asyncpg's $1, $2, ..."""
+    parts = query.split('%s')
+    return parts[0] + ''.join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+
+
+class AsyncDatabase:
+    """asyncio counterpart of Database with the same method names and return shapes.
+
+    Runs on an asyncpg pool, so one event loop can serve many concurrent
+    requests; asyncpg prepares and caches statements per connection itself.
+    Raw queries passed to execute_query/fetch_* use asyncpg's $1, $2 placeholders.
+
+        db = await AsyncDatabase.create()
+        user = await db.get_user('student1')
+        await db.disconnect()
+
+    Database.connection (the calling thread's connection) has no counterpart:
+    every call acquires a pool connection for itself. checkout() and
+    dedicated_connection() hand out an asyncpg connection for raw work
+    instead, and release() has nothing to return.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, config=None, cache_ttl=300, slow_query_threshold=0.5):
+        self.config = config or DB_CONFIG
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.pool = None
+        self.itersize = 2000
+        self.reference_cache = ReferenceCache(ttl=cache_ttl)
+        self.metrics = QueryMetrics(slow_query_threshold)
+        self._sessions = weakref.WeakValueDictionary()   # user_id -> live Session
+        self._prepared_stats = {}   # statement name -> counters, as in Database
+        self._subscribers = {}      # table -> [callback]
+        self._listener = None       # listener task, started by the first subscribe
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        db = cls(*args, **kwargs)
+        await db.connect()
+        return db
+
+    def _connect_config(self):
+        # asyncpg names the database 'database' and wants an integer port
+        config = dict(self.config)
+        if 'dbname' in config:
+            config['database'] = config.pop('dbname')
+        if 'port' in config:
+            config['port'] = int(config['port'])
+        return config
+
+    async def connect(self):
+        try:
+            self.pool = await asyncpg.create_pool(min_size=self.minconn, max_size=self.maxconn,
+                                                  **self._connect_config())
+            version = await self.pool.fetchval("SELECT version();")
+            logger.info("Async connection pool ready (%s-%s connections)", self.minconn, self.maxconn)
+            logger.info("PostgreSQL version: %s", version)
+        except (asyncpg.PostgresError, OSError) as e:
+            logger.error("Error connecting to PostgreSQL: %s", e)
+
+    async def disconnect(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self.pool:
+            await self.pool.close()
+            logger.info("Async connection pool closed")
+
+    def pool_stats(self):
+        if not self.pool:
+            return None
+        return {
+            'minconn': self.pool.get_min_size(),
+            'maxconn': self.pool.get_max_size(),
+            'size': self.pool.get_size(),
+            'idle': self.pool.get_idle_size(),
+            'in_use': self.pool.get_size() - self.pool.get_idle_size(),
+        }
+
+    @asynccontextmanager
+    async def checkout(self):
+        """A pool connection for one task, returned to the pool afterwards"""
+        async with self.pool.acquire() as conn:
+            yield conn
+
+    def release(self):
+        """No-op: nothing is bound to the caller between calls"""
+
+    @asynccontextmanager
+    async def dedicated_connection(self):
+        """A connection outside the pool, for work that spans several calls (e.g. LISTEN)"""
+        conn = await asyncpg.connect(**self._connect_config())
+        try:
+            yield conn
+        finally:
+            await conn.close()
+
+    def query_stats(self):
+        """Per logical query name: calls, errors, rows and p50/p95/p99 latency"""
+        return self.metrics.snapshot()
+
+    def query_report(self):
+        return self.metrics.report()
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the reference-data cache"""
+        return self.reference_cache.stats()
+
+    def register_session(self, session):
+        """Track a logged-in Session so edits to its user can invalidate it"""
+        self._sessions[session['user_id']] = session
+
+    def invalidate_session(self, user_id):
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.invalidate()
+
+    async def subscribe(self, table, callback):
+        """Same change feed as Database.subscribe; callbacks run on the event loop"""
+        self._subscribers.setdefault(table, []).append(callback)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.ensure_future(self._listen())
+
+    def unsubscribe(self, table, callback):
+        callbacks = self._subscribers.get(table, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    async def _listen(self):
+        """Listener task: LISTEN on its own connection, reconnecting with backoff"""
+        delay = 1
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(**self._connect_config())
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda connection: lost.set())
+                await conn.add_listener(CHANGE_CHANNEL, self._on_notify)
+                delay = 1
+                if connected_before:
+                    # Whatever changed while the connection was down was not announced
+                    self._dispatch([{'table': table, 'op': 'reload', 'rows': None} for table in list(self._subscribers)])
+                connected_before = True
+                await lost.wait()
+                logger.warning("Change listener disconnected; reconnecting")
+            except (asyncpg.PostgresError, OSError) as e:
+                logger.warning("Change listener disconnected (%s); retrying in %s s", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._dispatch(parse_changes([payload]))
+
+    def _dispatch(self, changes):
+        for change in changes:
+            table, rows = change['table'], change['rows']
+            # Keep this process's own caches in step with other clients' writes
+            if table == 'department':
+                self.reference_cache.invalidate('department')
+            elif table == 'user':
+                user_ids = [row['user_id'] for row in rows] if rows is not None else list(self._sessions.keys())
+                for user_id in user_ids:
+                    self.invalidate_session(user_id)
+            for callback in list(self._subscribers.get(table, ())):
+                try:
+                    callback(change)
+                except Exception:
+                    logger.exception("Change subscriber for %s failed", table)
+
+    async def _run(self, query, params, fetch=None, name=None, stat=None):
+        # Awaiting coroutines are on the stack, so the caller can be found as in Database
+        name = name or caller_name(sys._getframe(1), globals(), _PLUMBING)
+        started = time.perf_counter()
+        rows = error = None
+        try:
+            async with self.pool.acquire() as conn:
+                if fetch == 'all':
+                    result = [tuple(row) for row in await conn.fetch(query, *(params or ()))]
+                    rows = len(result)
+                elif fetch == 'one':
+                    row = await conn.fetchrow(query, *(params or ()))
+                    result = tuple(row) if row is not None else None
+                    rows = 1 if result else 0
+                else:
+                    # Status string such as 'UPDATE 1'
+                    result = await conn.execute(query, *(params or ()))
+            self._invalidate_reference_data(query)
+            return result
+        except asyncpg.PostgresError as e:
+            error = e
+            logger.error("Error executing query %s: %s", name, e)
+            return None
+        finally:
+            elapsed = time.perf_counter() - started
+            if stat is not None:
+                stat['calls'] += 1
+                stat['errors'] += error is not None
+                stat['total_time'] += elapsed
+                stat['max_time'] = max(stat['max_time'], elapsed)
+            self.metrics.record(name, elapsed, rows, error, query, params)
+
+    def _invalidate_reference_data(self, query):
+        """Drop cached department/semester data after a write to those tables"""
+        match = _REFERENCE_WRITE.match(query)
+        if match:
+            self.reference_cache.invalidate(match.group(1).lower())
+
+    async def execute_query(self, query, params=None, name=None):
+        return await self._run(query, params, name=name)
+
+    async def fetch_all(self, query, params=None, name=None):
+        result = await self._run(query, params, fetch='all', name=name)
+        return result if result is not None else []
+
+    async def fetch_one(self, query, params=None, name=None):
+        return await self._run(query, params, fetch='one', name=name)
+
+    def fetch_iter(self, query, params=None, itersize=None, name=None):
+        """Async generator over a server-side cursor, prefetching itersize rows per round trip"""
+        return self._stream(query, params, itersize, name or caller_name(sys._getframe(1), globals(), _PLUMBING))
+
+    async def _stream(self, query, params, itersize, name):
+        started = time.perf_counter()
+        rows = 0
+        error = None
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    async for row in conn.cursor(query, *(params or ()), prefetch=itersize or self.itersize):
+                        rows += 1
+                        yield tuple(row)
+        except asyncpg.PostgresError as e:
+            error = e
+            logger.error("Error streaming query %s: %s", name, e)
+        finally:
+            self.metrics.record(name, time.perf_counter() - started, rows, error, query, params)
+
+    async def execute_prepared(self, name, params, fetch='one'):
+        """Same statement registry as Database; asyncpg's statement cache does the preparing"""
+        stat = self._prepared_stats.setdefault(
+            name, {'calls': 0, 'errors': 0, 'prepares': None, 'total_time': 0.0, 'max_time': 0.0})
+        result = await self._run(PREPARED_STATEMENTS[name][1], params, fetch=fetch, name=name, stat=stat)
+        return [] if result is None and fetch == 'all' else result
+
+    def prepared_statement_stats(self):
+        """Same shape as Database.prepared_statement_stats; prepares is None because
+        asyncpg prepares on each connection behind our back"""
+        stats = {name: dict(stat) for name, stat in self._prepared_stats.items()}
+        for stat in stats.values():
+            stat['avg_time'] = stat['total_time'] / stat['calls'] if stat['calls'] else 0.0
+        return stats
+
+    def hash_password(self, password):
+        # For simplicity, just return the password as is (plain text)
+        return password
+
+    def verify_password(self, stored_password, provided_password):
+        # For simplicity, just compare plain text passwords
+        return stored_password == provided_password
+
+    # User operations
+    async def get_user(self, username):
+        return await self.execute_prepared('get_user', (username,))
+
+    async def get_user_by_id(self, user_id):
+        return await self.fetch_one("SELECT * FROM \"user\" WHERE user_id = $1", (user_id,))
+
+    async def get_all_users(self, stream=False):
+        query = "SELECT user_id, username, role, created_at FROM \"user\" ORDER BY user_id"
+        if stream:
+            return self.fetch_iter(query)
+        return await self.fetch_all(query)
+
+    async def get_users_page(self, after=None, limit=PAGE_SIZE, order_by='user_id', descending=False,
+                             role=None, search=None, ids=None):
+        keyset = sort_keyset(USER_PAGE_SORTS, order_by, descending, ('u.user_id', 0))
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append("u.user_id = ANY(%s)")
+            params.append(list(ids))
+        if role:
+            conditions.append("u.role = %s")
+            params.append(role.lower())
+        if search:
+            conditions.append("u.username ILIKE %s")
+            params.append(f"%{search}%")
+        query, params = page_query(
+            "SELECT u.user_id, u.username, u.role, u.created_at FROM \"user\" u",
+            conditions, params, keyset, after, limit
+        )
+        return page_result(await self.fetch_all(numbered_params(query), params), keyset, limit)
+
+    async def create_user(self, username, password, role, first_name, last_name):
+        if await self.check_username_exists(username):
+            return False
+        query = """
+        INSERT INTO "user" (username, password, role, first_name, last_name)
+        VALUES ($1, $2, $3, $4, $5)
+        """
+        return await self.execute_query(query, (username, password, role.lower(), first_name, last_name)) is not None
+
+    async def update_user(self, user_id, username, password=None, role=None, first_name=None, last_name=None):
+        if await self.check_username_exists(username, user_id):
+            return False
+        update_fields = []
+        params = []
+        for column, value in (('username', username), ('password', password),
+                              ('role', role.lower() if role else role)):
+            if value:
+                params.append(value)
+                update_fields.append(f"{column} = ${len(params)}")
+        for column, value in (('first_name', first_name), ('last_name', last_name)):
+            if value is not None:
+                params.append(value)
+                update_fields.append(f"{column} = ${len(params)}")
+        if not update_fields:
+            return False
+        params.append(user_id)
+        query = f"UPDATE \"user\" SET {', '.join(update_fields)} WHERE user_id = ${len(params)}"
+        if await self.execute_query(query, tuple(params)) is None:
+            return False
+        self.invalidate_session(user_id)
+        return True
+
+    async def delete_user(self, user_id):
+        if await self.execute_query('DELETE FROM "user" WHERE user_id = $1', (user_id,)) is None:
+            return False
+        self.invalidate_session(user_id)
+        return True
+
+    async def check_username_exists(self, username, exclude_id=None):
+        query = "SELECT user_id FROM \"user\" WHERE username = $1"
+        params = [username]
+        if exclude_id:
+            query += " AND user_id != $2"
+            params.append(exclude_id)
+        return bool(await self.fetch_one(query, tuple(params)))
+
+    async def authenticate_user(self, username, password):
+        user = await self.get_user(username)
+        if user and self.verify_password(user[2], password):
+            return user
+        return None
+
+    async def update_user_password(self, user_id, new_password):
+        return await self.execute_query("UPDATE \"user\" SET password = $1 WHERE user_id = $2", (new_password, user_id))
+
+    # Student operations
+    async def get_student(self, user_id):
+        return await self.execute_prepared('get_student', (user_id,))
+
+    async def create_student(self, user_id, student_number, first_name, last_name, email, department_id, level):
+        query = """
+        INSERT INTO student (user_id, student_number, first_name, last_name, email, department_id, level)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        RETURNING student_id
+        """
+        return await self.fetch_one(query, (user_id, student_number, first_name, last_name, email, department_id, level))
+
+    # Teacher operations
+    async def get_teacher(self, user_id):
+        return await self.execute_prepared('get_teacher', (user_id,))
+
+    async def create_teacher(self, user_id, first_name, last_name, email, department_id):
+        query = """
+        INSERT INTO teacher (user_id, first_name, last_name, email, department_id)
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING teacher_id
+        """
+        return await self.fetch_one(query, (user_id, first_name, last_name, email, department_id))
+
+    # Bulk import
+    async def import_users(self, source):
+        """See Database.import_users; staging uses COPY via copy_records_to_table"""
+        records = []
+        for line_no, record in read_import_records(source):
+            values = [(record.get(column) or '').strip() or None for column in IMPORT_COLUMNS]
+            if values[1]:
+                values[1] = self.hash_password(values[1])
+            records.append([line_no] + values)
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(IMPORT_STAGE_SQL)
+                    await conn.copy_records_to_table('user_import', records=records,
+                                                     columns=['line_no', *IMPORT_COLUMNS])
+                    await conn.execute(IMPORT_VALIDATE_SQL)
+                    await conn.execute(IMPORT_INSERT_SQL)
+                    imported = await conn.fetchval("SELECT count(*) FROM user_import WHERE user_id IS NOT NULL")
+                    conflicts = await conn.fetch(
+                        "SELECT line_no, username, conflict FROM user_import WHERE conflict IS NOT NULL ORDER BY line_no")
+            return {'imported': imported, 'conflicts': [tuple(row) for row in conflicts], 'error': None}
+        except asyncpg.PostgresError as e:
+            logger.error("Error importing users: %s", e)
+            return {'imported': 0, 'conflicts': [], 'error': str(e)}
+
+    # Course operations
+    async def get_all_courses(self, stream=False):
+        query = """
+        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects,
+               c.level, c.type, d.department_name
+        FROM course c
+        JOIN department d ON c.department_id = d.department_id
+        ORDER BY c.course_code
+        """
+        if stream:
+            return self.fetch_iter(query)
+        return await self.fetch_all(query)
+
+    async def get_courses_page(self, after=None, limit=PAGE_SIZE, order_by='course_code', descending=False,
+                               department_id=None, level=None, search=None, ids=None):
+        keyset = sort_keyset(COURSE_PAGE_SORTS, order_by, descending, ('c.course_id', 0))
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append("c.course_id = ANY(%s)")
+            params.append(list(ids))
+        if department_id:
+            conditions.append("c.department_id = %s")
+            params.append(department_id)
+        if level:
+            conditions.append("c.level = %s")
+            params.append(level)
+        if search:
+            conditions.append("(c.course_code ILIKE %s OR c.course_name ILIKE %s)")
+            params.extend([f"%{search}%"] * 2)
+        query, params = page_query("""
+        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects,
+               c.level, c.type, d.department_name
+        FROM course c
+        JOIN department d ON c.department_id = d.department_id
+        """, conditions, params, keyset, after, limit)
+        return page_result(await self.fetch_all(numbered_params(query), params), keyset, limit)
+
+    async def get_course_by_id(self, course_id):
+        return await self.execute_prepared('get_course_by_id', (course_id,))
+
+    async def get_course_by_code(self, course_code):
+        return await self.execute_prepared('get_course_by_code', (course_code,))
+
+    async def check_course_code_exists(self, course_code, exclude_id=None):
+        query = "SELECT course_id FROM course WHERE course_code = $1"
+        params = [course_code]
+        if exclude_id:
+            query += " AND course_id != $2"
+            params.append(exclude_id)
+        return bool(await self.fetch_one(query, tuple(params)))
+
+    async def update_course(self, course_id, course_data):
+        if await self.check_course_code_exists(course_data['course_code'], course_id):
+            return False, "Course code already exists"
+        query = """
+        UPDATE course
+        SET course_name = $1, course_code = $2, credits = $3,
+            ects = $4, level = $5, type = $6, department_id = $7
+        WHERE course_id = $8
+        """
+        result = await self.execute_query(query, (
+            course_data['course_name'],
+            course_data['course_code'],
+            course_data['credits'],
+            course_data['ects'],
+            course_data['level'],
+            course_data['type'],
+            course_data['department_id'],
+            course_id
+        ))
+        if result is None:
+            return False, "Failed to update course"
+        return True, "Course updated successfully"
+
+    async def create_course(self, course_name, course_code, credits, ects, level, type, department_id, creator_teacher_id=None):
+        if creator_teacher_id is not None:
+            teacher_dept = await self.fetch_one("SELECT department_id FROM teacher WHERE teacher_id = $1", (creator_teacher_id,))
+            if not teacher_dept or teacher_dept[0] != department_id:
+                raise Exception("You can only add courses to your own department.")
+        query = """
+        INSERT INTO course (course_name, course_code, credits, ects, level, type, department_id)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        RETURNING course_id
+        """
+        return await self.fetch_one(query, (course_name, course_code, credits, ects, level, type, department_id))
+
+    async def delete_course(self, course_id):
+        return await self.execute_query("DELETE FROM course WHERE course_id = $1", (course_id,)) is not None
+
+    # Department operations
+    async def get_all_departments(self):
+        departments = await self.reference_cache.get_async(
+            ('department', 'all'), lambda: self._run("SELECT * FROM department", None, fetch='all'))
+        return list(departments) if departments is not None else []
+
+    async def get_department_name(self, department_id):
+        if not isinstance(department_id, (int, str)) or not str(department_id).isdigit():
+            return "N/A"
+        result = await self.fetch_one("SELECT department_name FROM department WHERE department_id = $1", (int(department_id),))
+        return result[0] if result else "N/A"
+
+    async def create_department(self, department_name):
+        query = "INSERT INTO department (department_name) VALUES ($1) RETURNING department_id"
+        return await self.fetch_one(query, (department_name,))
+
+    async def update_department(self, department_id, department_name):
+        query = "UPDATE department SET department_name = $1 WHERE department_id = $2"
+        return await self.execute_query(query, (department_name, department_id))
+
+    async def delete_department(self, department_id):
+        query = """
+        SELECT EXISTS (SELECT 1 FROM student WHERE department_id = $1)
+            OR EXISTS (SELECT 1 FROM teacher WHERE department_id = $1)
+            OR EXISTS (SELECT 1 FROM course WHERE department_id = $1)
+        """
+        referenced = await self.fetch_one(query, (department_id,))
+        if referenced is None:
+            return False, "Failed to delete department"
+        if referenced[0]:
+            return False, "Cannot delete department: it is still referenced by students, teachers, or courses."
+        if await self.execute_query("DELETE FROM department WHERE department_id = $1", (department_id,)) is None:
+            return False, "Failed to delete department"
+        return True, "Department deleted successfully!"
+
+    # Semester operations
+    async def get_all_semesters(self):
+        query = "SELECT * FROM semester ORDER BY start_date DESC"
+        semesters = await self.reference_cache.get_async(('semester', 'all'), lambda: self._run(query, None, fetch='all'))
+        return list(semesters) if semesters is not None else []
+
+    async def get_current_semester(self):
+        current_date = datetime.now().date()
+        semester = await self.reference_cache.get_async(
+            ('semester', 'current', current_date),
+            lambda: self._current_semester_or_empty(current_date)
+        )
+        return semester or None
+
+    async def _current_semester_or_empty(self, current_date):
+        query = "SELECT * FROM semester WHERE start_date <= $1 AND end_date >= $1"
+        rows = await self._run(query, (current_date,), fetch='all')
+        if rows is None:
+            return None
+        return rows[0] if rows else ()
+
+    # Enrollment operations
+    async def is_student_enrolled(self, student_id, course_id):
+        return bool(await self.execute_prepared('is_student_enrolled', (student_id, course_id)))
+
+    async def get_student_courses(self, student_id, stream=False):
+        query = """
+        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects,
+               c.level, c.type, d.department_name, s.semester_name, s.year
+        FROM enrolls_in e
+        JOIN course_offering co ON co.offering_id = e.offering_id
+        JOIN course c ON c.course_id = co.course_id
+        JOIN department d ON c.department_id = d.department_id
+        JOIN semester s ON co.semester_id = s.semester_id
+        WHERE e.student_id = $1
+        ORDER BY s.year DESC, s.semester_name
+        """
+        if stream:
+            return self.fetch_iter(query, (student_id,))
+        return await self.fetch_all(query, (student_id,))
+
+    async def get_student_courses_page(self, student_id, after=None, limit=PAGE_SIZE, semester_id=None):
+        conditions, params = ["e.student_id = %s"], [student_id]
+        if semester_id:
+            conditions.append("s.semester_id = %s")
+            params.append(semester_id)
+        query, params = page_query(STUDENT_COURSES_SQL, conditions, params, STUDENT_COURSE_KEYSET, after, limit)
+        return page_result(await self.fetch_all(numbered_params(query), params), STUDENT_COURSE_KEYSET, limit)
+
+    async def get_student_dashboard(self, student_id, limit=PAGE_SIZE):
+        query, params = student_dashboard_query(student_id, datetime.now().date(), limit)
+        rows = await self.fetch_all(numbered_params(query), params)
+        available = [row[1:11] for row in rows if row[0] == 'available']
+        enrolled = [row[1:9] + row[11:] for row in rows if row[0] == 'enrolled']
+        return available, page_result(enrolled, STUDENT_COURSE_KEYSET, limit)
+
+    async def try_enroll(self, student_id, course_id):
+        result = await self.fetch_one("SELECT reason, student_level FROM enroll_student($1, $2)", (student_id, course_id))
+        if not result:
+            return 'error', None
+        return result
+
+    async def enroll_student(self, student_id, course_id):
+        reason, student_level = await self.try_enroll(student_id, course_id)
+        return reason == 'enrolled', ENROLLMENT_MESSAGES[reason].format(level=student_level)
+
+    async def drop_course(self, student_id, course_id):
+        result = await self.fetch_one("SELECT dropped, promoted FROM drop_enrollment($1, $2)", (student_id, course_id))
+        return bool(result and result[0])
+
+    async def join_waitlist(self, student_id, course_id):
+        result = await self.fetch_one("SELECT reason, student_level, queue_position FROM join_waitlist($1, $2)",
+                                      (student_id, course_id))
+        if not result:
+            return 'error', None, None
+        return result
+
+    async def leave_waitlist(self, student_id, course_id):
+        query = """
+        DELETE FROM waitlist w
+        USING course_offering co
+        WHERE co.offering_id = w.offering_id AND w.student_id = $1 AND co.course_id = $2
+        """
+        status = await self.execute_query(query, (student_id, course_id))
+        return bool(status) and status != 'DELETE 0'
+
+    async def get_waitlist_position(self, student_id, course_id):
+        row = await self.execute_prepared('get_waitlist_position', (student_id, course_id))
+        return row[0] if row else None
+
+    async def get_waitlist(self, student_id):
+        query = """
+        SELECT c.course_id, c.course_name, c.course_code, s.semester_name, s.year,
+               (SELECT count(*) FROM waitlist q
+                WHERE q.offering_id = w.offering_id AND q.waitlist_id <= w.waitlist_id) AS queue_position,
+               w.offering_id
+        FROM waitlist w
+        JOIN course_offering co ON co.offering_id = w.offering_id
+        JOIN course c ON c.course_id = co.course_id
+        JOIN semester s ON s.semester_id = co.semester_id
+        WHERE w.student_id = $1 AND s.end_date >= CURRENT_DATE
+        ORDER BY w.waitlist_id
+        """
+        return await self.fetch_all(query, (student_id,))
+
+    async def enroll_students_bulk(self, pairs, page_size=5000):
+        """See Database.enroll_students_bulk; each page of pairs is one statement, all in one transaction"""
+        pairs = list(pairs)
+        if not pairs:
+            return []
+        started = time.perf_counter()
+        results = []
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    for start in range(0, len(pairs), page_size):
+                        page = pairs[start:start + page_size]
+                        results += await conn.fetch(BULK_ENROLL_ASYNC_SQL, list(range(start, start + len(page))),
+                                                    [p[0] for p in page], [p[1] for p in page])
+            self.metrics.record('enroll_students_bulk', time.perf_counter() - started, len(results))
+        except asyncpg.PostgresError as e:
+            logger.error("Error enrolling students in bulk: %s", e)
+            self.metrics.record('enroll_students_bulk', time.perf_counter() - started, error=e)
+            return [(student_id, course_id, 'error') for student_id, course_id in pairs]
+        reasons = {row[0]: row[1] for row in results}
+        return [(student_id, course_id, reasons[i]) for i, (student_id, course_id) in enumerate(pairs)]
+
+    # Course offering operations
+    async def get_course_offerings(self, semester_id=None, stream=False):
+        query = """
+        SELECT co.offering_id, c.course_name, c.course_code, s.semester_name, s.year, d.department_name, u.first_name || ' ' || u.last_name as instructor_name
+        FROM course_offering co
+        JOIN course c ON co.course_id = c.course_id
+        JOIN semester s ON co.semester_id = s.semester_id
+        JOIN department d ON c.department_id = d.department_id
+        JOIN teacher t ON co.instructor_id = t.teacher_id
+        JOIN "user" u ON t.user_id = u.user_id
+        """
+        params = ()
+        if semester_id:
+            query += " WHERE co.semester_id = $1"
+            params = (semester_id,)
+        if stream:
+            return self.fetch_iter(query, params)
+        return await self.fetch_all(query, params)
+
+    async def get_course_offering_by_id(self, offering_id):
+        return await self.execute_prepared('get_course_offering_by_id', (offering_id,))
+
+    async def get_course_offerings_page(self, after=None, limit=PAGE_SIZE, order_by='offering_id', descending=False,
+                                        semester_id=None, department_id=None, instructor_id=None, ids=None):
+        keyset = sort_keyset(OFFERING_PAGE_SORTS, order_by, descending, ('co.offering_id', 0))
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append("co.offering_id = ANY(%s)")
+            params.append(list(ids))
+        for column, value in (('co.semester_id', semester_id), ('c.department_id', department_id),
+                              ('co.instructor_id', instructor_id)):
+            if value:
+                conditions.append(f"{column} = %s")
+                params.append(value)
+        query, params = page_query("""
+        SELECT co.offering_id, c.course_name, c.course_code, s.semester_name, s.year, d.department_name, u.first_name || ' ' || u.last_name as instructor_name
+        FROM course_offering co
+        JOIN course c ON co.course_id = c.course_id
+        JOIN semester s ON co.semester_id = s.semester_id
+        JOIN department d ON c.department_id = d.department_id
+        JOIN teacher t ON co.instructor_id = t.teacher_id
+        JOIN "user" u ON t.user_id = u.user_id
+        """, conditions, params, keyset, after, limit)
+        return page_result(await self.fetch_all(numbered_params(query), params), keyset, limit)
+
+    async def get_teaching_courses(self, teacher_id):
+        query = """
+        SELECT co.offering_id, c.course_name, c.course_code,
+               s.semester_name, s.year, d.department_name, co.seats_taken, co.capacity
+        FROM course_offering co
+        JOIN course c ON co.course_id = c.course_id
+        JOIN semester s ON co.semester_id = s.semester_id
+        JOIN department d ON c.department_id = d.department_id
+        WHERE co.instructor_id = $1
+        ORDER BY s.year DESC, s.semester_name
+        """
+        return await self.fetch_all(query, (teacher_id,))
+
+    async def create_course_offering(self, course_id, semester_id, instructor_id, capacity=None):
+        teacher_dept = await self.fetch_one("SELECT department_id FROM teacher WHERE teacher_id = $1", (instructor_id,))
+        course_dept = await self.fetch_one("SELECT department_id FROM course WHERE course_id = $1", (course_id,))
+        if not teacher_dept or not course_dept or teacher_dept[0] != course_dept[0]:
+            raise Exception("You can only offer courses from your own department.")
+        exists = await self.fetch_one("SELECT 1 FROM course_offering WHERE course_id = $1 AND semester_id = $2", (course_id, semester_id))
+        if exists:
+            raise Exception("This course is already offered by another teacher in this semester.")
+        query = """
+        INSERT INTO course_offering (course_id, semester_id, instructor_id, capacity)
+        VALUES ($1, $2, $3, $4)
+        RETURNING offering_id
+        """
+        return await self.fetch_one(query, (course_id, semester_id, instructor_id, capacity))
+
+    async def update_course_offering(self, offering_id, course_id, semester_id, instructor_id):
+        query = """
+        UPDATE course_offering
+        SET course_id = $1, semester_id = $2, instructor_id = $3
+        WHERE offering_id = $4
+        """
+        return await self.execute_query(query, (course_id, semester_id, instructor_id, offering_id))
+
+    async def set_offering_capacity(self, offering_id, capacity):
+        query = """
+        UPDATE course_offering SET capacity = $1
+        WHERE offering_id = $2 AND ($1::integer IS NULL OR seats_taken <= $1)
+        RETURNING offering_id
+        """
+        if await self.fetch_one(query, (capacity, offering_id)):
+            return True, "Capacity updated"
+        offering = await self.fetch_one("SELECT seats_taken FROM course_offering WHERE offering_id = $1", (offering_id,))
+        if offering is None:
+            return False, "Failed to update capacity"
+        return False, f"Capacity cannot be below the {offering[0]} seats already taken"
+
+    async def reconcile_seats(self):
+        return await self.fetch_all("SELECT offering_id, recorded, actual FROM reconcile_seats()")
+
+    async def delete_course_offering(self, offering_id):
+        return await self.execute_query("DELETE FROM course_offering WHERE offering_id = $1", (offering_id,)) is not None
+
+    async def get_all_offered_courses_for_student(self, student_id):
+        student = await self.fetch_one("SELECT level, department_id FROM student WHERE student_id = $1", (student_id,))
+        if not student:
+            return []
+        student_level, student_dept = student
+        semester = await self.get_current_semester()
+        if not semester:
+            return []
+        query = """
+        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects, c.level, c.type, d.department_name, u.first_name || ' ' || u.last_name as instructor_name,
+               co.capacity - co.seats_taken AS seats_left
+        FROM course_offering co
+        JOIN course c ON co.course_id = c.course_id
+        JOIN department d ON c.department_id = d.department_id
+        JOIN teacher t ON co.instructor_id = t.teacher_id
+        JOIN "user" u ON t.user_id = u.user_id
+        WHERE co.semester_id = $1 AND c.level = $2
+          AND (c.department_id = $3 OR c.type IN ('Elective', 'Technical Elective'))
+        """
+        return await self.fetch_all(query, (semester[0], student_level, student_dept))
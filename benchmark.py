@@ -0,0 +1,387 @@
+"""Time every public Database method against a seeded synthetic university.
+
+Usage:
+    python benchmark.py                              seed the benchmark database and run
+    python benchmark.py --reuse                      run against the data seeded last time
+    python benchmark.py --students 10000 --output results.json
+    python benchmark.py --baseline results.json      fail if a method got slower
+
+The benchmark uses its own database (--dbname, default course_management_bench)
+on the server from config.py; it is created if missing, built from
+database_setup.sql plus the migrations and then emptied and re-seeded by
+datagen.py, so it must never be the application database. Each method is called a number of
+times after a warm-up call; results (p50/p95/mean/min in milliseconds, plus
+the number of failed queries) are written as JSON so runs on different commits
+can be compared. With --baseline, a method whose p50 grew by more than
+--threshold (and by at least --min-delta-ms) is reported as a regression and
+the exit status is 1.
+"""
+import argparse
+import inspect
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+import psycopg2
+from config import DB_CONFIG
+from database import Database
+from datagen import DEFAULT_WORKERS, Scale, create_database, database_config, generate
+import migrate
+
+# Public methods that are plumbing or lifecycle, not application queries
+NOT_BENCHMARKED = {
+    'connection', 'connect', 'disconnect', 'checkout', 'release', 'pool_stats', 'dedicated_connection',
+    'cache_stats', 'register_session', 'invalidate_session', 'subscribe', 'unsubscribe',
+    'query_stats', 'query_report', 'execute_query', 'fetch_all', 'fetch_one', 'fetch_iter',
+    'execute_prepared', 'prepared_statement_stats',
+}
+
+
+class Context:
+    """Sample keys drawn from the seeded data, so calls hit real rows"""
+
+    def __init__(self, db, seed=42):
+        self.rng = random.Random(seed)
+        self.counter = 0
+        self.run_id = f"{os.getpid()}_{int(time.time())}"
+        sample = db.fetch_all
+        self.students = sample("SELECT student_id, user_id FROM student ORDER BY random() LIMIT 500")
+        self.teachers = sample("SELECT teacher_id, user_id, department_id FROM teacher ORDER BY random() LIMIT 200")
+        self.users = sample('SELECT user_id, username FROM "user" ORDER BY random() LIMIT 500')
+        self.courses = sample("SELECT course_id, course_code, department_id FROM course ORDER BY random() LIMIT 500")
+        self.offerings = sample("SELECT offering_id FROM course_offering ORDER BY random() LIMIT 500")
+        self.departments = [row[0] for row in sample("SELECT department_id FROM department ORDER BY department_id")]
+        self.department_name = db.get_department_name(self.departments[0])
+        self.created_departments = []
+        # Users without a student/teacher row yet, for create_student/create_teacher
+        spare_users = """
+            INSERT INTO "user" (username, password, role, first_name, last_name)
+            SELECT %s || g, 'pw', %s, 'Bench', 'User' FROM generate_series(1, 100) g
+            RETURNING user_id
+        """
+        self.spare_students = [row[0] for row in sample(spare_users, (f"bs{self.run_id}_", 'student'))]
+        self.spare_teachers = [row[0] for row in sample(spare_users, (f"bt{self.run_id}_", 'teacher'))]
+        self.deletable_users = [row[0] for row in sample(spare_users, (f"bd{self.run_id}_", 'student'))]
+        current = db.get_current_semester()
+        self.current_semester = current[0] if current else None
+        # Offerable slots: a semester in which the course is not offered yet
+        self.free_slots = sample("""
+            SELECT c.course_id, s.semester_id, t.teacher_id
+            FROM course c
+            JOIN semester s ON s.semester_name = CASE WHEN mod(c.course_id, 2) = 1 THEN 'Fall' ELSE 'Spring' END
+            JOIN LATERAL (SELECT teacher_id FROM teacher WHERE department_id = c.department_id LIMIT 1) t ON true
+            ORDER BY random() LIMIT 500
+        """)
+        # Enrollments that enroll_student accepts: current offerings the student may take
+        self.enrollable = sample("""
+            SELECT st.student_id, c.course_id
+            FROM student st
+            JOIN course c ON c.level = st.level
+                AND (c.department_id = st.department_id OR c.type IN ('Elective', 'Technical Elective'))
+            JOIN course_offering co ON co.course_id = c.course_id
+            JOIN semester s ON s.semester_id = co.semester_id AND CURRENT_DATE BETWEEN s.start_date AND s.end_date
+            WHERE NOT EXISTS (
+                SELECT 1 FROM enrolls_in e WHERE e.student_id = st.student_id AND e.course_id = c.course_id
+            )
+            LIMIT 20000
+        """)
+        self.enrolled = []
+
+    def pick(self, rows):
+        return self.rng.choice(rows)
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f"{prefix}{self.run_id}_{self.counter}"
+
+    def take_enrollable(self, count=1):
+        taken, self.enrollable = self.enrollable[:count], self.enrollable[count:]
+        return taken
+
+    def import_csv(self, rows=100):
+        lines = [','.join(('username', 'password', 'role', 'first_name', 'last_name',
+                           'email', 'department', 'student_number', 'level'))]
+        for _ in range(rows):
+            name = self.unique('imp')
+            lines.append(f"{name},pw,student,Imported,User,{name}@example.edu,"
+                         f"{self.department_name},{name},Bachelor")
+        return io.StringIO('\n'.join(lines) + '\n')
+
+
+def consume(result):
+    """Drain streamed results so the whole query is timed"""
+    if inspect.isgenerator(result):
+        for _ in result:
+            pass
+
+
+def benchmark_cases(ctx):
+    """method name -> (call(db), iterations)"""
+    created_offerings = []
+    created_courses = []
+
+    def create_offering(db):
+        if ctx.free_slots:
+            course_id, semester_id, teacher_id = ctx.free_slots.pop()
+            created_offerings.append((db.create_course_offering(course_id, semester_id, teacher_id)[0],
+                                      course_id, semester_id, teacher_id))
+
+    def update_offering(db):
+        if created_offerings:
+            db.update_course_offering(*ctx.pick(created_offerings))
+
+    def delete_offering(db):
+        if created_offerings:
+            db.delete_course_offering(created_offerings.pop()[0])
+
+    def create_course(db):
+        created_courses.append(db.create_course(
+            'Bench Course', ctx.unique('B'), 3, 5, 'Bachelor', 'Elective', ctx.departments[0])[0])
+
+    def delete_course(db):
+        if created_courses:
+            db.delete_course(created_courses.pop())
+
+    def delete_user(db):
+        if ctx.deletable_users:
+            db.delete_user(ctx.deletable_users.pop())
+
+    def create_department(db):
+        ctx.created_departments.append(db.create_department(ctx.unique('Bench Department '))[0])
+
+    def delete_department(db):
+        if ctx.created_departments:
+            db.delete_department(ctx.created_departments.pop())
+
+    def enroll(method):
+        def call(db):
+            for student_id, course_id in ctx.take_enrollable():
+                getattr(db, method)(student_id, course_id)
+                ctx.enrolled.append((student_id, course_id))
+        return call
+
+    def drop_course(db):
+        if ctx.enrolled:
+            db.drop_course(*ctx.enrolled.pop())
+
+    def update_user(db):
+        user_id, username = ctx.pick(ctx.users)
+        db.update_user(user_id, username)
+
+    def update_course(db):
+        # Rewrite a course with its current values
+        course_id, _, department_id = ctx.pick(ctx.courses)
+        course = db.get_course_by_id(course_id)
+        db.update_course(course_id, {'course_name': course[1], 'course_code': course[2], 'credits': course[3],
+                                     'ects': course[4], 'level': course[5], 'type': course[6],
+                                     'department_id': department_id})
+
+    return {
+        'hash_password': (lambda db: db.hash_password('password'), 200),
+        'verify_password': (lambda db: db.verify_password('password', 'password'), 200),
+        'get_user': (lambda db: db.get_user(ctx.pick(ctx.users)[1]), 200),
+        'get_user_by_id': (lambda db: db.get_user_by_id(ctx.pick(ctx.users)[0]), 200),
+        'get_all_users': (lambda db: consume(db.get_all_users(stream=True)), 3),
+        'get_users_page': (lambda db: db.get_users_page(order_by='username', search=str(ctx.rng.randint(1, 999))), 50),
+        'create_user': (lambda db: db.create_user(ctx.unique('bench'), 'pw', 'student', 'Bench', 'User'), 50),
+        'update_user': (update_user, 50),
+        'delete_user': (delete_user, 50),
+        'check_username_exists': (lambda db: db.check_username_exists(ctx.pick(ctx.users)[1]), 200),
+        'authenticate_user': (lambda db: db.authenticate_user('student1', 'password'), 200),
+        'get_student': (lambda db: db.get_student(ctx.pick(ctx.students)[1]), 200),
+        'create_student': (lambda db: db.create_student(
+            ctx.spare_students.pop(), ctx.unique('N'), 'Bench', 'Student', ctx.unique('bs') + '@example.edu',
+            ctx.departments[0], 'Bachelor'), 50),
+        'get_teacher': (lambda db: db.get_teacher(ctx.pick(ctx.teachers)[1]), 200),
+        'create_teacher': (lambda db: db.create_teacher(
+            ctx.spare_teachers.pop(), 'Bench', 'Teacher', ctx.unique('bt') + '@example.edu', ctx.departments[0]), 50),
+        'import_users': (lambda db: db.import_users(ctx.import_csv()), 10),
+        'get_all_courses': (lambda db: consume(db.get_all_courses(stream=True)), 10),
+        'get_courses_page': (lambda db: db.get_courses_page(order_by='course_name'), 50),
+        'get_course_by_id': (lambda db: db.get_course_by_id(ctx.pick(ctx.courses)[0]), 200),
+        'get_course_by_code': (lambda db: db.get_course_by_code(ctx.pick(ctx.courses)[1]), 200),
+        'get_all_departments': (lambda db: db.get_all_departments(), 200),
+        'get_department_name': (lambda db: db.get_department_name(ctx.pick(ctx.departments)), 200),
+        'create_department': (create_department, 50),
+        'update_department': (lambda db: db.update_department(ctx.departments[-1], ctx.unique('Renamed ')), 50),
+        'delete_department': (delete_department, 50),
+        'get_all_semesters': (lambda db: db.get_all_semesters(), 200),
+        'get_current_semester': (lambda db: db.get_current_semester(), 200),
+        'is_student_enrolled': (lambda db: db.is_student_enrolled(ctx.pick(ctx.students)[0], ctx.pick(ctx.courses)[0]), 200),
+        'get_student_courses': (lambda db: db.get_student_courses(ctx.pick(ctx.students)[0]), 100),
+        'get_student_courses_page': (lambda db: db.get_student_courses_page(ctx.pick(ctx.students)[0]), 100),
+        'get_student_dashboard': (lambda db: db.get_student_dashboard(ctx.pick(ctx.students)[0]), 100),
+        'try_enroll': (enroll('try_enroll'), 100),
+        'enroll_student': (enroll('enroll_student'), 100),
+        'enroll_students_bulk': (lambda db: db.enroll_students_bulk(ctx.take_enrollable(100)), 20),
+        'drop_course': (drop_course, 100),
+        'join_waitlist': (enroll('join_waitlist'), 100),
+        'leave_waitlist': (lambda db: db.leave_waitlist(ctx.pick(ctx.students)[0], ctx.pick(ctx.courses)[0]), 50),
+        'get_waitlist_position': (
+            lambda db: db.get_waitlist_position(ctx.pick(ctx.students)[0], ctx.pick(ctx.courses)[0]), 200),
+        'get_waitlist': (lambda db: db.get_waitlist(ctx.pick(ctx.students)[0]), 100),
+        'get_course_offerings': (lambda db: consume(db.get_course_offerings(stream=True)), 3),
+        'get_course_offering_by_id': (lambda db: db.get_course_offering_by_id(ctx.pick(ctx.offerings)[0]), 200),
+        'get_course_offerings_page': (lambda db: db.get_course_offerings_page(semester_id=ctx.current_semester), 50),
+        'get_teaching_courses': (lambda db: db.get_teaching_courses(ctx.pick(ctx.teachers)[0]), 100),
+        'create_course_offering': (create_offering, 50),
+        'update_course_offering': (update_offering, 50),
+        'delete_course_offering': (delete_offering, 50),
+        'set_offering_capacity': (lambda db: db.set_offering_capacity(ctx.pick(ctx.offerings)[0], None), 50),
+        'reconcile_seats': (lambda db: db.reconcile_seats(), 3),
+        'update_user_password': (lambda db: db.update_user_password(ctx.pick(ctx.users)[0], 'password'), 50),
+        'check_course_code_exists': (lambda db: db.check_course_code_exists(ctx.pick(ctx.courses)[1]), 200),
+        'update_course': (update_course, 50),
+        'create_course': (create_course, 50),
+        'delete_course': (delete_course, 50),
+        'get_all_offered_courses_for_student': (
+            lambda db: db.get_all_offered_courses_for_student(ctx.pick(ctx.students)[0]), 100),
+    }
+
+
+def time_case(db, call, iterations):
+    call(db)  # warm up caches and prepared statements
+    db.metrics.reset()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        call(db)
+        timings.append((time.perf_counter() - started) * 1000)
+    errors = sum(stats['errors'] for stats in db.metrics.snapshot().values())
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'p50_ms': statistics.median(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'mean_ms': statistics.fmean(timings),
+        'min_ms': timings[0],
+        'errors': errors,
+    }
+
+
+def run(db, ctx, only=None):
+    cases = benchmark_cases(ctx)
+    public = {name for name, _ in inspect.getmembers(Database) if not name.startswith('_')}
+    missing = sorted(public - set(cases) - NOT_BENCHMARKED)
+    if missing:
+        print(f"Warning: no benchmark for {', '.join(missing)}")
+    results = {}
+    for name, (call, iterations) in cases.items():
+        if only and name not in only:
+            continue
+        try:
+            results[name] = time_case(db, call, iterations)
+        except Exception as e:
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+        stats = results[name]
+        if 'error' in stats:
+            print(f"{name:<40} FAILED {stats['error']}")
+        else:
+            print(f"{name:<40} p50 {stats['p50_ms']:9.3f} ms  p95 {stats['p95_ms']:9.3f} ms"
+                  f"{'  errors ' + str(stats['errors']) if stats['errors'] else ''}")
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """[(name, baseline p50, current p50)] for methods whose p50 regressed"""
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or 'p50_ms' not in before or 'p50_ms' not in stats:
+            continue
+        if stats['p50_ms'] > before['p50_ms'] * threshold and stats['p50_ms'] - before['p50_ms'] >= min_delta_ms:
+            regressions.append((name, before['p50_ms'], stats['p50_ms']))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Database methods on synthetic data")
+    parser.add_argument('--dbname', default='course_management_bench', help="benchmark database (created if missing)")
+    parser.add_argument('--reuse', action='store_true', help="skip seeding and use the existing data")
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--teachers', type=int, default=2000)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--courses', type=int, default=5000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--enrollments-per-student', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="parallel processes for seeding")
+    parser.add_argument('--only', nargs='+', metavar='METHOD', help="benchmark only these methods")
+    parser.add_argument('--output', help="write the JSON results here (default: stdout)")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="allowed p50 ratio against the baseline")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5, help="ignore p50 increases smaller than this")
+    args = parser.parse_args(argv)
+
+    if args.dbname == DB_CONFIG.get('dbname'):
+        print("Refusing to seed the application database; pass a separate --dbname")
+        return 2
+    scale = Scale(args.departments, args.teachers, args.students, args.courses, args.years,
+                  args.enrollments_per_student)
+    config = database_config(args.dbname)
+    try:
+        if create_database(args.dbname):
+            print(f"Created database {args.dbname}")
+        conn = psycopg2.connect(**config)
+        try:
+            migrate.migrate(conn)
+            with conn.cursor() as cursor:
+                cursor.execute("SHOW server_version")
+                server_version = cursor.fetchone()[0]
+            conn.commit()
+        finally:
+            conn.close()
+        if not args.reuse:
+            started = time.perf_counter()
+            generate(config, scale, args.workers)
+            print(f"Seeded {args.dbname} in {time.perf_counter() - started:.1f} s")
+    except psycopg2.Error as e:
+        print(f"Could not prepare the benchmark database: {e}")
+        return 1
+
+    db = Database(config=config, slow_query_threshold=None)
+    try:
+        ctx = Context(db)
+        results = run(db, ctx, args.only)
+    finally:
+        db.disconnect()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'server_version': server_version,
+        'scale': None if args.reuse else scale.as_dict(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p50 {before:.3f} ms -> {after:.3f} ms ({after / before:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool with health checks and statistics.
+
+    Unlike psycopg2.pool.ThreadedConnectionPool, a checkout waits for a
+    connection to be returned instead of failing when all maxconn are in use.
+    """
+
+    def __init__(self, minconn, maxconn, health_check_interval=30, checkout_timeout=30, **dsn):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: need 0 <= minconn <= maxconn and maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self._dsn = dsn
+        self._idle = []          # [(connection, last_used)] used as a stack
+        self._in_use = set()     # id() of checked out connections
+        self._size = 0           # open connections plus slots reserved for connects in flight
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'checkins': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_checks': 0,
+            'health_check_failures': 0,
+        }
+        for _ in range(minconn):
+            self._size += 1
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(**self._dsn)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        # Caller holds self._cond
+        self._size -= 1
+        self._stats['discarded'] += 1
+        self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        """Closed flag always; a SELECT 1 round trip only for connections idle past the interval"""
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        with self._cond:
+            self._stats['health_checks'] += 1
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond:
+                self._stats['health_check_failures'] += 1
+            return False
+
+    def getconn(self, timeout=None):
+        """Check out a healthy connection, waiting up to timeout seconds if the pool is exhausted"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        while True:
+            conn = last_used = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        # Reserve the slot, connect outside the lock
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection available after {timeout}s")
+                    if not waited:
+                        waited = True
+                        self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+
+            # Connecting and health checks can take a round trip, so they run unlocked
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, last_used):
+                with self._cond:
+                    self._discard(conn)
+                continue
+
+            with self._cond:
+                self._in_use.add(id(conn))
+                self._stats['checkouts'] += 1
+                if waited:
+                    self._stats['wait_time'] += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        with self._cond:
+            if id(conn) not in self._in_use:
+                return
+            self._in_use.discard(id(conn))
+            self._stats['checkins'] += 1
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def closeall(self):
+        """Close idle connections now; checked out ones are closed as they come back"""
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool counters and current occupancy"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'size': self._size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+            })
+            return stats
@@ -1,53 +1,840 @@
+import csv
+import io
+import json
+import select
+import threading
+import uuid
+import weakref
+from contextlib import contextmanager
 import psycopg2
-from psycopg2 import Error
+from psycopg2 import Error, errors
+from psycopg2.extras import execute_values
 from config import DB_CONFIG
+from connection_pool import ConnectionPool
+from reference_cache import ReferenceCache
+from query_metrics import QueryMetrics, caller_name
+import logging
+import sys
+import re
 import hashlib
 import secrets
 from datetime import datetime
+import time
+
+try:
+    from config import DB_POOL
+except ImportError:
+    DB_POOL = None
+
+logger = logging.getLogger(__name__)
+
+# Helpers that run queries on behalf of a caller; _query_name looks past them
+_PLUMBING = {'execute_query', 'fetch_all', 'fetch_one', 'fetch_iter', 'execute_prepared'}
+
+# Hot lookups prepared once per connection: name -> (parameter types, SQL)
+PREPARED_STATEMENTS = {
+    'get_user': (
+        ('varchar',),
+        'SELECT * FROM "user" WHERE username = $1',
+    ),
+    'get_student': (
+        ('integer',),
+        """SELECT s.*, d.department_name
+        FROM student s
+        JOIN department d ON s.department_id = d.department_id
+        WHERE s.user_id = $1""",
+    ),
+    'get_teacher': (
+        ('integer',),
+        """SELECT t.*, d.department_name
+        FROM teacher t
+        JOIN department d ON t.department_id = d.department_id
+        WHERE t.user_id = $1""",
+    ),
+    'get_course_by_id': (
+        ('integer',),
+        """SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects,
+               c.level, c.type, d.department_name
+        FROM course c
+        JOIN department d ON c.department_id = d.department_id
+        WHERE c.course_id = $1""",
+    ),
+    'get_course_by_code': (
+        ('varchar',),
+        """SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects,
+               c.level, c.type, d.department_name
+        FROM course c
+        JOIN department d ON c.department_id = d.department_id
+        WHERE c.course_code = $1""",
+    ),
+    'get_course_offering_by_id': (
+        ('integer',),
+        """SELECT co.offering_id, c.course_name, c.course_code, s.semester_name, s.year, d.department_name,
+               u.first_name || ' ' || u.last_name AS instructor_name,
+               co.course_id, co.semester_id, co.instructor_id, co.capacity, co.seats_taken
+        FROM course_offering co
+        JOIN course c ON co.course_id = c.course_id
+        JOIN semester s ON co.semester_id = s.semester_id
+        JOIN department d ON c.department_id = d.department_id
+        JOIN teacher t ON co.instructor_id = t.teacher_id
+        JOIN "user" u ON t.user_id = u.user_id
+        WHERE co.offering_id = $1""",
+    ),
+    'is_student_enrolled': (
+        ('integer', 'integer'),
+        'SELECT 1 FROM enrolls_in WHERE student_id = $1 AND course_id = $2',
+    ),
+    # Counts the queue up to the student's entry on waitlist_queue_idx; only
+    # the queue of an open offering counts, as in join_waitlist()
+    'get_waitlist_position': (
+        ('integer', 'integer'),
+        """SELECT (SELECT count(*) FROM waitlist q
+                WHERE q.offering_id = w.offering_id AND q.waitlist_id <= w.waitlist_id)
+        FROM waitlist w
+        JOIN course_offering co ON co.offering_id = w.offering_id
+        JOIN semester s ON s.semester_id = co.semester_id
+        WHERE w.student_id = $1 AND co.course_id = $2 AND s.end_date >= CURRENT_DATE""",
+    ),
+}
+
+# Reason codes returned by the enroll_student() SQL function
+ENROLLMENT_MESSAGES = {
+    'enrolled': "Successfully enrolled in course",
+    'student_not_found': "Student not found",
+    'course_not_found': "Course not found",
+    'level_mismatch': "You can only enroll in {level} level courses.",
+    'department_restricted': "You can only take Elective or Technical Elective courses from other departments.",
+    'already_enrolled': "Already enrolled in this course",
+    'not_offered': "Course is not available for enrollment",
+    'semester_ended': "Cannot enroll in previous semester courses.",
+    'offering_full': "This course is full.",
+    'waitlisted': "Added to the waitlist",
+    'already_waitlisted': "Already on the waitlist for this course",
+    'duplicate_request': "Pair appears more than once in the batch",
+    'error': "Failed to enroll: database error",
+}
+
+# Set-based version of the enroll_student() rules; %s is filled by execute_values
+# with (ordinal, student_id, course_id) rows
+BULK_ENROLL_SQL = """
+WITH req (ord, student_id, course_id) AS (VALUES %s),
+open_offerings AS (
+    -- Per course, the offering enroll_student() would pick: current semester, else the next one
+    SELECT DISTINCT ON (co.course_id) co.course_id, co.offering_id, sem.end_date >= CURRENT_DATE AS is_open
+    FROM course_offering co
+    JOIN semester sem ON co.semester_id = sem.semester_id
+    WHERE co.course_id IN (SELECT course_id FROM req)
+    ORDER BY co.course_id, sem.end_date < CURRENT_DATE, sem.end_date, co.offering_id
+),
+seats AS MATERIALIZED (
+    -- Every target offering is locked up front, in id order and in the mode
+    -- enroll_student() and the seat counter use, so concurrent enrollments
+    -- cannot overbook or deadlock; seats_left is NULL without a capacity
+    SELECT co.offering_id, co.capacity - co.seats_taken AS seats_left
+    FROM course_offering co
+    WHERE co.offering_id IN (SELECT offering_id FROM open_offerings WHERE is_open)
+    ORDER BY co.offering_id
+    FOR NO KEY UPDATE
+),
+validated AS (
+    SELECT r.ord, r.student_id, r.course_id, o.offering_id,
+        CASE
+            WHEN s.student_id IS NULL THEN 'student_not_found'
+            WHEN c.course_id IS NULL THEN 'course_not_found'
+            WHEN s.level IS DISTINCT FROM c.level THEN 'level_mismatch'
+            WHEN s.department_id IS DISTINCT FROM c.department_id
+                 AND c.type NOT IN ('Elective', 'Technical Elective') THEN 'department_restricted'
+            WHEN e.enrollment_id IS NOT NULL THEN 'already_enrolled'
+            WHEN o.is_open IS NULL THEN 'not_offered'
+            WHEN NOT o.is_open THEN 'semester_ended'
+            WHEN row_number() OVER (PARTITION BY r.student_id, r.course_id ORDER BY r.ord) > 1 THEN 'duplicate_request'
+            ELSE 'enrolled'
+        END AS reason
+    FROM req r
+    LEFT JOIN student s ON s.student_id = r.student_id
+    LEFT JOIN course c ON c.course_id = r.course_id
+    LEFT JOIN enrolls_in e ON e.student_id = r.student_id AND e.course_id = r.course_id
+    LEFT JOIN open_offerings o ON o.course_id = r.course_id
+),
+checked AS (
+    -- Seats go to the pairs that come first in the batch
+    SELECT v.ord, v.student_id, v.course_id, v.offering_id,
+        CASE
+            WHEN v.reason = 'enrolled' AND s.seats_left IS NOT NULL
+                 AND row_number() OVER (PARTITION BY v.offering_id, v.reason ORDER BY v.ord) > s.seats_left
+            THEN 'offering_full'
+            ELSE v.reason
+        END AS reason
+    FROM validated v
+    LEFT JOIN seats s ON s.offering_id = v.offering_id
+),
+inserted AS (
+    INSERT INTO enrolls_in (student_id, course_id, offering_id)
+    SELECT student_id, course_id, offering_id FROM checked WHERE reason = 'enrolled'
+    ON CONFLICT ON CONSTRAINT enrolls_in_student_course_key DO NOTHING
+    RETURNING student_id, course_id
+)
+SELECT ch.ord,
+       CASE WHEN ch.reason = 'enrolled' AND i.student_id IS NULL THEN 'already_enrolled'
+            ELSE ch.reason END
+FROM checked ch
+LEFT JOIN inserted i
+       ON ch.reason = 'enrolled' AND i.student_id = ch.student_id AND i.course_id = ch.course_id
+"""
+
+# Bulk user import (see Database.import_users)
+IMPORT_COLUMNS = ('username', 'password', 'role', 'first_name', 'last_name',
+                  'email', 'department', 'student_number', 'level')
+
+IMPORT_STAGE_SQL = """
+CREATE TEMP TABLE user_import (
+    line_no INTEGER,
+    username VARCHAR(50),
+    password VARCHAR(100),
+    role VARCHAR(20),
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    email VARCHAR(100),
+    department VARCHAR(100),
+    student_number VARCHAR(20),
+    level VARCHAR(20),
+    department_id INTEGER,
+    user_id INTEGER,
+    conflict VARCHAR(40)
+) ON COMMIT DROP
+"""
+
+# First matching rule wins; later rules only look at rows still without a conflict
+IMPORT_VALIDATE_SQL = """
+UPDATE user_import SET role = lower(role);
+
+UPDATE user_import u SET department_id = d.department_id
+FROM department d WHERE d.department_name = u.department;
+
+UPDATE user_import SET conflict = CASE
+    WHEN username IS NULL OR password IS NULL OR role IS NULL
+         OR first_name IS NULL OR last_name IS NULL THEN 'missing_field'
+    WHEN role NOT IN ('admin', 'teacher', 'student') THEN 'invalid_role'
+    WHEN role IN ('teacher', 'student') AND (email IS NULL OR department IS NULL) THEN 'missing_field'
+    WHEN role = 'student' AND (student_number IS NULL OR level IS NULL) THEN 'missing_field'
+    WHEN role = 'student' AND level NOT IN ('Bachelor', 'Master') THEN 'invalid_level'
+    WHEN role IN ('teacher', 'student') AND department_id IS NULL THEN 'unknown_department'
+END;
+
+UPDATE user_import u SET conflict = 'duplicate_in_file'
+FROM (
+    SELECT line_no, row_number() OVER (PARTITION BY username ORDER BY line_no) AS n
+    FROM user_import WHERE conflict IS NULL
+) dup
+WHERE u.line_no = dup.line_no AND dup.n > 1;
+
+UPDATE user_import u SET conflict = 'duplicate_in_file'
+FROM (
+    SELECT line_no, row_number() OVER (PARTITION BY email ORDER BY line_no) AS n
+    FROM user_import WHERE conflict IS NULL AND role IN ('teacher', 'student')
+) dup
+WHERE u.line_no = dup.line_no AND dup.n > 1;
+
+UPDATE user_import u SET conflict = 'username_exists'
+FROM "user" existing
+WHERE u.conflict IS NULL AND existing.username = u.username;
+
+UPDATE user_import u SET conflict = 'email_exists'
+WHERE u.conflict IS NULL AND u.role = 'student'
+  AND EXISTS (SELECT 1 FROM student s WHERE s.email = u.email);
+
+UPDATE user_import u SET conflict = 'email_exists'
+WHERE u.conflict IS NULL AND u.role = 'teacher'
+  AND EXISTS (SELECT 1 FROM teacher t WHERE t.email = u.email);
+
+UPDATE user_import u SET conflict = 'student_number_exists'
+FROM (
+    SELECT line_no, row_number() OVER (PARTITION BY student_number ORDER BY line_no) AS n
+    FROM user_import WHERE conflict IS NULL AND role = 'student'
+) dup
+WHERE u.line_no = dup.line_no
+  AND (dup.n > 1 OR EXISTS (SELECT 1 FROM student s WHERE s.student_number = u.student_number));
+"""
+
+IMPORT_INSERT_SQL = """
+WITH inserted AS (
+    INSERT INTO "user" (username, password, role, first_name, last_name)
+    SELECT username, password, role, first_name, last_name
+    FROM user_import WHERE conflict IS NULL
+    ORDER BY line_no
+    ON CONFLICT (username) DO NOTHING
+    RETURNING user_id, username
+)
+UPDATE user_import u SET user_id = inserted.user_id
+FROM inserted WHERE u.username = inserted.username AND u.conflict IS NULL;
+
+-- Lost a race with a concurrent insert of the same username
+UPDATE user_import SET conflict = 'username_exists'
+WHERE conflict IS NULL AND user_id IS NULL;
+
+INSERT INTO student (user_id, student_number, first_name, last_name, email, department_id, level)
+SELECT user_id, student_number, first_name, last_name, email, department_id, level
+FROM user_import WHERE role = 'student' AND user_id IS NOT NULL;
+
+INSERT INTO teacher (user_id, first_name, last_name, email, department_id)
+SELECT user_id, first_name, last_name, email, department_id
+FROM user_import WHERE role = 'teacher' AND user_id IS NOT NULL;
+"""
+
+def read_import_records(source):
+    """Yield (line_no, record) from a CSV path, CSV file object or iterable of dicts"""
+    if isinstance(source, str):
+        with open(source, newline='', encoding='utf-8') as f:
+            yield from read_import_records(f)
+        return
+    if hasattr(source, 'read'):
+        # Header is line 1
+        for line_no, record in enumerate(csv.DictReader(source), start=2):
+            yield line_no, record
+        return
+    for line_no, record in enumerate(source, start=1):
+        yield line_no, record
+
+
+# Keyset pagination: rows per page for the list screens, and the sort keys each
+# list accepts as name -> (SQL expression, index of that value in the row).
+# Every sort is made unique by appending the primary key, so pages never skip
+# or repeat rows; each listed expression is NOT NULL and backed by an index.
+PAGE_SIZE = 100
+USER_PAGE_SORTS = {
+    'user_id': ('u.user_id', 0),
+    'username': ('u.username', 1),
+    'role': ('u.role', 2),
+}
+COURSE_PAGE_SORTS = {
+    'course_id': ('c.course_id', 0),
+    'course_name': ('c.course_name', 1),
+    'course_code': ('c.course_code', 2),
+}
+OFFERING_PAGE_SORTS = {
+    'offering_id': ('co.offering_id', 0),
+}
+# A student's courses, newest semester first; (year, semester_name, course_id)
+# identifies a row since a student enrolls in a course once
+STUDENT_COURSES_SQL = """
+SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects,
+       c.level, c.type, d.department_name, s.semester_name, s.year
+FROM enrolls_in e
+JOIN course_offering co ON co.offering_id = e.offering_id
+JOIN course c ON c.course_id = co.course_id
+JOIN department d ON c.department_id = d.department_id
+JOIN semester s ON co.semester_id = s.semester_id
+"""
+STUDENT_COURSE_KEYSET = [('s.year', 9, True), ('s.semester_name', 8, False), ('c.course_id', 0, False)]
+
+# Courses offered in the current semester (%s: today) that a student (%s) may
+# take, minus those they already enrolled in. Same columns as
+# get_all_offered_courses_for_student; used by the student dashboard query.
+AVAILABLE_COURSES_SQL = """
+SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects, c.level, c.type, d.department_name,
+       u.first_name || ' ' || u.last_name AS instructor_name, co.capacity - co.seats_taken AS seats_left
+FROM (SELECT semester_id FROM semester WHERE start_date <= %s AND end_date >= %s LIMIT 1) cs
+JOIN course_offering co ON co.semester_id = cs.semester_id
+JOIN course c ON co.course_id = c.course_id
+JOIN student st ON st.student_id = %s AND st.level = c.level
+JOIN department d ON c.department_id = d.department_id
+JOIN teacher t ON co.instructor_id = t.teacher_id
+JOIN "user" u ON t.user_id = u.user_id
+WHERE (c.department_id = st.department_id OR c.type IN ('Elective', 'Technical Elective'))
+  AND NOT EXISTS (
+      SELECT 1 FROM enrolls_in e WHERE e.student_id = st.student_id AND e.course_id = c.course_id
+  )
+"""
+
+
+def student_dashboard_query(student_id, today, limit):
+    """(query, params) returning both student tabs, each row tagged 'available' or 'enrolled'.
+
+    Both halves are padded to the same columns; the outer ORDER BY keeps the
+    enrolled rows in get_student_courses_page order.
+    """
+    enrolled_query, enrolled_params = page_query(
+        STUDENT_COURSES_SQL, ["e.student_id = %s"], [student_id], STUDENT_COURSE_KEYSET, None, limit
+    )
+    query = f"""
+    SELECT 'available' AS tab, a.*, NULL::varchar AS semester_name, NULL::integer AS year
+    FROM ({AVAILABLE_COURSES_SQL}) a
+    UNION ALL
+    SELECT 'enrolled', e.course_id, e.course_name, e.course_code, e.credits, e.ects, e.level, e.type,
+           e.department_name, NULL, NULL, e.semester_name, e.year
+    FROM ({enrolled_query}) e
+    ORDER BY tab, year DESC, semester_name, course_id
+    """
+    return query, [today, today, student_id] + enrolled_params
+
+
+def sort_keyset(sorts, order_by, descending, primary_key):
+    """Keyset columns [(expression, row_index, descending)] for a whitelisted sort key"""
+    if order_by not in sorts:
+        raise ValueError(f"Cannot sort by {order_by!r}; expected one of {', '.join(sorts)}")
+    expression, index = sorts[order_by]
+    keyset = [(expression, index, descending)]
+    if expression != primary_key[0]:
+        keyset.append(primary_key + (descending,))
+    return keyset
+
+
+def page_query(query, conditions, params, keyset, after, limit):
+    """Append WHERE, ORDER BY and LIMIT for one page after the cursor `after`.
+
+    One extra row is requested so page_result can tell whether another page
+    follows without a count(*).
+    """
+    conditions = list(conditions)
+    params = list(params)
+    if after is not None:
+        if len(after) != len(keyset):
+            raise ValueError("Page cursor does not match the sort order")
+        if len({descending for _, _, descending in keyset}) == 1:
+            # A row comparison can walk a composite index directly
+            op = '<' if keyset[0][2] else '>'
+            columns = ', '.join(expression for expression, _, _ in keyset)
+            conditions.append(f"({columns}) {op} ({', '.join(['%s'] * len(keyset))})")
+            params.extend(after)
+        else:
+            # Mixed directions: (a > x) OR (a = x AND b < y) OR ...
+            alternatives = []
+            for i, (expression, _, descending) in enumerate(keyset):
+                terms = [f"{keyset[j][0]} = %s" for j in range(i)]
+                terms.append(f"{expression} {'<' if descending else '>'} %s")
+                alternatives.append(f"({' AND '.join(terms)})")
+                params.extend(after[:i + 1])
+            conditions.append(f"({' OR '.join(alternatives)})")
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + ", ".join(
+        f"{expression} {'DESC' if descending else 'ASC'}" for expression, _, descending in keyset
+    )
+    query += " LIMIT %s"
+    params.append(limit + 1)
+    return query, params
+
+
+def page_result(rows, keyset, limit):
+    """(rows, next_after): next_after is the cursor for the following page, or None on the last page"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(rows[-1][index] for _, index, _ in keyset)
+
+
+# Change feed published by the notify_changes() triggers (migration 008)
+CHANGE_CHANNEL = 'cms_changes'
+# Seconds between checks of the stop flag while waiting for notifications
+LISTEN_POLL_INTERVAL = 1.0
+
+
+def parse_changes(payloads):
+    """Decode cms_changes payloads into change dicts, merging runs for the same table and op.
+
+    A merged change lists the rows of all its notifications, or has rows None
+    (reload) if any of them did.
+    """
+    changes = []
+    for payload in payloads:
+        try:
+            change = json.loads(payload)
+            table, op, rows = change['table'], change['op'], change.get('rows')
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Ignoring malformed change notification: %r", payload)
+            continue
+        last = changes[-1] if changes else None
+        if last and last['table'] == table and last['op'] == op:
+            last['rows'] = last['rows'] + rows if last['rows'] is not None and rows is not None else None
+        else:
+            changes.append({'table': table, 'op': op, 'rows': rows})
+    return changes
+
+
+# Writes that make cached reference data stale
+_REFERENCE_WRITE = re.compile(
+    r'\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+"?(department|semester)\b',
+    re.IGNORECASE
+)
 
 class Database:
-    def __init__(self):
-        self.connection = None
+    def __init__(self, minconn=None, maxconn=None, config=None, cache_ttl=300, slow_query_threshold=0.5):
+        """Single shared connection by default; pass maxconn (or set DB_POOL in config.py) for pooled mode"""
+        if maxconn is None and DB_POOL:
+            minconn = DB_POOL.get('minconn', 1)
+            maxconn = DB_POOL.get('maxconn')
+        self.config = config or DB_CONFIG
+        self.minconn = 1 if minconn is None else minconn
+        self.maxconn = maxconn
+        self.pool = None
+        self._connection = None
+        self._local = threading.local()
+        self.itersize = 2000
+        # Statements are session state, so bookkeeping is per connection; a new
+        # connection (reconnect, pool replacement) starts empty and re-prepares
+        self._prepared = weakref.WeakKeyDictionary()
+        self._prepared_stats = {}
+        self._prepared_lock = threading.Lock()
+        self.reference_cache = ReferenceCache(ttl=cache_ttl)
+        self.metrics = QueryMetrics(slow_query_threshold)
+        self._sessions = weakref.WeakValueDictionary()   # user_id -> live Session
+        self._subscribers = {}                              # table -> [callback]
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        self._listener_stop = threading.Event()
         self.connect()
 
+    @property
+    def connection(self):
+        """The connection for the calling thread; in pooled mode it is checked out on first use"""
+        if self.pool is None:
+            return self._connection
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None and conn.closed:
+            self.release()
+            conn = None
+        if conn is None:
+            conn = self.pool.getconn()
+            self._local.connection = conn
+            # Hand the connection back if the thread exits without calling release()
+            self._local.finalizer = weakref.finalize(threading.current_thread(), self.pool.putconn, conn)
+        return conn
+
+    @connection.setter
+    def connection(self, value):
+        self._connection = value
+
     def connect(self):
         try:
-            self.connection = psycopg2.connect(**DB_CONFIG)
-            print("Successfully connected to the database")
+            if self.maxconn:
+                self.pool = ConnectionPool(self.minconn, self.maxconn, **self.config)
+                logger.info("Connection pool ready (%s-%s connections)", self.minconn, self.maxconn)
+            else:
+                self.connection = psycopg2.connect(**self.config)
+                logger.info("Successfully connected to the database")
             # Test the connection with a simple query
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT version();")
-            version = cursor.fetchone()
-            print(f"PostgreSQL version: {version}")
+            with self.checkout() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT version();")
+                version = cursor.fetchone()
+                conn.commit()
+            logger.info("PostgreSQL version: %s", version[0])
         except Error as e:
-            print(f"Error connecting to PostgreSQL: {e}")
+            logger.error("Error connecting to PostgreSQL: %s", e)
 
     def disconnect(self):
-        if self.connection:
+        self._listener_stop.set()
+        if self.pool:
+            self.release()
+            self.pool.closeall()
+            logger.info("Connection pool closed")
+        elif self.connection:
             self.connection.close()
-            print("Database connection closed")
+            logger.info("Database connection closed")
 
-    def execute_query(self, query, params=None):
+    @contextmanager
+    def checkout(self):
+        """Bind a connection to the calling thread for one task and return it to the pool afterwards"""
+        if self.pool is None or getattr(self._local, 'connection', None) is not None:
+            yield self.connection
+            return
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, params or ())
-            self.connection.commit()
-            return cursor
+            yield self.connection
+        finally:
+            self.release()
+
+    def release(self):
+        """Return the calling thread's pooled connection (no-op in single-connection mode)"""
+        conn = getattr(self._local, 'connection', None)
+        if self.pool is None or conn is None:
+            return
+        self._local.finalizer.detach()
+        self._local.connection = None
+        self.pool.putconn(conn, discard=conn.closed)
+
+    def pool_stats(self):
+        """Pool counters and occupancy, or None in single-connection mode"""
+        return self.pool.stats() if self.pool else None
+
+    @contextmanager
+    def dedicated_connection(self):
+        """A connection nobody else commits on, for work that spans several calls (e.g. streaming)"""
+        if self.pool:
+            conn = self.pool.getconn()
+            try:
+                yield conn
+            finally:
+                self.pool.putconn(conn)
+        else:
+            conn = psycopg2.connect(**self.config)
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    def _query_name(self):
+        return caller_name(sys._getframe(2), globals(), _PLUMBING)
+
+    def _run(self, query, params, fetch=None, name=None):
+        """Execute a statement, fetch its result, commit, and always close the cursor"""
+        name = name or self._query_name()
+        started = time.perf_counter()
+        rows = error = None
+        try:
+            conn = self.connection
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, params or ())
+                    if fetch == 'all':
+                        result = cursor.fetchall()
+                        rows = len(result)
+                    elif fetch == 'one':
+                        result = cursor.fetchone()
+                        rows = 1 if result else 0
+                    else:
+                        result = cursor
+                        rows = max(cursor.rowcount, 0)
+                conn.commit()
+                self._invalidate_reference_data(query)
+                return result
+            except Error:
+                try:
+                    conn.rollback()
+                except Error:
+                    pass
+                raise
         except Error as e:
-            print(f"Error executing query: {e}")
+            error = e
+            logger.error("Error executing query %s: %s", name, e)
             return None
+        finally:
+            self.metrics.record(name, time.perf_counter() - started, rows, error, query, params)
 
-    def fetch_all(self, query, params=None):
-        cursor = self.execute_query(query, params)
-        if cursor:
-            return cursor.fetchall()
-        return []
+    def _invalidate_reference_data(self, query):
+        """Drop cached department/semester data after a write to those tables"""
+        match = _REFERENCE_WRITE.match(query)
+        if match:
+            self.reference_cache.invalidate(match.group(1).lower())
 
-    def fetch_one(self, query, params=None):
-        cursor = self.execute_query(query, params)
-        if cursor:
-            return cursor.fetchone()
-        return None
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the reference-data cache"""
+        return self.reference_cache.stats()
+
+    def register_session(self, session):
+        """Track a logged-in Session so edits to its user can invalidate it"""
+        self._sessions[session['user_id']] = session
+
+    def invalidate_session(self, user_id):
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.invalidate()
+
+    # Change feed
+    def subscribe(self, table, callback):
+        """Call callback(change) for every committed change to table, made by any client.
+
+        change is a dict with table, op ('insert', 'update', 'delete',
+        'truncate' or 'reload') and rows: the key columns of the changed rows,
+        or None when too many changed (or notifications were missed) and the
+        subscriber should reload. Callbacks run on the listener thread, which
+        is started by the first subscription.
+        """
+        with self._listener_lock:
+            self._subscribers.setdefault(table, []).append(callback)
+            if self._listener is None or not self._listener.is_alive():
+                self._listener_stop.clear()
+                self._listener = threading.Thread(target=self._listen, name='db-change-listener', daemon=True)
+                self._listener.start()
+
+    def unsubscribe(self, table, callback):
+        with self._listener_lock:
+            callbacks = self._subscribers.get(table, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def _listen(self):
+        """Listener thread: LISTEN on its own connection, reconnecting with backoff"""
+        delay = 1
+        connected_before = False
+        while not self._listener_stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.config)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANGE_CHANNEL}")
+                delay = 1
+                if connected_before:
+                    # Whatever changed while the connection was down was not announced
+                    with self._listener_lock:
+                        tables = list(self._subscribers)
+                    self._dispatch([{'table': table, 'op': 'reload', 'rows': None} for table in tables])
+                connected_before = True
+                while not self._listener_stop.is_set():
+                    if select.select([conn], [], [], LISTEN_POLL_INTERVAL) == ([], [], []):
+                        continue
+                    conn.poll()
+                    payloads = []
+                    while conn.notifies:
+                        payloads.append(conn.notifies.pop(0).payload)
+                    if payloads:
+                        self._dispatch(parse_changes(payloads))
+            except (Error, OSError) as e:
+                if not self._listener_stop.is_set():
+                    logger.warning("Change listener disconnected (%s); retrying in %s s", e, delay)
+                    self._listener_stop.wait(delay)
+                    delay = min(delay * 2, 30)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _dispatch(self, changes):
+        for change in changes:
+            table, rows = change['table'], change['rows']
+            # Keep this process's own caches in step with other clients' writes
+            if table == 'department':
+                self.reference_cache.invalidate('department')
+            elif table == 'user':
+                user_ids = [row['user_id'] for row in rows] if rows is not None else list(self._sessions.keys())
+                for user_id in user_ids:
+                    self.invalidate_session(user_id)
+            with self._listener_lock:
+                callbacks = list(self._subscribers.get(table, ()))
+            for callback in callbacks:
+                try:
+                    callback(change)
+                except Exception:
+                    logger.exception("Change subscriber for %s failed", table)
+
+    def query_stats(self):
+        """Per logical query name: calls, errors, rows and p50/p95/p99 latency"""
+        return self.metrics.snapshot()
+
+    def query_report(self):
+        return self.metrics.report()
+
+    def execute_query(self, query, params=None, name=None):
+        """Execute and commit; returns the closed cursor (for rowcount) or None on error"""
+        return self._run(query, params, name=name)
+
+    def fetch_all(self, query, params=None, name=None):
+        result = self._run(query, params, fetch='all', name=name)
+        return result if result is not None else []
+
+    def fetch_one(self, query, params=None, name=None):
+        return self._run(query, params, fetch='one', name=name)
+
+    def fetch_iter(self, query, params=None, itersize=None, name=None):
+        """Yield rows from a named server-side cursor, fetching itersize rows per round trip.
+
+        The cursor lives on a dedicated connection so commits made through this
+        instance while the caller iterates cannot close it. Exhaust the iterator
+        or call close() on it to release the connection promptly.
+        """
+        # Resolve the name now; the generator body only runs once iteration starts
+        return self._stream(query, params, itersize, name or self._query_name())
+
+    def _stream(self, query, params, itersize, name):
+        started = time.perf_counter()
+        rows = 0
+        error = None
+        try:
+            with self.dedicated_connection() as conn:
+                cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+                cursor.itersize = itersize or self.itersize
+                try:
+                    cursor.execute(query, params or ())
+                    for row in cursor:
+                        rows += 1
+                        yield row
+                except Error as e:
+                    error = e
+                    logger.error("Error streaming query %s: %s", name, e)
+                finally:
+                    try:
+                        cursor.close()
+                        conn.rollback()
+                    except Error:
+                        pass
+        finally:
+            self.metrics.record(name, time.perf_counter() - started, rows, error, query, params)
+
+    def _prepared_names(self, conn):
+        with self._prepared_lock:
+            return self._prepared.setdefault(conn, set())
+
+    def _execute_prepared_on(self, conn, name, params, fetch):
+        """PREPARE on first use per connection, then EXECUTE; retries once if the server lost the statement"""
+        prepared = self._prepared_names(conn)
+        for attempt in range(2):
+            try:
+                with conn.cursor() as cursor:
+                    if name not in prepared:
+                        types, sql = PREPARED_STATEMENTS[name]
+                        cursor.execute(f"PREPARE {name} ({', '.join(types)}) AS {sql}")
+                        prepared.add(name)
+                        with self._prepared_lock:
+                            self._prepared_stat(name)['prepares'] += 1
+                    placeholders = ', '.join(['%s'] * len(params))
+                    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+                    result = cursor.fetchall() if fetch == 'all' else cursor.fetchone()
+                conn.commit()
+                return result
+            except (errors.InvalidSqlStatementName, errors.DuplicatePreparedStatement, errors.FeatureNotSupported) as e:
+                # DISCARD ALL, a server-side DEALLOCATE or a schema change invalidated our bookkeeping
+                conn.rollback()
+                if attempt:
+                    raise
+                if isinstance(e, errors.DuplicatePreparedStatement):
+                    prepared.add(name)
+                    continue
+                prepared.discard(name)
+                if isinstance(e, errors.FeatureNotSupported):
+                    with conn.cursor() as cursor:
+                        cursor.execute(f"DEALLOCATE {name}")
+                    conn.commit()
+
+    def _prepared_stat(self, name):
+        return self._prepared_stats.setdefault(name, {'calls': 0, 'errors': 0, 'prepares': 0, 'total_time': 0.0, 'max_time': 0.0})
+
+    def execute_prepared(self, name, params, fetch='one'):
+        """Run one of PREPARED_STATEMENTS on the calling thread's connection"""
+        started = time.perf_counter()
+        rows = error = None
+        try:
+            conn = self.connection
+            try:
+                result = self._execute_prepared_on(conn, name, params, fetch)
+                rows = len(result) if fetch == 'all' else int(bool(result))
+                return result
+            except Error:
+                try:
+                    conn.rollback()
+                except Error:
+                    pass
+                raise
+        except Error as e:
+            error = e
+            logger.error("Error executing prepared statement %s: %s", name, e)
+            with self._prepared_lock:
+                self._prepared_stat(name)['errors'] += 1
+            return [] if fetch == 'all' else None
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._prepared_lock:
+                stat = self._prepared_stat(name)
+                stat['calls'] += 1
+                stat['total_time'] += elapsed
+                stat['max_time'] = max(stat['max_time'], elapsed)
+            self.metrics.record(name, elapsed, rows, error, PREPARED_STATEMENTS[name][1], params)
+
+    def prepared_statement_stats(self):
+        """Per statement: calls, errors, prepares, total/avg/max execution time in seconds"""
+        with self._prepared_lock:
+            stats = {name: dict(stat) for name, stat in self._prepared_stats.items()}
+        for stat in stats.values():
+            stat['avg_time'] = stat['total_time'] / stat['calls'] if stat['calls'] else 0.0
+        return stats
 
     def hash_password(self, password):
         # For simplicity, just return the password as is (plain text)
@@ -59,19 +846,44 @@ class Database:
 
     # User operations
     def get_user(self, username):
-        query = "SELECT * FROM \"user\" WHERE username = %s"
-        result = self.fetch_one(query, (username,))
-        print(f"get_user query result for {username}: {result}")
-        return result
+        return self.execute_prepared('get_user', (username,))
 
     def get_user_by_id(self, user_id):
         query = "SELECT * FROM \"user\" WHERE user_id = %s"
         return self.fetch_one(query, (user_id,))
 
-    def get_all_users(self):
+    def get_all_users(self, stream=False):
+        """All users; with stream=True rows are yielded from a server-side cursor"""
         query = "SELECT user_id, username, role, created_at FROM \"user\" ORDER BY user_id"
+        if stream:
+            return self.fetch_iter(query)
         return self.fetch_all(query)
 
+    def get_users_page(self, after=None, limit=PAGE_SIZE, order_by='user_id', descending=False,
+                       role=None, search=None, ids=None):
+        """One page of users in keyset order.
+
+        Pass the returned next_after back as after to fetch the following page;
+        it is None on the last page. search matches anywhere in the username.
+        ids limits the page to those user_ids, e.g. to re-read changed rows.
+        """
+        keyset = sort_keyset(USER_PAGE_SORTS, order_by, descending, ('u.user_id', 0))
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append("u.user_id = ANY(%s)")
+            params.append(list(ids))
+        if role:
+            conditions.append("u.role = %s")
+            params.append(role.lower())
+        if search:
+            conditions.append("u.username ILIKE %s")
+            params.append(f"%{search}%")
+        query, params = page_query(
+            "SELECT u.user_id, u.username, u.role, u.created_at FROM \"user\" u",
+            conditions, params, keyset, after, limit
+        )
+        return page_result(self.fetch_all(query, params), keyset, limit)
+
     def create_user(self, username, password, role, first_name, last_name):
         """Create a new user with plain text password and name"""
         try:
@@ -85,7 +897,7 @@ class Database:
             self.execute_query(query, (username, password, role.lower(), first_name, last_name))
             return True
         except Exception as e:
-            print(f"Error creating user: {str(e)}")
+            logger.error("Error creating user: %s", e)
             return False
 
     def update_user(self, user_id, username, password=None, role=None, first_name=None, last_name=None):
@@ -132,11 +944,19 @@ class Database:
             WHERE user_id = %s
             """
             self.execute_query(query, tuple(params))
+            self.invalidate_session(user_id)
             return True
         except Exception as e:
-            print(f"Error updating user: {str(e)}")
+            logger.error("Error updating user: %s", e)
             return False
 
+    def delete_user(self, user_id):
+        """Delete a user (their student/teacher row goes with it); True on success"""
+        if self.execute_query('DELETE FROM "user" WHERE user_id = %s', (user_id,)) is None:
+            return False
+        self.invalidate_session(user_id)
+        return True
+
     def check_username_exists(self, username, exclude_id=None):
         """Check if a username already exists"""
         query = "SELECT user_id FROM \"user\" WHERE username = %s"
@@ -147,31 +967,19 @@ class Database:
         return bool(self.fetch_one(query, tuple(params)))
 
     def authenticate_user(self, username, password):
-        print(f"\nAttempting to authenticate user: {username}")
         user = self.get_user(username)
         if not user:
-            print(f"User not found: {username}")
+            logger.info("Authentication failed for %s: unknown user", username)
             return None
-            
-        print(f"Found user data: {user}")
-        print(f"Stored password: {user[2]}")
-        print(f"Attempting to verify password...")
-        
         if self.verify_password(user[2], password):
-            print(f"Password verified successfully for user: {username}")
+            logger.info("User %s authenticated", username)
             return user
-        print(f"Password verification failed for user: {username}")
+        logger.info("Authentication failed for %s: wrong password", username)
         return None
 
     # Student operations
     def get_student(self, user_id):
-        query = """
-        SELECT s.*, d.department_name 
-        FROM student s 
-        JOIN department d ON s.department_id = d.department_id 
-        WHERE s.user_id = %s
-        """
-        return self.fetch_one(query, (user_id,))
+        return self.execute_prepared('get_student', (user_id,))
 
     def create_student(self, user_id, student_number, first_name, last_name, email, department_id, level):
         query = """
@@ -183,13 +991,7 @@ class Database:
 
     # Teacher operations
     def get_teacher(self, user_id):
-        query = """
-        SELECT t.*, d.department_name 
-        FROM teacher t 
-        JOIN department d ON t.department_id = d.department_id 
-        WHERE t.user_id = %s
-        """
-        return self.fetch_one(query, (user_id,))
+        return self.execute_prepared('get_teacher', (user_id,))
 
     def create_teacher(self, user_id, first_name, last_name, email, department_id):
         query = """
@@ -199,8 +1001,50 @@ class Database:
         """
         return self.fetch_one(query, (user_id, first_name, last_name, email, department_id))
 
+    # Bulk import
+    def import_users(self, source):
+        """Import users with their student/teacher rows in one transaction.
+
+        source is a CSV path, an open CSV file or an iterable of dicts with the
+        IMPORT_COLUMNS keys (department is the department name). Rows are staged
+        with COPY, validated and resolved in SQL; rows that conflict are skipped
+        and reported. Returns {'imported': n, 'conflicts': [(line_no, username,
+        reason)], 'error': None or message}.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line_no, record in read_import_records(source):
+            values = [(record.get(column) or '').strip() for column in IMPORT_COLUMNS]
+            values[1] = self.hash_password(values[1]) if values[1] else ''
+            writer.writerow([line_no] + values)
+        buffer.seek(0)
+
+        started = time.perf_counter()
+        conn = self.connection
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(IMPORT_STAGE_SQL)
+                cursor.copy_expert(
+                    f"COPY user_import (line_no, {', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+                cursor.execute(IMPORT_VALIDATE_SQL)
+                cursor.execute(IMPORT_INSERT_SQL)
+                cursor.execute("SELECT count(*) FROM user_import WHERE user_id IS NOT NULL")
+                imported = cursor.fetchone()[0]
+                cursor.execute("SELECT line_no, username, conflict FROM user_import WHERE conflict IS NOT NULL ORDER BY line_no")
+                conflicts = cursor.fetchall()
+            conn.commit()
+            self.metrics.record('import_users', time.perf_counter() - started, imported)
+            return {'imported': imported, 'conflicts': conflicts, 'error': None}
+        except Error as e:
+            logger.error("Error importing users: %s", e)
+            conn.rollback()
+            self.metrics.record('import_users', time.perf_counter() - started, error=e)
+            return {'imported': 0, 'conflicts': [], 'error': str(e)}
+
     # Course operations
-    def get_all_courses(self):
+    def get_all_courses(self, stream=False):
         """Get all courses with department names"""
         query = """
         SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects, 
@@ -209,40 +1053,91 @@ class Database:
         JOIN department d ON c.department_id = d.department_id
         ORDER BY c.course_code
         """
+        if stream:
+            return self.fetch_iter(query)
         return self.fetch_all(query)
 
+    def get_courses_page(self, after=None, limit=PAGE_SIZE, order_by='course_code', descending=False,
+                         department_id=None, level=None, search=None, ids=None):
+        """One page of courses (same columns as get_all_courses); returns (rows, next_after)"""
+        keyset = sort_keyset(COURSE_PAGE_SORTS, order_by, descending, ('c.course_id', 0))
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append("c.course_id = ANY(%s)")
+            params.append(list(ids))
+        if department_id:
+            conditions.append("c.department_id = %s")
+            params.append(department_id)
+        if level:
+            conditions.append("c.level = %s")
+            params.append(level)
+        if search:
+            conditions.append("(c.course_code ILIKE %s OR c.course_name ILIKE %s)")
+            params.extend([f"%{search}%"] * 2)
+        query, params = page_query("""
+        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects,
+               c.level, c.type, d.department_name
+        FROM course c
+        JOIN department d ON c.department_id = d.department_id
+        """, conditions, params, keyset, after, limit)
+        return page_result(self.fetch_all(query, params), keyset, limit)
+
     def get_course_by_id(self, course_id):
         """Get course by ID with department name"""
-        query = """
-        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects, 
-               c.level, c.type, d.department_name
-        FROM course c 
-        JOIN department d ON c.department_id = d.department_id 
-        WHERE c.course_id = %s
-        """
-        return self.fetch_one(query, (course_id,))
+        return self.execute_prepared('get_course_by_id', (course_id,))
+
+    def get_course_by_code(self, course_code):
+        """Get course by its (unique) code with department name"""
+        return self.execute_prepared('get_course_by_code', (course_code,))
 
     # Department operations
     def get_all_departments(self):
+        """All departments, served from the reference cache"""
         query = "SELECT * FROM department"
-        return self.fetch_all(query)
+        departments = self.reference_cache.get(('department', 'all'), lambda: self._run(query, None, fetch='all'))
+        return list(departments) if departments is not None else []
 
     def get_department_name(self, department_id):
         """Get department name by ID"""
         try:
             if not isinstance(department_id, (int, str)) or not str(department_id).isdigit():
                 return "N/A"
-            query = "SELECT department_name FROM department WHERE department_id = %s"
-            result = self.fetch_one(query, (int(department_id),))
-            return result[0] if result else "N/A"
+            names = {dept[0]: dept[1] for dept in self.get_all_departments()}
+            return names.get(int(department_id), "N/A")
         except Exception as e:
-            print(f"Error getting department name: {str(e)}")
+            logger.error("Error getting department name: %s", e)
             return "N/A"
 
+    def create_department(self, department_name):
+        query = "INSERT INTO department (department_name) VALUES (%s) RETURNING department_id"
+        return self.fetch_one(query, (department_name,))
+
+    def update_department(self, department_id, department_name):
+        query = "UPDATE department SET department_name = %s WHERE department_id = %s"
+        return self.execute_query(query, (department_name, department_id))
+
+    def delete_department(self, department_id):
+        """Delete a department unless students, teachers or courses still reference it"""
+        query = """
+        SELECT EXISTS (SELECT 1 FROM student WHERE department_id = %s)
+            OR EXISTS (SELECT 1 FROM teacher WHERE department_id = %s)
+            OR EXISTS (SELECT 1 FROM course WHERE department_id = %s)
+        """
+        referenced = self.fetch_one(query, (department_id, department_id, department_id))
+        if referenced is None:
+            return False, "Failed to delete department"
+        if referenced[0]:
+            return False, "Cannot delete department: it is still referenced by students, teachers, or courses."
+        if self.execute_query("DELETE FROM department WHERE department_id = %s", (department_id,)) is None:
+            return False, "Failed to delete department"
+        return True, "Department deleted successfully!"
+
     # Semester operations
     def get_all_semesters(self):
+        """All semesters, newest first, served from the reference cache"""
         query = "SELECT * FROM semester ORDER BY start_date DESC"
-        return self.fetch_all(query)
+        semesters = self.reference_cache.get(('semester', 'all'), lambda: self._run(query, None, fetch='all'))
+        return list(semesters) if semesters is not None else []
 
     def get_current_semester(self):
         current_date = datetime.now().date()
@@ -250,94 +1145,169 @@ class Database:
         SELECT * FROM semester 
         WHERE start_date <= %s AND end_date >= %s
         """
-        return self.fetch_one(query, (current_date, current_date))
+        # Keyed by date so the answer rolls over at midnight; a date without a
+        # current semester is cached as an empty tuple
+        semester = self.reference_cache.get(
+            ('semester', 'current', current_date),
+            lambda: self._current_semester_or_empty(query, current_date)
+        )
+        return semester or None
+
+    def _current_semester_or_empty(self, query, current_date):
+        rows = self._run(query, (current_date, current_date), fetch='all')
+        if rows is None:
+            return None
+        return rows[0] if rows else ()
 
     # Enrollment operations
     def is_student_enrolled(self, student_id, course_id):
         """Check if a student is already enrolled in a course"""
-        query = "SELECT * FROM enrolls_in WHERE student_id = %s AND course_id = %s"
-        return bool(self.fetch_one(query, (student_id, course_id)))
+        return bool(self.execute_prepared('is_student_enrolled', (student_id, course_id)))
 
-    def get_student_courses(self, student_id):
+    def get_student_courses(self, student_id, stream=False):
         """Get courses enrolled by a student with proper semester and year information"""
         query = """
         SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects, 
                c.level, c.type, d.department_name, s.semester_name, s.year
-        FROM course c 
-        JOIN enrolls_in e ON c.course_id = e.course_id 
+        FROM enrolls_in e
+        JOIN course_offering co ON co.offering_id = e.offering_id
+        JOIN course c ON c.course_id = co.course_id
         JOIN department d ON c.department_id = d.department_id
-        JOIN course_offering co ON c.course_id = co.course_id
         JOIN semester s ON co.semester_id = s.semester_id
         WHERE e.student_id = %s
         ORDER BY s.year DESC, s.semester_name
         """
+        if stream:
+            return self.fetch_iter(query, (student_id,))
         return self.fetch_all(query, (student_id,))
 
+    def get_student_courses_page(self, student_id, after=None, limit=PAGE_SIZE, semester_id=None):
+        """One page of get_student_courses, newest semester first; returns (rows, next_after)"""
+        conditions, params = ["e.student_id = %s"], [student_id]
+        if semester_id:
+            conditions.append("s.semester_id = %s")
+            params.append(semester_id)
+        query, params = page_query(STUDENT_COURSES_SQL, conditions, params, STUDENT_COURSE_KEYSET, after, limit)
+        return page_result(self.fetch_all(query, params), STUDENT_COURSE_KEYSET, limit)
+
+    def get_student_dashboard(self, student_id, limit=PAGE_SIZE):
+        """Both student tabs in one round trip: (available, (enrolled, next_after)).
+
+        available is what get_all_offered_courses_for_student returns minus the
+        courses the student is enrolled in; the enrolled part is the first
+        get_student_courses_page.
+        """
+        query, params = student_dashboard_query(student_id, datetime.now().date(), limit)
+        rows = self.fetch_all(query, params)
+        available = [row[1:11] for row in rows if row[0] == 'available']
+        enrolled = [row[1:9] + row[11:] for row in rows if row[0] == 'enrolled']
+        return available, page_result(enrolled, STUDENT_COURSE_KEYSET, limit)
+
+    def try_enroll(self, student_id, course_id):
+        """Validate and enroll in one round trip via the enroll_student() SQL function.
+
+        Returns (reason_code, student_level); reason_code is 'enrolled' on
+        success or one of the other ENROLLMENT_MESSAGES keys.
+        """
+        result = self.fetch_one("SELECT reason, student_level FROM enroll_student(%s, %s)", (student_id, course_id))
+        if not result:
+            return 'error', None
+        return result
+
     def enroll_student(self, student_id, course_id):
         """Enroll a student in a course with proper validation and restrictions"""
-        try:
-            # Start transaction
-            self.connection.autocommit = False
-
-            # Get student info (including level and department)
-            student_query = "SELECT level, department_id FROM student WHERE student_id = %s"
-            student_info = self.fetch_one(student_query, (student_id,))
-            if not student_info:
-                return False, "Student not found"
-            student_level, student_dept = student_info
-
-            # Get course info (level, type, department)
-            course_query = "SELECT level, type, department_id FROM course WHERE course_id = %s"
-            course_info = self.fetch_one(course_query, (course_id,))
-            if not course_info:
-                return False, "Course not found"
-            course_level, course_type, course_dept = course_info
-
-            # Restriction 1: Level must match
-            if student_level != course_level:
-                return False, f"You can only enroll in {student_level} level courses."
-
-            # Restriction 2: Department/type rules
-            if student_dept == course_dept:
-                # Can take any type
-                pass
-            else:
-                # Can only take Elective or Technical Elective
-                if course_type not in ("Elective", "Technical Elective"):
-                    return False, "You can only take Elective or Technical Elective courses from other departments."
+        reason, student_level = self.try_enroll(student_id, course_id)
+        return reason == 'enrolled', ENROLLMENT_MESSAGES[reason].format(level=student_level)
 
-            # Check if already enrolled
-            if self.is_student_enrolled(student_id, course_id):
-                return False, "Already enrolled in this course"
+    def drop_course(self, student_id, course_id):
+        """Remove the student's enrollment in the course; True if there was one to remove.
 
-            # Check if course is available for enrollment and not in a previous semester
-            query = """
-            SELECT co.offering_id, s.end_date
-            FROM course_offering co
-            JOIN semester s ON co.semester_id = s.semester_id
-            WHERE co.course_id = %s
-            """
-            result = self.fetch_one(query, (course_id,))
-            if not result:
-                return False, "Course is not available for enrollment"
-            _, semester_end_date = result
-            from datetime import date
-            if semester_end_date < date.today():
-                return False, "Cannot enroll in previous semester courses."
-
-            # Perform enrollment
-            enroll_query = "INSERT INTO enrolls_in (student_id, course_id) VALUES (%s, %s)"
-            self.execute_query(enroll_query, (student_id, course_id))
-
-            # Commit transaction
-            self.connection.commit()
-            return True, "Successfully enrolled in course"
-        except Exception as e:
-            self.connection.rollback()
-            return False, f"Failed to enroll: {str(e)}"
+        The drop_enrollment() SQL function hands the freed seat to the head of
+        the offering's waitlist in the same transaction.
+        """
+        result = self.fetch_one("SELECT dropped, promoted FROM drop_enrollment(%s, %s)", (student_id, course_id))
+        return bool(result and result[0])
+
+    # Waitlist operations
+    def join_waitlist(self, student_id, course_id):
+        """Enroll if a seat is free, otherwise queue via the join_waitlist() SQL function.
+
+        Returns (reason_code, student_level, queue_position): 'waitlisted' or
+        'already_waitlisted' with the position (1 is next in line), otherwise
+        the try_enroll reason code and level with a position of None.
+        """
+        result = self.fetch_one("SELECT reason, student_level, queue_position FROM join_waitlist(%s, %s)",
+                                (student_id, course_id))
+        if not result:
+            return 'error', None, None
+        return result
+
+    def leave_waitlist(self, student_id, course_id):
+        """Remove the student from the course's waitlist; True if they were on it"""
+        query = """
+        DELETE FROM waitlist w
+        USING course_offering co
+        WHERE co.offering_id = w.offering_id AND w.student_id = %s AND co.course_id = %s
+        """
+        cursor = self.execute_query(query, (student_id, course_id))
+        return bool(cursor and cursor.rowcount)
+
+    def get_waitlist_position(self, student_id, course_id):
+        """The student's place in the course's waitlist (1 is next), or None if not waitlisted"""
+        row = self.execute_prepared('get_waitlist_position', (student_id, course_id))
+        return row[0] if row else None
+
+    def get_waitlist(self, student_id):
+        """The student's waitlist entries in open semesters with their positions, oldest first"""
+        query = """
+        SELECT c.course_id, c.course_name, c.course_code, s.semester_name, s.year,
+               (SELECT count(*) FROM waitlist q
+                WHERE q.offering_id = w.offering_id AND q.waitlist_id <= w.waitlist_id) AS queue_position,
+               w.offering_id
+        FROM waitlist w
+        JOIN course_offering co ON co.offering_id = w.offering_id
+        JOIN course c ON c.course_id = co.course_id
+        JOIN semester s ON s.semester_id = co.semester_id
+        WHERE w.student_id = %s AND s.end_date >= CURRENT_DATE
+        ORDER BY w.waitlist_id
+        """
+        return self.fetch_all(query, (student_id,))
+
+    def enroll_students_bulk(self, pairs, page_size=5000):
+        """Enroll many (student_id, course_id) pairs with set-based validation.
+
+        Applies the same rules as enroll_student to the whole batch in SQL and
+        inserts the accepted pairs in one transaction. Returns a report of
+        (student_id, course_id, reason_code) in input order; a pair repeated
+        within the batch is reported as 'duplicate_request' after its first
+        occurrence. If the batch fails, nothing is inserted and every pair
+        is reported as 'error'.
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return []
+        rows = [(ordinal, student_id, course_id) for ordinal, (student_id, course_id) in enumerate(pairs)]
+        started = time.perf_counter()
+        conn = self.connection
+        try:
+            with conn.cursor() as cursor:
+                results = execute_values(
+                    cursor, BULK_ENROLL_SQL, rows,
+                    template="(%s::integer, %s::integer, %s::integer)",
+                    page_size=page_size, fetch=True
+                )
+            conn.commit()
+            self.metrics.record('enroll_students_bulk', time.perf_counter() - started, len(results))
+        except Error as e:
+            logger.error("Error enrolling students in bulk: %s", e)
+            conn.rollback()
+            self.metrics.record('enroll_students_bulk', time.perf_counter() - started, error=e)
+            return [(student_id, course_id, 'error') for student_id, course_id in pairs]
+        reasons = dict(results)
+        return [(student_id, course_id, reasons[ordinal]) for ordinal, student_id, course_id in rows]
 
     # Course offering operations
-    def get_course_offerings(self, semester_id=None):
+    def get_course_offerings(self, semester_id=None, stream=False):
         """Get course offerings with department names and instructor name"""
         query = """
         SELECT co.offering_id, c.course_name, c.course_code, s.semester_name, s.year, d.department_name, u.first_name || ' ' || u.last_name as instructor_name
@@ -348,16 +1318,47 @@ class Database:
         JOIN teacher t ON co.instructor_id = t.teacher_id
         JOIN "user" u ON t.user_id = u.user_id
         """
+        params = ()
         if semester_id:
             query += " WHERE co.semester_id = %s"
-            return self.fetch_all(query, (semester_id,))
-        return self.fetch_all(query)
+            params = (semester_id,)
+        if stream:
+            return self.fetch_iter(query, params)
+        return self.fetch_all(query, params)
+
+    def get_course_offering_by_id(self, offering_id):
+        """One row of get_course_offerings, followed by course_id, semester_id and instructor_id"""
+        return self.execute_prepared('get_course_offering_by_id', (offering_id,))
+
+    def get_course_offerings_page(self, after=None, limit=PAGE_SIZE, order_by='offering_id', descending=False,
+                                  semester_id=None, department_id=None, instructor_id=None, ids=None):
+        """One page of get_course_offerings; returns (rows, next_after)"""
+        keyset = sort_keyset(OFFERING_PAGE_SORTS, order_by, descending, ('co.offering_id', 0))
+        conditions, params = [], []
+        if ids is not None:
+            conditions.append("co.offering_id = ANY(%s)")
+            params.append(list(ids))
+        for column, value in (('co.semester_id', semester_id), ('c.department_id', department_id),
+                              ('co.instructor_id', instructor_id)):
+            if value:
+                conditions.append(f"{column} = %s")
+                params.append(value)
+        query, params = page_query("""
+        SELECT co.offering_id, c.course_name, c.course_code, s.semester_name, s.year, d.department_name, u.first_name || ' ' || u.last_name as instructor_name
+        FROM course_offering co
+        JOIN course c ON co.course_id = c.course_id
+        JOIN semester s ON co.semester_id = s.semester_id
+        JOIN department d ON c.department_id = d.department_id
+        JOIN teacher t ON co.instructor_id = t.teacher_id
+        JOIN "user" u ON t.user_id = u.user_id
+        """, conditions, params, keyset, after, limit)
+        return page_result(self.fetch_all(query, params), keyset, limit)
 
     def get_teaching_courses(self, teacher_id):
         """Get courses taught by a teacher with department names"""
         query = """
         SELECT co.offering_id, c.course_name, c.course_code, 
-               s.semester_name, s.year, d.department_name
+               s.semester_name, s.year, d.department_name, co.seats_taken, co.capacity
         FROM course_offering co
         JOIN course c ON co.course_id = c.course_id
         JOIN semester s ON co.semester_id = s.semester_id
@@ -367,7 +1368,8 @@ class Database:
         """
         return self.fetch_all(query, (teacher_id,))
 
-    def create_course_offering(self, course_id, semester_id, instructor_id):
+    def create_course_offering(self, course_id, semester_id, instructor_id, capacity=None):
+        """Offer a course in a semester; capacity limits its seats (None: unlimited)"""
         # Check that the teacher is from the same department as the course
         teacher_dept = self.fetch_one("SELECT department_id FROM teacher WHERE teacher_id = %s", (instructor_id,))
         course_dept = self.fetch_one("SELECT department_id FROM course WHERE course_id = %s", (course_id,))
@@ -378,11 +1380,11 @@ class Database:
         if exists:
             raise Exception("This course is already offered by another teacher in this semester.")
         query = """
-        INSERT INTO course_offering (course_id, semester_id, instructor_id)
-        VALUES (%s, %s, %s)
+        INSERT INTO course_offering (course_id, semester_id, instructor_id, capacity)
+        VALUES (%s, %s, %s, %s)
         RETURNING offering_id
         """
-        return self.fetch_one(query, (course_id, semester_id, instructor_id))
+        return self.fetch_one(query, (course_id, semester_id, instructor_id, capacity))
 
     def update_course_offering(self, offering_id, course_id, semester_id, instructor_id):
         query = """
@@ -392,6 +1394,28 @@ class Database:
         """
         return self.execute_query(query, (course_id, semester_id, instructor_id, offering_id))
 
+    def set_offering_capacity(self, offering_id, capacity):
+        """Change an offering's seat limit (None: unlimited); returns (success, message)"""
+        query = """
+        UPDATE course_offering SET capacity = %s
+        WHERE offering_id = %s AND (%s::integer IS NULL OR seats_taken <= %s)
+        RETURNING offering_id
+        """
+        if self.fetch_one(query, (capacity, offering_id, capacity, capacity)):
+            return True, "Capacity updated"
+        offering = self.fetch_one("SELECT seats_taken FROM course_offering WHERE offering_id = %s", (offering_id,))
+        if offering is None:
+            return False, "Failed to update capacity"
+        return False, f"Capacity cannot be below the {offering[0]} seats already taken"
+
+    def reconcile_seats(self):
+        """Recount seats_taken from the enrollments; returns (offering_id, recorded, actual) per fix"""
+        return self.fetch_all("SELECT offering_id, recorded, actual FROM reconcile_seats()")
+
+    def delete_course_offering(self, offering_id):
+        """Delete an offering and its enrollments; True on success"""
+        return self.execute_query("DELETE FROM course_offering WHERE offering_id = %s", (offering_id,)) is not None
+
     def update_user_password(self, user_id, new_password):
         query = "UPDATE \"user\" SET password = %s WHERE user_id = %s"
         return self.execute_query(query, (new_password, user_id))
@@ -418,7 +1442,7 @@ class Database:
                 ects = %s, level = %s, type = %s, department_id = %s
             WHERE course_id = %s
             """
-            self.execute_query(query, (
+            cursor = self.execute_query(query, (
                 course_data['course_name'],
                 course_data['course_code'],
                 course_data['credits'],
@@ -428,6 +1452,8 @@ class Database:
                 course_data['department_id'],
                 course_id
             ))
+            if cursor is None:
+                return False, "Failed to update course"
             return True, "Course updated successfully"
         except Exception as e:
             return False, f"Failed to update course: {str(e)}"
@@ -445,8 +1471,16 @@ class Database:
         """
         return self.fetch_one(query, (course_name, course_code, credits, ects, level, type, department_id))
 
+    def delete_course(self, course_id):
+        """Delete a course with its offerings and enrollments; True on success"""
+        return self.execute_query("DELETE FROM course WHERE course_id = %s", (course_id,)) is not None
+
     def get_all_offered_courses_for_student(self, student_id):
-        """Get all courses offered in the current semester for the student's level and department restrictions, including instructor name"""
+        """Get all courses offered in the current semester for the student's level and department restrictions, including instructor name.
+
+        The last column is the number of seats left (None when the offering has
+        no capacity), read from the maintained seats_taken counter.
+        """
         # Get student info
         student = self.fetch_one("SELECT level, department_id FROM student WHERE student_id = %s", (student_id,))
         if not student:
@@ -459,7 +1493,8 @@ class Database:
         semester_id = semester[0]
         # Only show courses that are offered in the current semester
         query = """
-        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects, c.level, c.type, d.department_name, u.first_name || ' ' || u.last_name as instructor_name
+        SELECT c.course_id, c.course_name, c.course_code, c.credits, c.ects, c.level, c.type, d.department_name, u.first_name || ' ' || u.last_name as instructor_name,
+               co.capacity - co.seats_taken AS seats_left
         FROM course_offering co
         JOIN course c ON co.course_id = c.course_id
         JOIN department d ON c.department_id = d.department_id
@@ -0,0 +1,390 @@
+"""Generate an internally consistent synthetic university of any size.
+
+Usage:
+    python datagen.py                                fill course_management_scale with the default size
+    python datagen.py --students 125000              one million enrollments (8 per student)
+    python datagen.py --dbname load_test --workers 8
+
+The target database (--dbname, default course_management_scale) lives on the
+server from config.py; it is created from database_setup.sql and migrated if
+needed, then emptied, so it must never be the application database. Every row
+is computed from its id, so the data is built in chunks by several worker
+processes, each loading its chunk with COPY over its own connection. Tables
+are loaded phase by phase so foreign keys only ever point at loaded rows.
+
+The data obeys the enroll_student rules: students only hold courses of their
+own department and level, once each, in an offering that has started.
+Semesters are contiguous (Spring Feb-Jul, Fall Aug-Jan) up to the current
+year, so there is always a current one. --capacity limits every offering to
+that many seats (or the seats it already holds, if more), so loadsim.py can
+exercise full courses. When the role may set
+session_replication_role, foreign key checks and triggers are skipped during
+the load (the data is consistent by construction); --check-constraints keeps
+them on.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import psycopg2
+from config import DB_CONFIG
+import migrate
+
+SETUP_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_setup.sql')
+# Rows per COPY; each chunk is one worker task and one transaction
+CHUNK_ROWS = 100000
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+TERMS = (('Spring', 2), ('Fall', 8))
+COURSE_TYPES = ('Must', 'Elective', 'Technical Elective')
+
+COLUMNS = {
+    'department': ('department_id', 'department_name'),
+    'semester': ('semester_id', 'semester_name', 'year', 'start_date', 'end_date'),
+    'user': ('user_id', 'username', 'password', 'role', 'first_name', 'last_name'),
+    'student': ('student_id', 'user_id', 'student_number', 'email', 'department_id', 'first_name', 'last_name',
+                'level'),
+    'teacher': ('teacher_id', 'user_id', 'email', 'department_id', 'first_name', 'last_name'),
+    'course': ('course_id', 'course_name', 'course_code', 'credits', 'ects', 'level', 'type', 'department_id'),
+    'course_offering': ('offering_id', 'course_id', 'semester_id', 'instructor_id'),
+    'enrolls_in': ('enrollment_id', 'student_id', 'course_id', 'offering_id', 'created_at'),
+}
+# Tables of one phase only reference tables of earlier phases
+PHASES = (
+    ('department', 'semester'),
+    ('user',),
+    ('student', 'teacher', 'course'),
+    ('course_offering',),
+    ('enrolls_in',),
+)
+SERIAL_COLUMNS = {
+    'department': 'department_id',
+    'semester': 'semester_id',
+    'user': 'user_id',
+    'student': 'student_id',
+    'teacher': 'teacher_id',
+    'course': 'course_id',
+    'course_offering': 'offering_id',
+    'enrolls_in': 'enrollment_id',
+}
+
+
+class Scale:
+    """Size of the synthetic university"""
+
+    def __init__(self, departments=20, teachers=2000, students=100000, courses=5000, years=10,
+                 enrollments_per_student=8, capacity=None):
+        if courses < 4 * departments:
+            raise ValueError("Need at least 4 courses per department (every fourth one is a Master course)")
+        if teachers < departments:
+            raise ValueError("Need at least one teacher per department")
+        if capacity is not None and capacity < 0:
+            raise ValueError("Capacity cannot be negative")
+        self.departments = departments
+        self.teachers = teachers
+        self.students = students
+        self.courses = courses
+        self.years = years
+        self.enrollments_per_student = enrollments_per_student
+        self.capacity = capacity
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class Layout:
+    """Arithmetic numbering of the synthetic data; every row follows from its id.
+
+    Course g belongs to department 1 + (g-1) % D and, counting within its
+    department, every fourth course is a Master course. Semester 2y+1 is the
+    Spring and 2y+2 the Fall of year y (counted from the first year). Course g
+    is offered once a year, in Spring for odd g and Fall for even g, as
+    offering y*C + g, by a teacher of its department. User 1 is the admin,
+    users 2..T+1 the teachers and the rest the students. Student s takes k
+    courses of its department and level; enrollment (s-1)*k + i + 1 is its
+    i-th, in one of the four latest started offerings of that course.
+    """
+
+    def __init__(self, scale, today):
+        self.scale = scale
+        self.today = today
+        self.per_department = scale.courses // scale.departments
+        self.masters = self.per_department // 4
+        self.bachelors = self.per_department - self.masters
+        self.teachers_per_department = scale.teachers // scale.departments
+        self.first_year = today.year - scale.years + 1
+        # Per term, the years whose semester has started, latest first
+        self.started = [
+            [y for y in reversed(range(scale.years)) if date(self.first_year + y, month, 1) <= today]
+            for _, month in TERMS
+        ]
+
+    def keys(self, table):
+        """Number of ids to generate for table"""
+        scale = self.scale
+        return {
+            'department': scale.departments,
+            'semester': 2 * scale.years,
+            'user': 1 + scale.teachers + scale.students,
+            'student': scale.students,
+            'teacher': scale.teachers,
+            'course': scale.courses,
+            'course_offering': scale.years * scale.courses,
+            'enrolls_in': scale.students,  # one key per student
+        }[table]
+
+    def rows_per_key(self, table):
+        return self.scale.enrollments_per_student if table == 'enrolls_in' else 1
+
+    def rows(self, table, start, stop):
+        """Rows of table for the keys start..stop-1, in COLUMNS order"""
+        return getattr(self, f"{table}_rows")(start, stop)
+
+    def department(self, n):
+        return 1 + (n - 1) % self.scale.departments
+
+    def department_rows(self, start, stop):
+        for department_id in range(start, stop):
+            yield department_id, f"Department {department_id}"
+
+    def semester_rows(self, start, stop):
+        for semester_id in range(start, stop):
+            y, term = divmod(semester_id - 1, 2)
+            name, month = TERMS[term]
+            year = self.first_year + y
+            end = date(year, 7, 31) if name == 'Spring' else date(year + 1, 1, 31)
+            yield semester_id, name, year, date(year, month, 1), end
+
+    def user_rows(self, start, stop):
+        teachers = self.scale.teachers
+        for user_id in range(start, stop):
+            if user_id == 1:
+                yield user_id, 'admin', 'admin', 'admin', 'Admin', 'User'
+            elif user_id <= teachers + 1:
+                n = user_id - 1
+                yield user_id, f"teacher{n}", 'password', 'teacher', 'Teacher', f"T{n}"
+            else:
+                n = user_id - 1 - teachers
+                yield user_id, f"student{n}", 'password', 'student', 'Student', f"S{n}"
+
+    def student_level(self, student_id):
+        return 'Master' if student_id % 5 == 0 else 'Bachelor'
+
+    def student_rows(self, start, stop):
+        first_user = self.scale.teachers + 1
+        for student_id in range(start, stop):
+            yield (student_id, first_user + student_id, f"S{student_id:08d}", f"student{student_id}@example.edu",
+                   self.department(student_id), 'Student', f"S{student_id}", self.student_level(student_id))
+
+    def teacher_rows(self, start, stop):
+        for teacher_id in range(start, stop):
+            yield (teacher_id, teacher_id + 1, f"teacher{teacher_id}@example.edu", self.department(teacher_id),
+                   'Teacher', f"T{teacher_id}")
+
+    def course_rows(self, start, stop):
+        d = self.scale.departments
+        for course_id in range(start, stop):
+            j = (course_id - 1) // d
+            yield (course_id, f"Course {course_id}", f"C{course_id:06d}", 3 + course_id % 3, 5 + course_id % 3,
+                   'Master' if j % 4 == 3 else 'Bachelor', COURSE_TYPES[j % 3], self.department(course_id))
+
+    def offering_id(self, course_id, y):
+        return y * self.scale.courses + course_id
+
+    def course_offering_rows(self, start, stop):
+        d = self.scale.departments
+        for offering_id in range(start, stop):
+            y, index = divmod(offering_id - 1, self.scale.courses)
+            course_id = index + 1
+            term = 0 if course_id % 2 else 1
+            instructor_id = self.department(course_id) + d * (
+                ((course_id - 1) // d + self.first_year + y) % self.teachers_per_department)
+            yield offering_id, course_id, 2 * y + term + 1, instructor_id
+
+    def enrolls_in_rows(self, start, stop):
+        d = self.scale.departments
+        k = self.scale.enrollments_per_student
+        for student_id in range(start, stop):
+            master = self.student_level(student_id) == 'Master'
+            count = self.masters if master else self.bachelors
+            department_id = self.department(student_id)
+            for i in range(min(k, count)):
+                # The m-th Bachelor course of a department is its (m + m/3)-th
+                # course, the m-th Master course its (4m + 3)-th
+                m = (student_id * k + i) % count
+                course_id = department_id + d * (4 * m + 3 if master else m + m // 3)
+                term = 0 if course_id % 2 else 1
+                started = self.started[term]
+                pick = (student_id + i) % 4
+                if pick >= len(started):
+                    continue
+                y = started[pick]
+                yield ((student_id - 1) * k + i + 1, student_id, course_id, self.offering_id(course_id, y),
+                       date(self.first_year + y, TERMS[term][1], 1))
+
+
+def database_config(dbname):
+    config = dict(DB_CONFIG)
+    config['dbname'] = dbname
+    return config
+
+
+def create_database(dbname):
+    """Create the database with the full schema if it does not exist yet"""
+    admin = psycopg2.connect(**database_config('postgres'))
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (dbname,))
+            if cursor.fetchone():
+                return False
+            cursor.execute(f'CREATE DATABASE "{dbname}"')
+    finally:
+        admin.close()
+
+    conn = psycopg2.connect(**database_config(dbname))
+    try:
+        with open(SETUP_SQL, encoding='utf-8') as f, conn.cursor() as cursor:
+            cursor.execute(f.read())
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+
+def chunks(layout, table):
+    """(start, stop) key ranges of about CHUNK_ROWS rows each"""
+    step = max(1, CHUNK_ROWS // layout.rows_per_key(table))
+    last = layout.keys(table) + 1
+    return [(start, min(start + step, last)) for start in range(1, last, step)]
+
+
+def copy_chunk(config, scale, today, table, start, stop, skip_checks):
+    """Generate and COPY one chunk of table over a new connection; returns the row count.
+
+    Runs in a worker process. The values are numbers, dates and plain ASCII
+    names, so they need no escaping in COPY text format.
+    """
+    layout = Layout(scale, today)
+    lines = ['\t'.join(map(str, row)) for row in layout.rows(table, start, stop)]
+    if not lines:
+        return 0
+    buffer = io.StringIO('\n'.join(lines) + '\n')
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            if skip_checks:
+                cursor.execute("SET session_replication_role = replica")
+            cursor.copy_expert(f'COPY "{table}" ({", ".join(COLUMNS[table])}) FROM STDIN', buffer)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(lines)
+
+
+def can_skip_checks(conn):
+    """Whether this role may turn off foreign key checks and triggers for its session"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET session_replication_role = replica")
+        return True
+    except psycopg2.Error:
+        return False
+    finally:
+        conn.rollback()
+
+
+def generate(config, scale, workers=DEFAULT_WORKERS, check_constraints=False, today=None):
+    """Replace all data in the database at config with a university of the given scale.
+
+    Returns {table: rows loaded}.
+    """
+    today = today or date.today()
+    layout = Layout(scale, today)
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('TRUNCATE ' + ', '.join(f'"{table}"' for table in COLUMNS) + ' RESTART IDENTITY CASCADE')
+        conn.commit()
+        skip_checks = not check_constraints and can_skip_checks(conn)
+
+        counts = dict.fromkeys(COLUMNS, 0)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for phase in PHASES:
+                futures = [(table, pool.submit(copy_chunk, config, scale, today, table, start, stop, skip_checks))
+                           for table in phase for start, stop in chunks(layout, table)]
+                for table, future in futures:
+                    counts[table] += future.result()
+
+        # Ids were given explicitly, so move each sequence past them
+        with conn.cursor() as cursor:
+            for table, column in SERIAL_COLUMNS.items():
+                cursor.execute(f'SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(max({column}), 0) + 1, false) '
+                               f'FROM "{table}"', (f'"{table}"', column))
+            # seats_taken is only maintained by triggers, which may have been skipped
+            cursor.execute("SELECT count(*) FROM reconcile_seats()")
+            if scale.capacity is not None:
+                # Offerings already holding more students keep exactly their seats
+                cursor.execute("UPDATE course_offering SET capacity = GREATEST(%s, seats_taken)", (scale.capacity,))
+        conn.commit()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("VACUUM ANALYZE")
+        finally:
+            conn.autocommit = False
+    finally:
+        conn.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a database with a synthetic university")
+    parser.add_argument('--dbname', default='course_management_scale', help="target database (created if missing)")
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--teachers', type=int, default=2000)
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--courses', type=int, default=5000)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--enrollments-per-student', type=int, default=8)
+    parser.add_argument('--capacity', type=int, help="seats per offering (default: unlimited)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="parallel COPY processes")
+    parser.add_argument('--check-constraints', action='store_true',
+                        help="keep foreign key checks and triggers on during the load")
+    args = parser.parse_args(argv)
+
+    if args.dbname == DB_CONFIG.get('dbname'):
+        print("Refusing to overwrite the application database; pass a separate --dbname")
+        return 2
+    try:
+        scale = Scale(args.departments, args.teachers, args.students, args.courses, args.years,
+                      args.enrollments_per_student, args.capacity)
+    except ValueError as e:
+        print(e)
+        return 2
+    config = database_config(args.dbname)
+    started = time.perf_counter()
+    try:
+        if create_database(args.dbname):
+            print(f"Created database {args.dbname}")
+        conn = psycopg2.connect(**config)
+        try:
+            migrate.migrate(conn)
+        finally:
+            conn.close()
+        counts = generate(config, scale, args.workers, args.check_constraints)
+    except psycopg2.Error as e:
+        print(f"Could not generate the data: {e}")
+        return 1
+
+    for table, count in counts.items():
+        print(f"{table:16} {count:>12,}")
+    print(f"Generated {args.dbname} in {time.perf_counter() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
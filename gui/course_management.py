@@ -1,12 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from database import Database
+from gui.virtual_tree import VirtualTreeview, PagedRowSource
+from gui.task_runner import TaskRunner
 
 class CourseManagementFrame(ttk.Frame):
-    def __init__(self, parent, db, user):
+    def __init__(self, parent, db, user, tasks=None):
         super().__init__(parent)
         self.db = db
         self.user = user
+        self.tasks = tasks or TaskRunner(self)
         self.setup_ui()
 
     def setup_ui(self):
@@ -38,12 +41,19 @@ class CourseManagementFrame(ttk.Frame):
         )
         refresh_btn.pack(side=tk.LEFT, padx=5)
 
-        # Create Treeview for courses
+        # Code/name search
+        ttk.Label(buttons_frame, text="Search:").pack(side=tk.LEFT, padx=(15, 5))
+        self.course_search_var = tk.StringVar()
+        search_entry = ttk.Entry(buttons_frame, textvariable=self.course_search_var, width=20)
+        search_entry.pack(side=tk.LEFT)
+        search_entry.bind('<Return>', lambda e: self.refresh_courses())
+
+        # Create Treeview for courses; rows are pulled a page at a time as the list scrolls
         columns = ('course_id', 'course_name', 'course_code', 'credits', 'ects', 'level', 'type', 'department')
-        self.tree = ttk.Treeview(
+        self.tree = VirtualTreeview(
             self.main_container,
             columns=columns,
-            show='headings'
+            tasks=self.tasks
         )
 
         # Define headings
@@ -66,31 +76,61 @@ class CourseManagementFrame(ttk.Frame):
         self.tree.column('type', width=150)
         self.tree.column('department', width=150)
 
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(self.main_container, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-
-        # Pack tree and scrollbar
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Pack tree (it has its own scrollbar)
+        self.tree.pack(fill=tk.BOTH, expand=True)
 
         # Bind double-click event
         self.tree.bind('<Double-1>', self.on_course_select)
 
-        # Load initial data
+        # Load initial data, then follow changes made by any client
         self.refresh_courses()
+        self.tasks.watch(self.db, 'course', self.on_courses_changed, self)
+        # Rows show the department name, so a renamed department reloads the list
+        self.tasks.watch(self.db, 'department', lambda change: self.refresh_courses() if change['op'] != 'insert' else None, self)
 
     def refresh_courses(self):
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Fetch and display courses
-        courses = self.db.get_all_courses()
-        for course in courses:
-            self.tree.insert('', tk.END, values=course)
+        # Fetch courses page by page with the current search
+        search = self.course_search_var.get().strip() or None
+
+        def fetch_page(after, limit, order_by, descending):
+            return self.db.get_courses_page(
+                after=after, limit=limit, order_by=order_by or 'course_code', descending=descending,
+                search=search
+            )
+
+        def fetch_rows(course_ids):
+            return self.db.get_courses_page(limit=len(course_ids), search=search, ids=course_ids)[0]
+
+        source = PagedRowSource(
+            fetch_page,
+            sort_keys={'course_id': 'course_id', 'course_name': 'course_name', 'course_code': 'course_code'},
+            fetch_rows=fetch_rows
+        )
+        # Load the first page on a worker, then show it
+        self.tasks.submit(source.load, 1, key='courses', on_success=lambda _: self.tree.set_source(source))
+
+    def on_courses_changed(self, change):
+        # New rows need their place in the sort order, so those reload the list;
+        # edits and deletes patch just the affected rows
+        source = self.tree.source
+        if change['rows'] is None or change['op'] not in ('update', 'delete') or not getattr(source, 'fetch_rows', None):
+            self.refresh_courses()
+            return
+        course_ids = [row['course_id'] for row in change['rows']]
+        if change['op'] == 'delete':
+            self.tree.patch(course_ids, [])
+        else:
+            self.tasks.submit(source.fetch_rows, course_ids, on_success=lambda rows: self.tree.patch(course_ids, rows))
 
     def show_add_course_dialog(self):
+        # Load the department choices on a worker, then open the form
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load departments: {str(e)}")
+
+        self.tasks.submit(self.db.get_all_departments, key='course_dialog',
+                          on_success=self.open_add_course_dialog, on_error=failed)
+
+    def open_add_course_dialog(self, departments):
         # Create dialog window
         dialog = tk.Toplevel(self)
         dialog.title("Add New Course")
@@ -143,7 +183,6 @@ class CourseManagementFrame(ttk.Frame):
         # Department
         ttk.Label(form_frame, text="Department:", font=("Helvetica", 11)).grid(row=6, column=0, sticky=tk.W, pady=8, padx=4)
         department_var = tk.StringVar()
-        departments = self.db.get_all_departments()
         department_combo = ttk.Combobox(form_frame, textvariable=department_var, font=("Helvetica", 11))
         department_combo['values'] = [dept[1] for dept in departments]
         department_combo.grid(row=6, column=1, sticky=(tk.W, tk.E), pady=8, padx=4)
@@ -158,21 +197,10 @@ class CourseManagementFrame(ttk.Frame):
                     messagebox.showerror("Error", "Please fill in all fields", parent=dialog)
                     return
 
-                # Check for duplicate course code
-                if self.db.check_course_code_exists(course_code_var.get()):
-                    messagebox.showerror("Error", "This course code already exists.", parent=dialog)
-                    return
-
                 # Get department ID
                 dept_name = department_var.get()
                 dept_id = next(dept[0] for dept in departments if dept[1] == dept_name)
-
-                # Insert course
-                query = """
-                INSERT INTO course (course_name, course_code, credits, ects, level, type, department_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-                self.db.execute_query(query, (
+                params = (
                     course_name_var.get(),
                     course_code_var.get(),
                     int(credits_var.get()),
@@ -180,10 +208,33 @@ class CourseManagementFrame(ttk.Frame):
                     level_var.get(),
                     type_var.get(),
                     dept_id
-                ))
-                messagebox.showinfo("Success", "Course added successfully!", parent=dialog)
-                dialog.destroy()
-                self.refresh_courses()
+                )
+
+                def create():
+                    # Check for duplicate course code
+                    if self.db.check_course_code_exists(params[1]):
+                        return False, "This course code already exists."
+                    # Insert course
+                    if self.db.create_course(*params) is None:
+                        return False, "Failed to add course"
+                    return True, "Course added successfully!"
+
+                def done(result):
+                    success, message = result
+                    if not success:
+                        save_btn.configure(state=tk.NORMAL)
+                        messagebox.showerror("Error", message, parent=dialog)
+                        return
+                    messagebox.showinfo("Success", message, parent=dialog)
+                    dialog.destroy()
+                    self.refresh_courses()
+
+                def failed(e):
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", f"Failed to add course: {str(e)}", parent=dialog)
+
+                save_btn.configure(state=tk.DISABLED)
+                self.tasks.submit(create, on_success=done, on_error=failed)
             except ValueError:
                 messagebox.showerror("Error", "Credits and ECTS must be numbers", parent=dialog)
             except Exception as e:
@@ -206,6 +257,18 @@ class CourseManagementFrame(ttk.Frame):
         self.show_course_details(course_id)
 
     def show_course_details(self, course_id):
+        def show(course):
+            if not course:
+                messagebox.showerror("Error", "Course not found")
+                return
+            self.open_course_details(course_id, course)
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load course: {str(e)}")
+
+        self.tasks.submit(self.db.get_course_by_id, course_id, key='course_dialog', on_success=show, on_error=failed)
+
+    def open_course_details(self, course_id, course):
         # Create dialog window
         dialog = tk.Toplevel(self)
         dialog.title("Course Details")
@@ -217,13 +280,6 @@ class CourseManagementFrame(ttk.Frame):
         header = ttk.Label(dialog, text="Course Details", font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
 
-        # Get course details
-        course = self.db.get_course_by_id(course_id)
-        if not course:
-            messagebox.showerror("Error", "Course not found", parent=dialog)
-            dialog.destroy()
-            return
-
         # Create details frame
         details_frame = ttk.Frame(dialog, padding="24 18 24 18")
         details_frame.pack(fill=tk.BOTH, expand=True)
@@ -244,6 +300,22 @@ class CourseManagementFrame(ttk.Frame):
         delete_btn.pack(side=tk.RIGHT, padx=8)
 
     def edit_course(self, course_id, parent_dialog=None):
+        def fetch():
+            return self.db.get_course_by_id(course_id), self.db.get_all_departments()
+
+        def show(result):
+            course, departments = result
+            if not course:
+                messagebox.showerror("Error", "Course not found")
+                return
+            self.open_edit_course_dialog(course_id, course, departments, parent_dialog)
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load course: {str(e)}")
+
+        self.tasks.submit(fetch, key='course_dialog', on_success=show, on_error=failed)
+
+    def open_edit_course_dialog(self, course_id, course, departments, parent_dialog=None):
         # Create dialog window
         dialog = tk.Toplevel(self)
         dialog.title("Edit Course")
@@ -255,13 +327,6 @@ class CourseManagementFrame(ttk.Frame):
         header = ttk.Label(dialog, text="Edit Course", font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
 
-        # Get course details
-        course = self.db.get_course_by_id(course_id)
-        if not course:
-            messagebox.showerror("Error", "Course not found", parent=dialog)
-            dialog.destroy()
-            return
-
         # Create form
         form_frame = ttk.Frame(dialog, padding="24 18 24 18")
         form_frame.pack(fill=tk.BOTH, expand=True)
@@ -303,7 +368,6 @@ class CourseManagementFrame(ttk.Frame):
         # Department
         ttk.Label(form_frame, text="Department:", font=("Helvetica", 11)).grid(row=6, column=0, sticky=tk.W, pady=8, padx=4)
         department_var = tk.StringVar(value=course[7])  # department name
-        departments = self.db.get_all_departments()
         department_combo = ttk.Combobox(form_frame, textvariable=department_var, font=("Helvetica", 11))
         department_combo['values'] = [dept[1] for dept in departments]
         department_combo.grid(row=6, column=1, sticky=(tk.W, tk.E), pady=8, padx=4)
@@ -320,27 +384,34 @@ class CourseManagementFrame(ttk.Frame):
                 dept_name = department_var.get()
                 dept_id = next(dept[0] for dept in departments if dept[1] == dept_name)
                 # Update course
-                query = """
-                UPDATE course 
-                SET course_name = %s, course_code = %s, credits = %s, ects = %s, 
-                    level = %s, type = %s, department_id = %s
-                WHERE course_id = %s
-                """
-                self.db.execute_query(query, (
-                    course_name_var.get(),
-                    course_code_var.get(),
-                    int(credits_var.get()),
-                    int(ects_var.get()),
-                    level_var.get(),
-                    type_var.get(),
-                    dept_id,
-                    course_id
-                ))
-                messagebox.showinfo("Success", "Course updated successfully!", parent=dialog)
-                dialog.destroy()
-                if parent_dialog:
-                    parent_dialog.destroy()
-                self.refresh_courses()
+                course_data = {
+                    'course_name': course_name_var.get(),
+                    'course_code': course_code_var.get(),
+                    'credits': int(credits_var.get()),
+                    'ects': int(ects_var.get()),
+                    'level': level_var.get(),
+                    'type': type_var.get(),
+                    'department_id': dept_id
+                }
+
+                def done(result):
+                    success, message = result
+                    if not success:
+                        save_btn.configure(state=tk.NORMAL)
+                        messagebox.showerror("Error", message, parent=dialog)
+                        return
+                    messagebox.showinfo("Success", "Course updated successfully!", parent=dialog)
+                    dialog.destroy()
+                    if parent_dialog:
+                        parent_dialog.destroy()
+                    self.refresh_courses()
+
+                def failed(e):
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", f"Failed to update course: {str(e)}", parent=dialog)
+
+                save_btn.configure(state=tk.DISABLED)
+                self.tasks.submit(self.db.update_course, course_id, course_data, on_success=done, on_error=failed)
             except ValueError:
                 messagebox.showerror("Error", "Credits and ECTS must be numbers", parent=dialog)
             except Exception as e:
@@ -355,13 +426,19 @@ class CourseManagementFrame(ttk.Frame):
         cancel_btn.pack(side=tk.RIGHT, padx=8)
 
     def delete_course(self, course_id, parent_dialog=None):
-        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this course?"):
-            try:
-                query = "DELETE FROM course WHERE course_id = %s"
-                self.db.execute_query(query, (course_id,))
-                messagebox.showinfo("Success", "Course deleted successfully!")
-                if parent_dialog:
-                    parent_dialog.destroy()
-                self.refresh_courses()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete course: {str(e)}") 
\ No newline at end of file
+        if not messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this course?"):
+            return
+
+        def done(deleted):
+            if not deleted:
+                messagebox.showerror("Error", "Failed to delete course")
+                return
+            messagebox.showinfo("Success", "Course deleted successfully!")
+            if parent_dialog:
+                parent_dialog.destroy()
+            self.refresh_courses()
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to delete course: {str(e)}")
+
+        self.tasks.submit(self.db.delete_course, course_id, on_success=done, on_error=failed) 
\ No newline at end of file
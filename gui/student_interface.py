@@ -1,12 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import Database, ENROLLMENT_MESSAGES
+from gui.task_runner import TaskRunner
+from gui.tree_sync import sync_tree, append_rows
+
+
+def enrolled_key(row):
+    # A retaken course is listed once per semester
+    return (row[0], row[8], row[9])
+
 
 class StudentInterface(ttk.Frame):
-    def __init__(self, parent, db, user):
+    def __init__(self, parent, db, user, tasks=None):
         super().__init__(parent)
         self.db = db
         self.user = user
+        self.tasks = tasks or TaskRunner(self)
         self.setup_ui()
 
     def setup_ui(self):
@@ -25,9 +34,11 @@ class StudentInterface(ttk.Frame):
         # Create tabs
         self.available_courses_tab = ttk.Frame(self.notebook)
         self.enrolled_courses_tab = ttk.Frame(self.notebook)
+        self.waitlist_tab = ttk.Frame(self.notebook)
 
         self.notebook.add(self.available_courses_tab, text="Available Courses")
         self.notebook.add(self.enrolled_courses_tab, text="Enrolled Courses")
+        self.notebook.add(self.waitlist_tab, text="Waitlist")
 
         # Setup available courses tab
         self.setup_available_courses_tab()
@@ -35,9 +46,12 @@ class StudentInterface(ttk.Frame):
         # Setup enrolled courses tab
         self.setup_enrolled_courses_tab()
 
+        # Setup waitlist tab
+        self.setup_waitlist_tab()
+
     def setup_available_courses_tab(self):
         # Create Treeview for available courses
-        columns = ('course_id', 'course_name', 'course_code', 'credits', 'ects', 'level', 'type', 'department', 'instructor')
+        columns = ('course_id', 'course_name', 'course_code', 'credits', 'ects', 'level', 'type', 'department', 'instructor', 'seats')
         self.available_tree = ttk.Treeview(
             self.available_courses_tab,
             columns=columns,
@@ -54,6 +68,7 @@ class StudentInterface(ttk.Frame):
         self.available_tree.heading('type', text='Type')
         self.available_tree.heading('department', text='Department')
         self.available_tree.heading('instructor', text='Instructor')
+        self.available_tree.heading('seats', text='Seats Left')
 
         # Define columns
         self.available_tree.column('course_id', width=50)
@@ -65,6 +80,7 @@ class StudentInterface(ttk.Frame):
         self.available_tree.column('type', width=150)
         self.available_tree.column('department', width=150)
         self.available_tree.column('instructor', width=150)
+        self.available_tree.column('seats', width=80)
 
         # Add scrollbar
         scrollbar = ttk.Scrollbar(self.available_courses_tab, orient=tk.VERTICAL, command=self.available_tree.yview)
@@ -77,10 +93,15 @@ class StudentInterface(ttk.Frame):
         # Bind double-click event
         self.available_tree.bind('<Double-1>', self.on_available_course_select)
 
-        # Load initial data
-        self.refresh_available_courses()
-
     def setup_enrolled_courses_tab(self):
+        # Load More button (enrollments are fetched a page at a time)
+        self.load_more_enrolled_btn = ttk.Button(
+            self.enrolled_courses_tab,
+            text="Load More",
+            command=self.load_more_enrolled_courses
+        )
+        self.load_more_enrolled_btn.pack(side=tk.BOTTOM, pady=(10, 0))
+
         # Create Treeview for enrolled courses
         columns = ('course_id', 'course_name', 'course_code', 'credits', 'ects', 'level', 'type', 'department', 'semester', 'year')
         self.enrolled_tree = ttk.Treeview(
@@ -124,44 +145,143 @@ class StudentInterface(ttk.Frame):
         # Bind double-click event
         self.enrolled_tree.bind('<Double-1>', self.on_enrolled_course_select)
 
-        # Load initial data
-        self.refresh_enrolled_courses()
+        # Load both tabs, then follow changes made by any client
+        self.refresh_courses()
+        self.tasks.watch(self.db, 'enrolls_in', self.on_enrollments_changed, self)
+        self.tasks.watch(self.db, 'course_offering', lambda change: self.refresh_courses(), self)
+        self.tasks.watch(self.db, 'course', lambda change: self.refresh_courses(), self)
+
+    def setup_waitlist_tab(self):
+        # Leave button
+        leave_btn = ttk.Button(
+            self.waitlist_tab,
+            text="Leave Waitlist",
+            command=self.leave_waitlist
+        )
+        leave_btn.pack(side=tk.BOTTOM, pady=(10, 0))
 
-    def refresh_available_courses(self):
-        # Clear existing items
-        for item in self.available_tree.get_children():
-            self.available_tree.delete(item)
+        # Create Treeview for waitlisted courses
+        columns = ('course_id', 'course_name', 'course_code', 'semester', 'year', 'position')
+        self.waitlist_tree = ttk.Treeview(
+            self.waitlist_tab,
+            columns=columns,
+            show='headings'
+        )
 
-        # Get student ID
-        student = self.db.get_student(self.user['user_id'])
-        if not student:
-            return
+        # Define headings
+        self.waitlist_tree.heading('course_id', text='ID')
+        self.waitlist_tree.heading('course_name', text='Course Name')
+        self.waitlist_tree.heading('course_code', text='Course Code')
+        self.waitlist_tree.heading('semester', text='Semester')
+        self.waitlist_tree.heading('year', text='Year')
+        self.waitlist_tree.heading('position', text='Position')
 
-        # Get all offered courses for the student (with instructor)
-        courses = self.db.get_all_offered_courses_for_student(student[0])
-        # courses: (course_id, course_name, course_code, credits, ects, level, type, department_name, instructor_name)
-        # Remove already enrolled courses
-        enrolled_courses = self.db.get_student_courses(student[0])  # student[0] is student_id
-        enrolled_course_ids = {course[0] for course in enrolled_courses}
-
-        for course in courses:
-            if course[0] not in enrolled_course_ids:
-                self.available_tree.insert('', tk.END, values=course)
-
-    def refresh_enrolled_courses(self):
-        # Clear existing items
-        for item in self.enrolled_tree.get_children():
-            self.enrolled_tree.delete(item)
-
-        # Get student ID
-        student = self.db.get_student(self.user['user_id'])
-        if not student:
+        # Define columns
+        self.waitlist_tree.column('course_id', width=50)
+        self.waitlist_tree.column('course_name', width=200)
+        self.waitlist_tree.column('course_code', width=100)
+        self.waitlist_tree.column('semester', width=150)
+        self.waitlist_tree.column('year', width=100)
+        self.waitlist_tree.column('position', width=80)
+
+        # Add scrollbar
+        scrollbar = ttk.Scrollbar(self.waitlist_tab, orient=tk.VERTICAL, command=self.waitlist_tree.yview)
+        self.waitlist_tree.configure(yscrollcommand=scrollbar.set)
+
+        # Pack tree and scrollbar
+        self.waitlist_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Offerings this student is queued for, to tell which changes move them up
+        self.waitlist_offerings = set()
+        self.refresh_waitlist()
+        self.tasks.watch(self.db, 'waitlist', self.on_waitlist_changed, self)
+
+    def on_waitlist_changed(self, change):
+        # Own entries come and go; others leaving the same queue move this student up
+        student_id = self.user.student_id
+        rows = change['rows']
+        if rows is None or any(
+            row['student_id'] == student_id
+            or (change['op'] == 'delete' and row['offering_id'] in self.waitlist_offerings)
+            for row in rows
+        ):
+            self.refresh_waitlist()
+
+    def refresh_waitlist(self):
+        def fetch():
+            student_id = self.user.student_id
+            if not student_id:
+                return []
+            return self.db.get_waitlist(student_id)
+
+        def show(entries):
+            # entries: (course_id, course_name, course_code, semester_name, year, queue_position, offering_id)
+            self.waitlist_offerings = {entry[6] for entry in entries}
+            sync_tree(self.waitlist_tree, [tuple(entry[:6]) for entry in entries])
+
+        self.tasks.submit(fetch, key='waitlist', on_success=show)
+
+    def leave_waitlist(self):
+        selection = self.waitlist_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a course to leave the waitlist for")
+            return
+        course_id = self.waitlist_tree.item(selection[0])['values'][0]
+        if not messagebox.askyesno("Confirm", "Are you sure you want to give up your place on this waitlist?"):
             return
 
-        # Fetch and display enrolled courses
-        courses = self.db.get_student_courses(student[0])  # student[0] is student_id
-        for course in courses:
-            self.enrolled_tree.insert('', tk.END, values=course)
+        def done(left):
+            if not left:
+                messagebox.showerror("Error", "Failed to leave the waitlist")
+            self.refresh_waitlist()
+
+        self.tasks.submit(self.db.leave_waitlist, self.user.student_id, course_id, on_success=done)
+
+    def on_enrollments_changed(self, change):
+        # Only this student's enrollments affect either list
+        student_id = self.user.student_id
+        if change['rows'] is None or any(row['student_id'] == student_id for row in change['rows']):
+            self.refresh_courses()
+
+    def refresh_courses(self):
+        # Available courses and the first page of enrolled courses in one query
+        def fetch():
+            # Student ID resolved at login
+            student_id = self.user.student_id
+            if not student_id:
+                return [], ([], None)
+            return self.db.get_student_dashboard(student_id)
+
+        def show(dashboard):
+            # available: (course_id, course_name, course_code, credits, ects, level, type, department_name, instructor_name, seats_left)
+            available, enrolled_page = dashboard
+            self.show_available_courses(available)
+            self.show_enrolled_page(enrolled_page, replace=True)
+
+        self.load_more_enrolled_btn.configure(state=tk.DISABLED)
+        self.tasks.submit(fetch, key='enrolled_courses', on_success=show)
+
+    def show_available_courses(self, courses):
+        # seats_left is None for offerings without a capacity
+        rows = [tuple(course[:9]) + ('' if course[9] is None else course[9],) for course in courses]
+        sync_tree(self.available_tree, rows)
+
+    def load_more_enrolled_courses(self):
+        # Fetch and display the next page of enrolled courses
+        self.load_more_enrolled_btn.configure(state=tk.DISABLED)
+        self.tasks.submit(
+            self.db.get_student_courses_page, self.user.student_id, after=self.enrolled_after,
+            key='enrolled_courses', on_success=self.show_enrolled_page
+        )
+
+    def show_enrolled_page(self, page, replace=False):
+        courses, self.enrolled_after = page
+        self.load_more_enrolled_btn.configure(state=tk.NORMAL if self.enrolled_after else tk.DISABLED)
+        if replace:
+            sync_tree(self.enrolled_tree, courses, key=enrolled_key)
+        else:
+            append_rows(self.enrolled_tree, courses, key=enrolled_key)
 
     def on_available_course_select(self, event):
         # Get selected item
@@ -180,10 +300,25 @@ class StudentInterface(ttk.Frame):
         self.show_course_details(course_id)
 
     def show_course_enrollment_dialog(self, course_id):
+        def fetch():
+            student_id = self.user.student_id
+            position = self.db.get_waitlist_position(student_id, course_id) if student_id else None
+            return self.db.get_course_by_id(course_id), position
+
+        def show(result):
+            course, position = result
+            if not course:
+                messagebox.showerror("Error", "Course not found")
+                return
+            self.open_course_enrollment_dialog(course_id, course, position)
+
+        self.tasks.submit(fetch, key='course_dialog', on_success=show)
+
+    def open_course_enrollment_dialog(self, course_id, course, position):
         dialog = tk.Toplevel(self)
         dialog.title("Course Enrollment")
-        dialog.geometry("520x440")
-        dialog.minsize(520, 440)
+        dialog.geometry("520x480")
+        dialog.minsize(520, 480)
         dialog.transient(self)
         dialog.grab_set()
 
@@ -191,13 +326,6 @@ class StudentInterface(ttk.Frame):
         header = ttk.Label(dialog, text="Course Enrollment", font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
 
-        # Get course details
-        course = self.db.get_course_by_id(course_id)
-        if not course:
-            messagebox.showerror("Error", "Course not found", parent=dialog)
-            dialog.destroy()
-            return
-
         # Create details frame
         details_frame = ttk.Frame(dialog, padding="24 18 24 18")
         details_frame.pack(fill=tk.BOTH, expand=True)
@@ -207,6 +335,9 @@ class StudentInterface(ttk.Frame):
         for row, (label, value) in enumerate(zip(labels, course)):
             ttk.Label(details_frame, text=f"{label}:", font=("Helvetica", 11, "bold")).grid(row=row, column=0, sticky=tk.W, pady=8, padx=4)
             ttk.Label(details_frame, text=str(value), font=("Helvetica", 11)).grid(row=row, column=1, sticky=tk.W, pady=8, padx=4)
+        if position:
+            ttk.Label(details_frame, text="Waitlist:", font=("Helvetica", 11, "bold")).grid(row=len(labels), column=0, sticky=tk.W, pady=8, padx=4)
+            ttk.Label(details_frame, text=f"Number {position} in line", font=("Helvetica", 11)).grid(row=len(labels), column=1, sticky=tk.W, pady=8, padx=4)
         details_frame.columnconfigure(1, weight=1)
 
         # Action buttons
@@ -218,6 +349,15 @@ class StudentInterface(ttk.Frame):
         cancel_btn.pack(side=tk.RIGHT, padx=8)
 
     def show_course_details(self, course_id):
+        def show(course):
+            if not course:
+                messagebox.showerror("Error", "Course not found")
+                return
+            self.open_course_details_dialog(course_id, course)
+
+        self.tasks.submit(self.db.get_course_by_id, course_id, key='course_dialog', on_success=show)
+
+    def open_course_details_dialog(self, course_id, course):
         dialog = tk.Toplevel(self)
         dialog.title("Course Details")
         dialog.geometry("520x440")
@@ -229,13 +369,6 @@ class StudentInterface(ttk.Frame):
         header = ttk.Label(dialog, text="Course Details", font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
 
-        # Get course details
-        course = self.db.get_course_by_id(course_id)
-        if not course:
-            messagebox.showerror("Error", "Course not found", parent=dialog)
-            dialog.destroy()
-            return
-
         # Create details frame
         details_frame = ttk.Frame(dialog, padding="24 18 24 18")
         details_frame.pack(fill=tk.BOTH, expand=True)
@@ -256,45 +389,80 @@ class StudentInterface(ttk.Frame):
         cancel_btn.pack(side=tk.RIGHT, padx=8)
 
     def enroll_in_course(self, course_id, dialog):
-        try:
-            # Get student ID
-            student = self.db.get_student(self.user['user_id'])
-            if not student:
-                messagebox.showerror("Error", "Student not found")
-                return
-
-            # Check if already enrolled
-            if self.db.is_student_enrolled(student[0], course_id):
-                messagebox.showerror("Error", "Already enrolled in this course")
-                return
-
-            # Enroll student
-            success, message = self.db.enroll_student(student[0], course_id)
-            if success:
+        def enroll():
+            student_id = self.user.student_id
+            if not student_id:
+                return False, "Student not found"
+            # Enroll student (validation, duplicate check and insert happen server-side)
+            reason, student_level = self.db.try_enroll(student_id, course_id)
+            return reason, ENROLLMENT_MESSAGES[reason].format(level=student_level)
+
+        def done(result):
+            reason, message = result
+            if reason == 'enrolled':
                 messagebox.showinfo("Success", message)
                 dialog.destroy()
                 # Refresh both course lists
-                self.refresh_available_courses()
-                self.refresh_enrolled_courses()
+                self.refresh_courses()
+            elif reason == 'offering_full':
+                if messagebox.askyesno("Course Full", f"{message} Join the waitlist? You will be enrolled "
+                                       "automatically when a seat frees up.", parent=dialog):
+                    self.join_waitlist(course_id, dialog)
             else:
                 messagebox.showerror("Error", message)
-        except Exception as e:
+
+        def failed(e):
             messagebox.showerror("Error", f"Failed to enroll in course: {str(e)}")
 
-    def drop_course(self, course_id, dialog):
-        if messagebox.askyesno("Confirm Drop", "Are you sure you want to drop this course?"):
-            try:
-                # Get student ID
-                student = self.db.get_student(self.user['user_id'])
-                if not student:
-                    messagebox.showerror("Error", "Student not found")
-                    return
-
-                query = "DELETE FROM enrolls_in WHERE student_id = %s AND course_id = %s"
-                self.db.execute_query(query, (student[0], course_id))
-                messagebox.showinfo("Success", "Successfully dropped course!")
+        self.tasks.submit(enroll, on_success=done, on_error=failed)
+
+    def join_waitlist(self, course_id, dialog):
+        def join():
+            student_id = self.user.student_id
+            if not student_id:
+                return 'student_not_found', None, None
+            return self.db.join_waitlist(student_id, course_id)
+
+        def done(result):
+            reason, student_level, position = result
+            if reason in ('waitlisted', 'already_waitlisted'):
+                messagebox.showinfo("Waitlist", f"{ENROLLMENT_MESSAGES[reason]}. You are number {position} in line.")
                 dialog.destroy()
-                self.refresh_available_courses()
-                self.refresh_enrolled_courses()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to drop course: {str(e)}") 
\ No newline at end of file
+                self.refresh_waitlist()
+            elif reason == 'enrolled':
+                # A seat freed up in the meantime
+                messagebox.showinfo("Success", ENROLLMENT_MESSAGES[reason])
+                dialog.destroy()
+                self.refresh_courses()
+            else:
+                messagebox.showerror("Error", ENROLLMENT_MESSAGES[reason].format(level=student_level))
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to join the waitlist: {str(e)}")
+
+        self.tasks.submit(join, on_success=done, on_error=failed)
+
+    def drop_course(self, course_id, dialog):
+        if not messagebox.askyesno("Confirm Drop", "Are you sure you want to drop this course?"):
+            return
+
+        def drop():
+            student_id = self.user.student_id
+            if not student_id:
+                return "Student not found"
+            if not self.db.drop_course(student_id, course_id):
+                return "Failed to drop course"
+            return None
+
+        def done(error):
+            if error:
+                messagebox.showerror("Error", error)
+                return
+            messagebox.showinfo("Success", "Successfully dropped course!")
+            dialog.destroy()
+            self.refresh_courses()
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to drop course: {str(e)}")
+
+        self.tasks.submit(drop, on_success=done, on_error=failed) 
\ No newline at end of file
@@ -0,0 +1,149 @@
+import logging
+import queue
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+logger = logging.getLogger(__name__)
+
+
+class TaskRunner:
+    """Runs blocking calls (Database queries) on a worker pool, off the Tk thread.
+
+    Results are handed back through a queue that the Tk thread polls with
+    after(), so callbacks always run on the Tk thread and may touch widgets.
+    Tasks submitted with the same key supersede each other: when the user
+    refreshes again, the older task is cancelled if it has not started and
+    its result is dropped if it has. Busy listeners are told when work starts
+    and when the last pending task finishes.
+
+    submit, cancel and add_busy_listener must be called from the Tk thread.
+    """
+
+    def __init__(self, root, max_workers=4, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gui-task')
+        self._results = queue.Queue()
+        self._calls = queue.Queue()     # (func, args) posted from other threads by call_soon
+        self._generations = {}   # key -> generation of the newest task with that key
+        self._futures = {}       # key -> future of the newest task with that key
+        self._pending = 0
+        self._busy_listeners = []
+        self._closed = False
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, func, *args, key=None, on_success=None, on_error=None, **kwargs):
+        """Run func(*args, **kwargs) on a worker.
+
+        on_success(result) or on_error(exception) is called on the Tk thread;
+        without on_error the exception is shown in an error dialog.
+        """
+        if self._closed:
+            return None
+        generation = None
+        if key is not None:
+            self.cancel(key)
+            generation = self._generations[key]
+        callbacks = (key, generation, on_success, on_error)
+
+        def run():
+            try:
+                self._results.put((callbacks, True, func(*args, **kwargs)))
+            except Exception as e:
+                self._results.put((callbacks, False, e))
+
+        self._set_pending(self._pending + 1)
+        future = self.executor.submit(run)
+        if key is not None:
+            self._futures[key] = future
+        return future
+
+    def cancel(self, key):
+        """Drop the result of the pending task with key (and skip it if it has not started)"""
+        self._generations[key] = self._generations.get(key, 0) + 1
+        future = self._futures.pop(key, None)
+        if future is not None and future.cancel():
+            self._set_pending(self._pending - 1)
+
+    def call_soon(self, func, *args):
+        """Run func(*args) on the Tk thread; may be called from any thread"""
+        if not self._closed:
+            self._calls.put((func, args))
+
+    def watch(self, db, table, callback, owner):
+        """Call callback(change) on the Tk thread for changes to table (Database.subscribe)
+        until the owner widget is destroyed"""
+        def forward(change):
+            self.call_soon(callback, change)
+
+        def on_destroy(event):
+            if event.widget is owner:
+                db.unsubscribe(table, forward)
+
+        db.subscribe(table, forward)
+        owner.bind('<Destroy>', on_destroy, add='+')
+
+    def add_busy_listener(self, callback):
+        """callback(busy) runs on the Tk thread whenever the runner becomes busy or idle"""
+        self._busy_listeners.append(callback)
+
+    def is_busy(self):
+        return self._pending > 0
+
+    def shutdown(self):
+        self._closed = True
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        try:
+            self.root.after_cancel(self._poll_id)
+        except Exception:
+            pass
+        self.executor.shutdown(wait=False)
+
+    def _set_pending(self, pending):
+        was_busy = self._pending > 0
+        self._pending = pending
+        if was_busy != (pending > 0):
+            for callback in list(self._busy_listeners):
+                callback(pending > 0)
+
+    def _poll(self):
+        try:
+            while True:
+                (key, generation, on_success, on_error), ok, value = self._results.get_nowait()
+                self._set_pending(self._pending - 1)
+                if key is not None:
+                    if generation != self._generations.get(key):
+                        continue  # superseded by a newer task with the same key
+                    self._futures.pop(key, None)
+                self._deliver(ok, value, on_success, on_error)
+        except queue.Empty:
+            pass
+        try:
+            while True:
+                func, args = self._calls.get_nowait()
+                self._call(func, *args)
+        except queue.Empty:
+            pass
+        if not self._closed:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _deliver(self, ok, value, on_success, on_error):
+        if ok:
+            if on_success:
+                self._call(on_success, value)
+        elif on_error:
+            self._call(on_error, value)
+        else:
+            self._call(messagebox.showerror, "Error", f"Operation failed: {value}")
+
+    def _call(self, func, *args):
+        # A failing callback must not stop the poll loop
+        try:
+            func(*args)
+        except tk.TclError:
+            pass  # the widget the callback updates was destroyed meanwhile (e.g. after logout)
+        except Exception:
+            logger.exception("Task callback failed")
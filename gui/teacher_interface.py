@@ -1,12 +1,16 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 from database import Database
+from gui.virtual_tree import VirtualTreeview, PagedRowSource
+from gui.task_runner import TaskRunner
+from gui.tree_sync import sync_tree
 
 class TeacherInterface(ttk.Frame):
-    def __init__(self, parent, db, user):
+    def __init__(self, parent, db, user, tasks=None):
         super().__init__(parent)
         self.db = db
         self.user = user
+        self.tasks = tasks or TaskRunner(self)
         self.setup_ui()
 
     def setup_ui(self):
@@ -64,7 +68,7 @@ class TeacherInterface(ttk.Frame):
         refresh_btn.pack(side=tk.LEFT, padx=5)
 
         # Create Treeview for teaching courses
-        columns = ('offering_id', 'course_name', 'course_code', 'semester', 'year', 'department')
+        columns = ('offering_id', 'course_name', 'course_code', 'semester', 'year', 'department', 'seats')
         self.teaching_tree = ttk.Treeview(
             self.teaching_courses_tab,
             columns=columns,
@@ -78,6 +82,7 @@ class TeacherInterface(ttk.Frame):
         self.teaching_tree.heading('semester', text='Semester')
         self.teaching_tree.heading('year', text='Year')
         self.teaching_tree.heading('department', text='Department')
+        self.teaching_tree.heading('seats', text='Seats')
 
         # Define columns
         self.teaching_tree.column('offering_id', width=50)
@@ -86,6 +91,7 @@ class TeacherInterface(ttk.Frame):
         self.teaching_tree.column('semester', width=150)
         self.teaching_tree.column('year', width=100)
         self.teaching_tree.column('department', width=150)
+        self.teaching_tree.column('seats', width=80)
 
         # Add scrollbar
         scrollbar = ttk.Scrollbar(self.teaching_courses_tab, orient=tk.VERTICAL, command=self.teaching_tree.yview)
@@ -130,12 +136,12 @@ class TeacherInterface(ttk.Frame):
         )
         remove_btn.pack(side=tk.LEFT, padx=5)
 
-        # Create Treeview for course offerings
+        # Create Treeview for course offerings; rows are pulled a page at a time as the list scrolls
         columns = ('offering_id', 'course_name', 'course_code', 'semester', 'year', 'department')
-        self.offerings_tree = ttk.Treeview(
+        self.offerings_tree = VirtualTreeview(
             self.course_offerings_tab,
             columns=columns,
-            show='headings'
+            tasks=self.tasks
         )
 
         # Define headings
@@ -154,37 +160,31 @@ class TeacherInterface(ttk.Frame):
         self.offerings_tree.column('year', width=100)
         self.offerings_tree.column('department', width=150)
 
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(self.course_offerings_tab, orient=tk.VERTICAL, command=self.offerings_tree.yview)
-        self.offerings_tree.configure(yscrollcommand=scrollbar.set)
-
-        # Pack tree and scrollbar
-        self.offerings_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Pack tree (it has its own scrollbar)
+        self.offerings_tree.pack(fill=tk.BOTH, expand=True)
 
         # Bind double-click event
         self.offerings_tree.bind('<Double-1>', self.on_offering_select)
 
-        # Load initial data
+        # Load initial data, then follow changes made by any client
         self.refresh_course_offerings()
+        self.tasks.watch(self.db, 'course_offering', self.on_offerings_changed, self)
+        self.tasks.watch(self.db, 'course', self.on_courses_changed, self)
 
     def refresh_teaching_courses(self):
-        # Clear existing items
-        for item in self.teaching_tree.get_children():
-            self.teaching_tree.delete(item)
+        def fetch():
+            teacher_id = self.user.teacher_id
+            if not teacher_id:
+                return []
+            return self.db.get_teaching_courses(teacher_id)
 
-        # Get teacher ID
-        teacher = self.db.get_teacher(self.user['user_id'])
-        if not teacher:
-            return
+        self.tasks.submit(fetch, key='teaching_courses', on_success=self.show_teaching_courses)
 
-        # Fetch and display teaching courses
-        courses = self.db.get_teaching_courses(teacher[0])  # teacher[0] is teacher_id
-        
+    def show_teaching_courses(self, courses):
         # Group courses by semester and year
+        rows = []
         current_semester = None
         current_year = None
-        
         for course in courses:
             semester = course[3]  # semester_name
             year = course[4]      # year
@@ -192,30 +192,75 @@ class TeacherInterface(ttk.Frame):
             if semester != current_semester or year != current_year:
                 # Add semester/year header
                 header = f"{semester} {year}"
-                self.teaching_tree.insert('', tk.END, values=('', header, '', '', '', ''), tags=('header',))
+                rows.append(('', header, '', '', '', '', ''))
                 current_semester = semester
                 current_year = year
-            # Add course
-            self.teaching_tree.insert('', tk.END, values=course, tags=('course',))
+            # Add course, with seats taken out of the capacity (if any)
+            seats_taken, capacity = course[6], course[7]
+            seats = f"{seats_taken}/{capacity}" if capacity is not None else str(seats_taken)
+            rows.append(tuple(course[:6]) + (seats,))
+        sync_tree(
+            self.teaching_tree, rows,
+            key=lambda row: row[0] if row[0] != '' else f"header:{row[1]}",
+            tags=lambda row: ('header',) if row[0] == '' else ('course',)
+        )
 
         # Configure tags for styling
         self.teaching_tree.tag_configure('header', background='#f0f0f0', font=('TkDefaultFont', 10, 'bold'))
         self.teaching_tree.tag_configure('course', background='white')
 
     def refresh_course_offerings(self):
-        # Clear existing items
-        for item in self.offerings_tree.get_children():
-            self.offerings_tree.delete(item)
-
-        # Fetch and display course offerings with department name
-        offerings = self.db.get_course_offerings()
-        for offering in offerings:
-            self.offerings_tree.insert('', tk.END, values=offering)
+        # Fetch course offerings with department name page by page
+        def fetch_page(after, limit, order_by, descending):
+            return self.db.get_course_offerings_page(after=after, limit=limit, descending=descending)
+
+        def fetch_rows(offering_ids):
+            return self.db.get_course_offerings_page(limit=len(offering_ids), ids=offering_ids)[0]
+
+        source = PagedRowSource(fetch_page, sort_keys={'offering_id': 'offering_id'}, fetch_rows=fetch_rows)
+        # Load the first page on a worker, then show it
+        self.tasks.submit(source.load, 1, key='course_offerings', on_success=lambda _: self.offerings_tree.set_source(source))
+
+    def on_offerings_changed(self, change):
+        rows = change['rows']
+        # Teaching courses: only when one of this teacher's offerings is involved
+        teacher_id = self.user.teacher_id
+        if rows is None or any(row['instructor_id'] == teacher_id or self.teaching_tree.exists(str(row['offering_id']))
+                               for row in rows):
+            self.refresh_teaching_courses()
+        # All offerings: new rows need their place in the sort order, so those
+        # reload the list; edits and deletes patch just the affected rows
+        source = self.offerings_tree.source
+        if rows is None or change['op'] not in ('update', 'delete') or not getattr(source, 'fetch_rows', None):
+            self.refresh_course_offerings()
+            return
+        offering_ids = [row['offering_id'] for row in rows]
+        if change['op'] == 'delete':
+            self.offerings_tree.patch(offering_ids, [])
+        else:
+            self.tasks.submit(source.fetch_rows, offering_ids,
+                              on_success=lambda fresh: self.offerings_tree.patch(offering_ids, fresh))
+
+    def on_courses_changed(self, change):
+        # Both lists show course names and codes; a new course changes neither
+        if change['op'] != 'insert':
+            self.refresh_teaching_courses()
+            self.refresh_course_offerings()
 
     def show_add_offering_dialog(self):
+        def fetch():
+            return self.db.get_all_courses(), self.db.get_all_semesters()
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load courses and semesters: {str(e)}")
+
+        self.tasks.submit(fetch, key='offering_dialog', on_success=lambda result: self.open_add_offering_dialog(*result),
+                          on_error=failed)
+
+    def open_add_offering_dialog(self, courses, semesters):
         dialog = tk.Toplevel(self)
         dialog.title("Add Course Offering")
-        dialog.geometry("420x340")
+        dialog.geometry("420x380")
         dialog.transient(self)
         dialog.grab_set()
 
@@ -230,7 +275,6 @@ class TeacherInterface(ttk.Frame):
         # Course selection
         ttk.Label(form_frame, text="Course:", font=("Helvetica", 11)).grid(row=0, column=0, sticky=tk.W, pady=8, padx=4)
         course_var = tk.StringVar()
-        courses = self.db.get_all_courses()
         course_combo = ttk.Combobox(form_frame, textvariable=course_var, font=("Helvetica", 11))
         course_combo['values'] = [f"{course[2]} - {course[1]}" for course in courses]
         course_combo.grid(row=0, column=1, sticky=(tk.W, tk.E), pady=8, padx=4)
@@ -238,11 +282,16 @@ class TeacherInterface(ttk.Frame):
         # Semester selection
         ttk.Label(form_frame, text="Semester:", font=("Helvetica", 11)).grid(row=1, column=0, sticky=tk.W, pady=8, padx=4)
         semester_var = tk.StringVar()
-        semesters = self.db.get_all_semesters()
         semester_combo = ttk.Combobox(form_frame, textvariable=semester_var, font=("Helvetica", 11))
         semester_combo['values'] = [sem[1] for sem in semesters]
         semester_combo.grid(row=1, column=1, sticky=(tk.W, tk.E), pady=8, padx=4)
 
+        # Capacity (optional, empty means unlimited)
+        ttk.Label(form_frame, text="Capacity:", font=("Helvetica", 11)).grid(row=2, column=0, sticky=tk.W, pady=8, padx=4)
+        capacity_var = tk.StringVar()
+        capacity_entry = ttk.Entry(form_frame, textvariable=capacity_var, font=("Helvetica", 11))
+        capacity_entry.grid(row=2, column=1, sticky=(tk.W, tk.E), pady=8, padx=4)
+
         form_frame.columnconfigure(1, weight=1)
 
         def save_offering():
@@ -257,21 +306,41 @@ class TeacherInterface(ttk.Frame):
                 # Get semester ID
                 semester_name = semester_var.get()
                 semester_id = next(sem[0] for sem in semesters if sem[1] == semester_name)
-                # Get teacher ID
-                teacher = self.db.get_teacher(self.user['user_id'])
-                if not teacher:
-                    messagebox.showerror("Error", "Teacher not found", parent=dialog)
+                capacity = capacity_var.get().strip()
+                if capacity and (not capacity.isdigit() or int(capacity) < 1):
+                    messagebox.showerror("Error", "Capacity must be a positive number", parent=dialog)
                     return
-                # Create course offering
-                self.db.create_course_offering(
-                    course_id,
-                    semester_id,
-                    teacher[0]  # teacher_id
-                )
-                messagebox.showinfo("Success", "Course offering added successfully!", parent=dialog)
-                dialog.destroy()
-                self.refresh_course_offerings()
-                self.refresh_teaching_courses()
+                capacity = int(capacity) if capacity else None
+
+                def create():
+                    teacher_id = self.user.teacher_id
+                    if not teacher_id:
+                        return False
+                    # Create course offering
+                    self.db.create_course_offering(
+                        course_id,
+                        semester_id,
+                        teacher_id,
+                        capacity
+                    )
+                    return True
+
+                def done(created):
+                    if not created:
+                        save_btn.configure(state=tk.NORMAL)
+                        messagebox.showerror("Error", "Teacher not found", parent=dialog)
+                        return
+                    messagebox.showinfo("Success", "Course offering added successfully!", parent=dialog)
+                    dialog.destroy()
+                    self.refresh_course_offerings()
+                    self.refresh_teaching_courses()
+
+                def failed(e):
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", f"Failed to add course offering: {str(e)}", parent=dialog)
+
+                save_btn.configure(state=tk.DISABLED)
+                self.tasks.submit(create, on_success=done, on_error=failed)
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to add course offering: {str(e)}", parent=dialog)
 
@@ -303,9 +372,25 @@ class TeacherInterface(ttk.Frame):
         self.show_course_offering_details(offering_id)
 
     def show_course_offering_details(self, offering_id):
+        def fetch():
+            return self.db.get_course_offering_by_id(offering_id), self.user.teacher_id
+
+        def show(result):
+            offering, teacher_id = result
+            if not offering:
+                messagebox.showerror("Error", "Course offering not found")
+                return
+            self.open_course_offering_details(offering_id, offering, teacher_id)
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load course offering: {str(e)}")
+
+        self.tasks.submit(fetch, key='offering_dialog', on_success=show, on_error=failed)
+
+    def open_course_offering_details(self, offering_id, offering, teacher_id):
         dialog = tk.Toplevel(self)
         dialog.title("Course Offering Details")
-        dialog.geometry("420x340")
+        dialog.geometry("420x380")
         dialog.transient(self)
         dialog.grab_set()
 
@@ -313,23 +398,15 @@ class TeacherInterface(ttk.Frame):
         header = ttk.Label(dialog, text="Course Offering Details", font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
 
-        # Get course offering details
-        offering = next(
-            (o for o in self.db.get_course_offerings() if o[0] == offering_id),
-            None
-        )
-        if not offering:
-            messagebox.showerror("Error", "Course offering not found", parent=dialog)
-            dialog.destroy()
-            return
-
         # Create details frame
         details_frame = ttk.Frame(dialog, padding="24 18 24 18")
         details_frame.pack(fill=tk.BOTH, expand=True)
 
         # Display course offering details
         labels = ['Offering ID', 'Course Name', 'Course Code', 'Semester', 'Year', 'Department']
-        for row, (label, value) in enumerate(zip(labels, offering)):
+        capacity, seats_taken = offering[10], offering[11]
+        seats = f"{seats_taken} of {capacity}" if capacity is not None else f"{seats_taken} (no limit)"
+        for row, (label, value) in enumerate(zip(labels + ['Seats'], offering[:6] + (seats,))):
             ttk.Label(details_frame, text=f"{label}:", font=("Helvetica", 11, "bold")).grid(row=row, column=0, sticky=tk.W, pady=8, padx=4)
             ttk.Label(details_frame, text=str(value), font=("Helvetica", 11)).grid(row=row, column=1, sticky=tk.W, pady=8, padx=4)
         details_frame.columnconfigure(1, weight=1)
@@ -337,56 +414,76 @@ class TeacherInterface(ttk.Frame):
         # Action buttons
         button_frame = ttk.Frame(dialog)
         button_frame.pack(fill=tk.X, pady=(0, 18), padx=24)
-        teacher = self.db.get_teacher(self.user['user_id'])
-        if teacher and offering[3] == teacher[0]:  # instructor_id
+        if teacher_id and offering[9] == teacher_id:  # instructor_id
             edit_btn = ttk.Button(button_frame, text="Edit", width=12, command=lambda: [dialog.destroy(), self.edit_course_offering(offering_id, dialog)])
             edit_btn.pack(side=tk.RIGHT, padx=8)
             delete_btn = ttk.Button(button_frame, text="Delete", width=12, command=lambda: self.delete_course_offering(offering_id, dialog))
             delete_btn.pack(side=tk.RIGHT, padx=8)
+            capacity_btn = ttk.Button(button_frame, text="Capacity", width=12, command=lambda: self.change_offering_capacity(offering_id, capacity, dialog))
+            capacity_btn.pack(side=tk.RIGHT, padx=8)
+
+    def change_offering_capacity(self, offering_id, capacity, parent_dialog=None):
+        value = simpledialog.askstring(
+            "Capacity", "Seats in this offering (empty for no limit):",
+            initialvalue='' if capacity is None else str(capacity), parent=parent_dialog or self
+        )
+        if value is None:
+            return
+        value = value.strip()
+        if value and (not value.isdigit() or int(value) < 1):
+            messagebox.showerror("Error", "Capacity must be a positive number", parent=parent_dialog)
+            return
 
-    def edit_course_offering(self, offering_id, parent_dialog=None):
+        def done(outcome):
+            success, message = outcome
+            if not success:
+                messagebox.showerror("Error", message, parent=parent_dialog)
+                return
+            messagebox.showinfo("Success", message, parent=parent_dialog)
+            if parent_dialog:
+                parent_dialog.destroy()
+            self.refresh_teaching_courses()
+
+        self.tasks.submit(self.db.set_offering_capacity, offering_id, int(value) if value else None, on_success=done)
+
+    def edit_course_offering(self, offering_id, parent_dialog=None, title="Edit Course Offering"):
+        def fetch():
+            offering = self.db.get_course_offering_by_id(offering_id)
+            return self.db.get_course_by_id(offering[7]) if offering else None
+
+        self.load_course_for_edit(fetch, title)
+
+    def load_course_for_edit(self, fetch_course, title):
+        """Look the course up (and the teacher's department) on a worker, then open the edit form"""
+        def fetch():
+            return fetch_course(), self.user.teacher_id, self.user.department_id, self.user.department_name
+
+        def show(result):
+            course, teacher_id, department_id, department_name = result
+            if not course:
+                messagebox.showerror("Error", "Course not found")
+                return
+            if not teacher_id:
+                messagebox.showerror("Error", "Teacher not found")
+                return
+            self.open_edit_course_dialog(title, course, department_id, department_name)
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load course: {str(e)}")
+
+        self.tasks.submit(fetch, key='course_dialog', on_success=show, on_error=failed)
+
+    def open_edit_course_dialog(self, title, course, department_id, department_name):
         dialog = tk.Toplevel(self)
-        dialog.title("Edit Course Offering")
+        dialog.title(title)
         dialog.geometry("420x540")
         dialog.transient(self)
         dialog.grab_set()
 
         # Header
-        header = ttk.Label(dialog, text="Edit Course Offering", font=("Helvetica", 14, "bold"))
+        header = ttk.Label(dialog, text=title, font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
-
-        # Get selected item
-        selection = self.teaching_tree.selection()
-        if not selection:
-            messagebox.showwarning("Warning", "Please select a course to edit")
-            return
-        item = selection[0]
-        values = self.teaching_tree.item(item)['values']
-        course_id = None
-        # Find course_id from offering_id
-        offering_id = values[0]
-        offering = next((o for o in self.db.get_course_offerings() if o[0] == offering_id), None)
-        if offering:
-            course_code = offering[2]
-            course = next((c for c in self.db.get_all_courses() if c[2] == course_code), None)
-            if course:
-                course_id = course[0]
-        if not course_id:
-            messagebox.showerror("Error", "Course not found")
-            return
-        # Get course details
-        course = self.db.get_course_by_id(course_id)
-        if not course:
-            messagebox.showerror("Error", "Course not found")
-            return
-        # Get teacher info
-        teacher = self.db.get_teacher(self.user['user_id'])
-        if not teacher:
-            messagebox.showerror("Error", "Teacher not found")
-            dialog.destroy()
-            return
-        department_id = teacher[3]  # department_id
-        department_name = self.db.get_department_name(department_id)
+        course_id = course[0]
         # Create form
         form_frame = ttk.Frame(dialog, padding="24 18 24 18")
         form_frame.pack(fill=tk.BOTH, expand=True)
@@ -427,8 +524,7 @@ class TeacherInterface(ttk.Frame):
                 if not all([course_name_var.get(), course_code_var.get(), credits_var.get(), ects_var.get(), level_var.get(), type_var.get()]):
                     messagebox.showerror("Error", "Please fill in all fields")
                     return
-                # Update course
-                result, msg = self.db.update_course(course_id, {
+                course_data = {
                     'course_name': course_name_var.get(),
                     'course_code': course_code_var.get(),
                     'credits': int(credits_var.get()),
@@ -436,13 +532,25 @@ class TeacherInterface(ttk.Frame):
                     'level': level_var.get(),
                     'type': type_var.get(),
                     'department_id': department_id
-                })
-                if result:
-                    messagebox.showinfo("Success", "Course updated successfully!")
-                    dialog.destroy()
-                    self.refresh_teaching_courses()
-                else:
-                    messagebox.showerror("Error", msg)
+                }
+
+                def done(outcome):
+                    result, msg = outcome
+                    if result:
+                        messagebox.showinfo("Success", "Course updated successfully!")
+                        dialog.destroy()
+                        self.refresh_teaching_courses()
+                    else:
+                        save_btn.configure(state=tk.NORMAL)
+                        messagebox.showerror("Error", msg)
+
+                def failed(e):
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", f"Failed to update course: {str(e)}")
+
+                # Update course
+                save_btn.configure(state=tk.DISABLED)
+                self.tasks.submit(self.db.update_course, course_id, course_data, on_success=done, on_error=failed)
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to update course: {str(e)}")
         save_btn = ttk.Button(form_frame, text="Save Changes", command=save_changes)
@@ -450,122 +558,36 @@ class TeacherInterface(ttk.Frame):
         form_frame.columnconfigure(1, weight=1)
 
     def delete_course_offering(self, offering_id, parent_dialog=None):
-        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this course offering?"):
-            try:
-                query = "DELETE FROM course_offering WHERE offering_id = %s"
-                self.db.execute_query(query, (offering_id,))
-                messagebox.showinfo("Success", "Course offering deleted successfully!")
-                if parent_dialog:
-                    parent_dialog.destroy()
-                self.refresh_course_offerings()
-                self.refresh_teaching_courses()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete course offering: {str(e)}")
+        if not messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this course offering?"):
+            return
 
-    def edit_teaching_course(self):
-        dialog = tk.Toplevel(self)
-        dialog.title("Edit Teaching Course")
-        dialog.geometry("420x540")
-        dialog.transient(self)
-        dialog.grab_set()
+        def done(deleted):
+            if not deleted:
+                messagebox.showerror("Error", "Failed to delete course offering")
+                return
+            messagebox.showinfo("Success", "Course offering deleted successfully!")
+            if parent_dialog:
+                parent_dialog.destroy()
+            self.refresh_course_offerings()
+            self.refresh_teaching_courses()
 
-        # Header
-        header = ttk.Label(dialog, text="Edit Teaching Course", font=("Helvetica", 14, "bold"))
-        header.pack(pady=(18, 0))
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to delete course offering: {str(e)}")
+
+        self.tasks.submit(self.db.delete_course_offering, offering_id, on_success=done, on_error=failed)
 
+    def edit_teaching_course(self):
         # Get selected item
         selection = self.teaching_tree.selection()
         if not selection:
             messagebox.showwarning("Warning", "Please select a course to edit")
             return
-        item = selection[0]
-        values = self.teaching_tree.item(item)['values']
-        course_id = None
-        # Find course_id from offering_id
-        offering_id = values[0]
-        offering = next((o for o in self.db.get_course_offerings() if o[0] == offering_id), None)
-        if offering:
-            course_code = offering[2]
-            course = next((c for c in self.db.get_all_courses() if c[2] == course_code), None)
-            if course:
-                course_id = course[0]
-        if not course_id:
-            messagebox.showerror("Error", "Course not found")
-            return
-        # Get course details
-        course = self.db.get_course_by_id(course_id)
-        if not course:
-            messagebox.showerror("Error", "Course not found")
-            return
-        # Get teacher info
-        teacher = self.db.get_teacher(self.user['user_id'])
-        if not teacher:
-            messagebox.showerror("Error", "Teacher not found")
-            dialog.destroy()
+        offering_id = self.teaching_tree.item(selection[0])['values'][0]
+        if offering_id == '':  # semester header row
+            messagebox.showwarning("Warning", "Please select a course to edit")
             return
-        department_id = teacher[3]  # department_id
-        department_name = self.db.get_department_name(department_id)
-        # Create form
-        form_frame = ttk.Frame(dialog, padding="24 18 24 18")
-        form_frame.pack(fill=tk.BOTH, expand=True)
-        # Course Name
-        ttk.Label(form_frame, text="Course Name:").grid(row=0, column=0, sticky=tk.W, pady=5)
-        course_name_var = tk.StringVar(value=course[1])
-        ttk.Entry(form_frame, textvariable=course_name_var).grid(row=0, column=1, sticky=(tk.W, tk.E), pady=5)
-        # Course Code
-        ttk.Label(form_frame, text="Course Code:").grid(row=1, column=0, sticky=tk.W, pady=5)
-        course_code_var = tk.StringVar(value=course[2])
-        ttk.Entry(form_frame, textvariable=course_code_var).grid(row=1, column=1, sticky=(tk.W, tk.E), pady=5)
-        # Credits
-        ttk.Label(form_frame, text="Credits:").grid(row=2, column=0, sticky=tk.W, pady=5)
-        credits_var = tk.StringVar(value=str(course[3]))
-        ttk.Entry(form_frame, textvariable=credits_var).grid(row=2, column=1, sticky=(tk.W, tk.E), pady=5)
-        # ECTS
-        ttk.Label(form_frame, text="ECTS:").grid(row=3, column=0, sticky=tk.W, pady=5)
-        ects_var = tk.StringVar(value=str(course[4]))
-        ttk.Entry(form_frame, textvariable=ects_var).grid(row=3, column=1, sticky=(tk.W, tk.E), pady=5)
-        # Level
-        ttk.Label(form_frame, text="Level:").grid(row=4, column=0, sticky=tk.W, pady=5)
-        level_var = tk.StringVar(value=course[5])
-        level_combo = ttk.Combobox(form_frame, textvariable=level_var)
-        level_combo['values'] = ('Bachelor', 'Master')
-        level_combo.grid(row=4, column=1, sticky=(tk.W, tk.E), pady=5)
-        # Type
-        ttk.Label(form_frame, text="Type:").grid(row=5, column=0, sticky=tk.W, pady=5)
-        type_var = tk.StringVar(value=course[6])
-        type_combo = ttk.Combobox(form_frame, textvariable=type_var)
-        type_combo['values'] = ('Must', 'Elective', 'Technical Elective')
-        type_combo.grid(row=5, column=1, sticky=(tk.W, tk.E), pady=5)
-        # Department (fixed)
-        ttk.Label(form_frame, text="Department:").grid(row=6, column=0, sticky=tk.W, pady=5)
-        ttk.Label(form_frame, text=department_name).grid(row=6, column=1, sticky=(tk.W, tk.E), pady=5)
-        def save_changes():
-            try:
-                # Validate required fields
-                if not all([course_name_var.get(), course_code_var.get(), credits_var.get(), ects_var.get(), level_var.get(), type_var.get()]):
-                    messagebox.showerror("Error", "Please fill in all fields")
-                    return
-                # Update course
-                result, msg = self.db.update_course(course_id, {
-                    'course_name': course_name_var.get(),
-                    'course_code': course_code_var.get(),
-                    'credits': int(credits_var.get()),
-                    'ects': int(ects_var.get()),
-                    'level': level_var.get(),
-                    'type': type_var.get(),
-                    'department_id': department_id
-                })
-                if result:
-                    messagebox.showinfo("Success", "Course updated successfully!")
-                    dialog.destroy()
-                    self.refresh_teaching_courses()
-                else:
-                    messagebox.showerror("Error", msg)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to update course: {str(e)}")
-        save_btn = ttk.Button(form_frame, text="Save Changes", command=save_changes)
-        save_btn.grid(row=7, column=0, columnspan=2, pady=20)
-        form_frame.columnconfigure(1, weight=1)
+        # Look the course up through the offering id; the Treeview turns a code like "0101" into 101
+        self.edit_course_offering(offering_id, title="Edit Teaching Course")
 
     def remove_course_offering(self):
         # Get selected item
@@ -589,14 +611,14 @@ class TeacherInterface(ttk.Frame):
         header = ttk.Label(dialog, text="Add Course", font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
 
-        # Get teacher info
-        teacher = self.db.get_teacher(self.user['user_id'])
-        if not teacher:
+        # Teacher info resolved at login
+        teacher_id = self.user.teacher_id
+        if not teacher_id:
             messagebox.showerror("Error", "Teacher not found")
             dialog.destroy()
             return
-        department_id = teacher[3]  # department_id
-        department_name = self.db.get_department_name(department_id)
+        department_id = self.user.department_id
+        department_name = self.user.department_name
 
         # Create form
         form_frame = ttk.Frame(dialog, padding="24 18 24 18")
@@ -649,25 +671,41 @@ class TeacherInterface(ttk.Frame):
                     messagebox.showerror("Error", "Please fill in all fields")
                     return
 
-                # Check for duplicate course code
-                if self.db.check_course_code_exists(course_code_var.get()):
-                    messagebox.showerror("Error", "This course code already exists.")
-                    return
-
-                # Insert course using teacher's department and teacher id
-                self.db.create_course(
+                values = (
                     course_name_var.get(),
                     course_code_var.get(),
                     int(credits_var.get()),
                     int(ects_var.get()),
                     level_var.get(),
                     type_var.get(),
-                    department_id,
-                    creator_teacher_id=teacher[0]
+                    department_id
                 )
-                messagebox.showinfo("Success", "Course added successfully!")
-                dialog.destroy()
-                self.refresh_teaching_courses()
+
+                def create():
+                    # Check for duplicate course code
+                    if self.db.check_course_code_exists(values[1]):
+                        return False, "This course code already exists."
+                    # Insert course using teacher's department and teacher id
+                    if self.db.create_course(*values, creator_teacher_id=teacher_id) is None:
+                        return False, "Failed to add course"
+                    return True, "Course added successfully!"
+
+                def done(result):
+                    success, message = result
+                    if not success:
+                        save_btn.configure(state=tk.NORMAL)
+                        messagebox.showerror("Error", message, parent=dialog)
+                        return
+                    messagebox.showinfo("Success", message)
+                    dialog.destroy()
+                    self.refresh_teaching_courses()
+
+                def failed(e):
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", f"Failed to add course: {str(e)}")
+
+                save_btn.configure(state=tk.DISABLED)
+                self.tasks.submit(create, on_success=done, on_error=failed)
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to add course: {str(e)}")
 
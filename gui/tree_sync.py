@@ -0,0 +1,64 @@
+import weakref
+
+# tree -> {iid: (values, tags)} as last written by sync_tree
+_shown = weakref.WeakKeyDictionary()
+
+
+def _row_key(row, key):
+    return key(row) if callable(key) else row[key]
+
+
+def sync_tree(tree, rows, key=0, tags=None):
+    """Make a flat ttk.Treeview show rows, touching only the items that changed.
+
+    Items are identified by key (a column index, or a callable returning a
+    hashable for a row), so rows that are still present keep their item,
+    selection and focus. Removed rows are deleted, new rows inserted, changed
+    rows updated and moved rows repositioned; an unchanged list costs no Tk
+    calls beyond reading the current order. tags(row) gives the item tags.
+    The tree must only be filled through sync_tree.
+    """
+    shown = _shown.setdefault(tree, {})
+    wanted = []
+    seen = {}
+    for row in rows:
+        iid = str(_row_key(row, key))
+        # Keep duplicate keys apart instead of collapsing them into one item
+        count = seen.get(iid, 0)
+        seen[iid] = count + 1
+        if count:
+            iid = f"{iid}#{count}"
+        values = tuple(row)
+        wanted.append((iid, values, tuple(tags(row)) if tags else ()))
+
+    keep = {iid for iid, _, _ in wanted}
+    current = []
+    for iid in tree.get_children():
+        if iid in keep:
+            current.append(iid)
+        else:
+            tree.delete(iid)
+            shown.pop(iid, None)
+
+    present = set(current)
+    for index, (iid, values, item_tags) in enumerate(wanted):
+        if iid not in present:
+            tree.insert('', index, iid=iid, values=values, tags=item_tags)
+            current.insert(index, iid)
+            present.add(iid)
+        else:
+            if shown.get(iid) != (values, item_tags):
+                tree.item(iid, values=values, tags=item_tags)
+            if current[index] != iid:
+                tree.move(iid, '', index)
+                current.remove(iid)
+                current.insert(index, iid)
+        shown[iid] = (values, item_tags)
+
+
+def append_rows(tree, rows, key=0, tags=None):
+    """Add rows after those already shown, e.g. the next page of a list"""
+    shown = _shown.get(tree, {})
+    current = [shown[iid][0] for iid in tree.get_children() if iid in shown]
+    sync_tree(tree, current + list(rows), key, tags)
+
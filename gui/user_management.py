@@ -1,14 +1,29 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from database import Database
+from gui.virtual_tree import VirtualTreeview, PagedRowSource
+from gui.task_runner import TaskRunner
+from gui.tree_sync import sync_tree
 import datetime
 
+
+def format_timestamp(value):
+    """Show a created_at value; the course service sends it as an ISO string"""
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else "N/A"
+
+
 class UserManagementFrame(ttk.Frame):
-    def __init__(self, parent, db, user, mode='user'):
+    def __init__(self, parent, db, user, mode='user', tasks=None):
         super().__init__(parent)
         self.db = db
         self.user = user
         self.mode = mode
+        self.tasks = tasks or TaskRunner(self)
         self.setup_ui()
 
     def setup_ui(self):
@@ -38,6 +53,14 @@ class UserManagementFrame(ttk.Frame):
         )
         add_user_btn.pack(side=tk.LEFT, padx=5)
 
+        # Import Users button
+        import_btn = ttk.Button(
+            buttons_frame,
+            text="Import Users",
+            command=self.import_users
+        )
+        import_btn.pack(side=tk.LEFT, padx=5)
+
         # Refresh button
         refresh_btn = ttk.Button(
             buttons_frame,
@@ -46,12 +69,30 @@ class UserManagementFrame(ttk.Frame):
         )
         refresh_btn.pack(side=tk.LEFT, padx=5)
 
-        # Create Treeview for users
+        # Username search and role filter
+        ttk.Label(buttons_frame, text="Search:").pack(side=tk.LEFT, padx=(15, 5))
+        self.user_search_var = tk.StringVar()
+        search_entry = ttk.Entry(buttons_frame, textvariable=self.user_search_var, width=20)
+        search_entry.pack(side=tk.LEFT)
+        search_entry.bind('<Return>', lambda e: self.refresh_users())
+        self.user_role_var = tk.StringVar(value='All')
+        role_filter = ttk.Combobox(
+            buttons_frame,
+            textvariable=self.user_role_var,
+            values=['All', 'Admin', 'Teacher', 'Student'],
+            state='readonly',
+            width=10
+        )
+        role_filter.pack(side=tk.LEFT, padx=5)
+        role_filter.bind('<<ComboboxSelected>>', lambda e: self.refresh_users())
+
+        # Create Treeview for users; rows are pulled a page at a time as the list scrolls
         columns = ('user_id', 'username', 'role', 'created_at')
-        self.tree = ttk.Treeview(
+        self.tree = VirtualTreeview(
             self.main_container,
             columns=columns,
-            show='headings'
+            tasks=self.tasks,
+            formatter=self.format_user_row
         )
 
         # Define headings
@@ -66,36 +107,69 @@ class UserManagementFrame(ttk.Frame):
         self.tree.column('role', width=100)
         self.tree.column('created_at', width=150)
 
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(self.main_container, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-
-        # Pack tree and scrollbar
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Pack tree (it has its own scrollbar)
+        self.tree.pack(fill=tk.BOTH, expand=True)
 
         # Bind double-click event
         self.tree.bind('<Double-1>', self.on_user_select)
 
-        # Load initial data
+        # Load initial data, then follow changes made by any client
         self.refresh_users()
+        self.tasks.watch(self.db, 'user', self.on_users_changed, self)
 
     def refresh_users(self):
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Fetch and display users
-        users = self.db.get_all_users()
-        for user in users:
-            user_data = list(user)  # Convert tuple to list for modification
-            # Format role
-            user_data[2] = user_data[2].capitalize() if user_data[2] else "N/A"
-            # Format datetime
-            user_data[3] = user_data[3].strftime("%Y-%m-%d %H:%M:%S") if user_data[3] else "N/A"
-            self.tree.insert('', tk.END, values=user_data)
+        # Fetch users page by page with the current filters
+        role = self.user_role_var.get()
+        role = None if role == 'All' else role
+        search = self.user_search_var.get().strip() or None
+
+        def fetch_page(after, limit, order_by, descending):
+            return self.db.get_users_page(
+                after=after, limit=limit, order_by=order_by or 'user_id', descending=descending,
+                role=role, search=search
+            )
+
+        def fetch_rows(user_ids):
+            return self.db.get_users_page(limit=len(user_ids), role=role, search=search, ids=user_ids)[0]
+
+        source = PagedRowSource(
+            fetch_page,
+            sort_keys={'user_id': 'user_id', 'username': 'username', 'role': 'role'},
+            fetch_rows=fetch_rows
+        )
+        # Load the first page on a worker, then show it
+        self.tasks.submit(source.load, 1, key='users', on_success=lambda _: self.tree.set_source(source))
+
+    def on_users_changed(self, change):
+        # New rows need their place in the sort order, so those reload the list;
+        # edits and deletes patch just the affected rows
+        source = self.tree.source
+        if change['rows'] is None or change['op'] not in ('update', 'delete') or not getattr(source, 'fetch_rows', None):
+            self.refresh_users()
+            return
+        user_ids = [row['user_id'] for row in change['rows']]
+        if change['op'] == 'delete':
+            self.tree.patch(user_ids, [])
+        else:
+            self.tasks.submit(source.fetch_rows, user_ids, on_success=lambda rows: self.tree.patch(user_ids, rows))
+
+    def format_user_row(self, user):
+        user_data = list(user)  # Convert tuple to list for modification
+        # Format role
+        user_data[2] = user_data[2].capitalize() if user_data[2] else "N/A"
+        # Format datetime
+        user_data[3] = format_timestamp(user_data[3])
+        return user_data
 
     def show_add_user_dialog(self):
+        # Load the department choices on a worker, then open the form
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load departments: {str(e)}")
+
+        self.tasks.submit(self.db.get_all_departments, key='user_dialog',
+                          on_success=self.open_add_user_dialog, on_error=failed)
+
+    def open_add_user_dialog(self, departments):
         # Create dialog window
         dialog = tk.Toplevel(self)
         dialog.title("Add New User")
@@ -159,7 +233,6 @@ class UserManagementFrame(ttk.Frame):
         email_entry = ttk.Entry(form_frame, textvariable=email_var)
         # Department (student/teacher)
         department_var = tk.StringVar()
-        departments = self.db.get_all_departments()
         department_label = ttk.Label(form_frame, text="Department:")
         department_combo = ttk.Combobox(form_frame, textvariable=department_var)
         department_combo['values'] = [dept[1] for dept in departments]
@@ -218,39 +291,76 @@ class UserManagementFrame(ttk.Frame):
                 if not all([email_var.get(), department_var.get()]):
                     messagebox.showerror("Error", "Please fill in all teacher fields", parent=dialog)
                     return
-            # Create user in DB
-            success = self.db.create_user(
-                username_var.get(),
-                password_var.get(),
-                role_var.get(),
-                first_name_var.get(),
-                last_name_var.get()
-            )
-            if not success:
-                messagebox.showerror("Error", "Failed to create user. Username may already exist.", parent=dialog)
-                return
-            # Only fetch user and add student/teacher details if not admin
-            if role_var.get() in ('student', 'teacher'):
-                user = self.db.get_user(username_var.get())
-                if not user:
-                    messagebox.showerror("Error", "User creation failed. Please try again.", parent=dialog)
+            # Read the form on the Tk thread; the database work runs on a worker
+            username, password, role = username_var.get(), password_var.get(), role_var.get()
+            first_name, last_name, email = first_name_var.get(), last_name_var.get(), email_var.get()
+            student_number, level = student_number_var.get(), level_var.get()
+            dept_id = next((dept[0] for dept in departments if dept[1] == department_var.get()), None)
+
+            def create():
+                # Create user in DB
+                if not self.db.create_user(username, password, role, first_name, last_name):
+                    return False, "Failed to create user. Username may already exist."
+                # Only fetch user and add student/teacher details if not admin
+                if role in ('student', 'teacher'):
+                    user = self.db.get_user(username)
+                    if not user:
+                        return False, "User creation failed. Please try again."
+                    if role == 'student':
+                        self.db.create_student(user[0], student_number, first_name, last_name, email, dept_id, level)
+                    else:
+                        self.db.create_teacher(user[0], first_name, last_name, email, dept_id)
+                return True, "User added successfully!"
+
+            def done(result):
+                success, message = result
+                if not success:
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", message, parent=dialog)
                     return
-                user_id = user[0]
-                if role_var.get() == 'student':
-                    dept_id = next(dept[0] for dept in departments if dept[1] == department_var.get())
-                    self.db.create_student(user_id, student_number_var.get(), first_name_var.get(), last_name_var.get(), email_var.get(), dept_id, level_var.get())
-                elif role_var.get() == 'teacher':
-                    dept_id = next(dept[0] for dept in departments if dept[1] == department_var.get())
-                    self.db.create_teacher(user_id, first_name_var.get(), last_name_var.get(), email_var.get(), dept_id)
-            messagebox.showinfo("Success", "User added successfully!", parent=dialog)
-            dialog.destroy()
-            self.refresh_users()
+                messagebox.showinfo("Success", message, parent=dialog)
+                dialog.destroy()
+                self.refresh_users()
+
+            def failed(e):
+                save_btn.configure(state=tk.NORMAL)
+                messagebox.showerror("Error", f"Failed to add user: {str(e)}", parent=dialog)
+
+            save_btn.configure(state=tk.DISABLED)
+            self.tasks.submit(create, on_success=done, on_error=failed)
 
         save_btn = ttk.Button(button_frame, text="Save", command=save)
         save_btn.pack(side=tk.RIGHT, padx=8)
         cancel_btn = ttk.Button(button_frame, text="Cancel", command=dialog.destroy)
         cancel_btn.pack(side=tk.RIGHT, padx=8)
 
+    def import_users(self):
+        path = filedialog.askopenfilename(
+            title="Import Users",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+
+        def on_error(e):
+            messagebox.showerror("Error", f"Failed to read file: {str(e)}")
+
+        self.tasks.submit(self.db.import_users, path, on_success=self.show_import_result, on_error=on_error)
+
+    def show_import_result(self, result):
+        if result['error']:
+            messagebox.showerror("Error", f"Import failed, no users were added: {result['error']}")
+            return
+        message = f"Imported {result['imported']} user(s)."
+        conflicts = result['conflicts']
+        if conflicts:
+            lines = [f"Line {line_no} ({username or 'no username'}): {reason}" for line_no, username, reason in conflicts[:20]]
+            if len(conflicts) > 20:
+                lines.append(f"... and {len(conflicts) - 20} more")
+            message += f"\n\nSkipped {len(conflicts)} row(s):\n" + "\n".join(lines)
+        messagebox.showinfo("Import Users", message)
+        self.refresh_users()
+
     def on_user_select(self, event):
         # Get selected item
         item = self.tree.selection()[0]
@@ -260,6 +370,18 @@ class UserManagementFrame(ttk.Frame):
         self.show_user_details(user_id)
 
     def show_user_details(self, user_id):
+        def show(user):
+            if not user:
+                messagebox.showerror("Error", "User not found")
+                return
+            self.open_user_details(user_id, user)
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load user: {str(e)}")
+
+        self.tasks.submit(self.db.get_user_by_id, user_id, key='user_dialog', on_success=show, on_error=failed)
+
+    def open_user_details(self, user_id, user):
         # Create dialog window
         dialog = tk.Toplevel(self)
         dialog.title("User Details")
@@ -271,13 +393,6 @@ class UserManagementFrame(ttk.Frame):
         header = ttk.Label(dialog, text="User Details", font=("Helvetica", 14, "bold"))
         header.pack(pady=(18, 0))
 
-        # Get user details
-        user = self.db.get_user_by_id(user_id)
-        if not user:
-            messagebox.showerror("Error", "User not found", parent=dialog)
-            dialog.destroy()
-            return
-
         # Create details frame
         details_frame = ttk.Frame(dialog, padding="24 18 24 18")
         details_frame.pack(fill=tk.BOTH, expand=True)
@@ -290,7 +405,7 @@ class UserManagementFrame(ttk.Frame):
 
         for row, (label, value) in enumerate(zip(labels, user_details_for_display)):
             ttk.Label(details_frame, text=f"{label}:", font=("Helvetica", 11, "bold")).grid(row=row, column=0, sticky=tk.W, pady=8, padx=4)
-            value_str = value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime.datetime) else str(value)
+            value_str = format_timestamp(value) if label == 'Created At' else str(value)
             ttk.Label(details_frame, text=value_str, font=("Helvetica", 11)).grid(row=row, column=1, sticky=tk.W, pady=8, padx=4)
         details_frame.columnconfigure(1, weight=1)
 
@@ -303,13 +418,19 @@ class UserManagementFrame(ttk.Frame):
         delete_btn.pack(side=tk.RIGHT, padx=8)
 
     def edit_user(self, user_id):
-        try:
-            # Get user data
-            user = self.db.get_user_by_id(user_id)
+        def show(user):
             if not user:
                 messagebox.showerror("Error", "User not found")
                 return
+            self.open_edit_user_dialog(user_id, user)
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to load user: {str(e)}")
 
+        self.tasks.submit(self.db.get_user_by_id, user_id, key='user_dialog', on_success=show, on_error=failed)
+
+    def open_edit_user_dialog(self, user_id, user):
+        try:
             # Create dialog window
             dialog = tk.Toplevel(self)
             dialog.title("Edit User")
@@ -372,21 +493,32 @@ class UserManagementFrame(ttk.Frame):
                         messagebox.showerror("Error", "Please fill in all required fields", parent=dialog)
                         return
 
+                    def done(success):
+                        if success:
+                            messagebox.showinfo("Success", "User updated successfully!", parent=dialog)
+                            dialog.destroy()
+                            self.refresh_users()
+                        else:
+                            save_btn.configure(state=tk.NORMAL)
+                            messagebox.showerror("Error", "Failed to update user", parent=dialog)
+
+                    def failed(e):
+                        save_btn.configure(state=tk.NORMAL)
+                        messagebox.showerror("Error", f"Failed to update user: {str(e)}", parent=dialog)
+
                     # Update user
-                    success = self.db.update_user(
+                    save_btn.configure(state=tk.DISABLED)
+                    self.tasks.submit(
+                        self.db.update_user,
                         user_id,
                         username_var.get(),
                         password_var.get() if password_var.get() else None,
                         role_var.get(),
                         first_name_var.get(),
-                        last_name_var.get()
+                        last_name_var.get(),
+                        on_success=done,
+                        on_error=failed
                     )
-                    if success:
-                        messagebox.showinfo("Success", "User updated successfully!", parent=dialog)
-                        dialog.destroy()
-                        self.refresh_users()
-                    else:
-                        messagebox.showerror("Error", "Failed to update user", parent=dialog)
                 except Exception as e:
                     messagebox.showerror("Error", f"Failed to update user: {str(e)}", parent=dialog)
 
@@ -396,15 +528,21 @@ class UserManagementFrame(ttk.Frame):
             self.after(100, self.refresh_users)
 
     def delete_user(self, user_id, dialog):
-        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this user?"):
-            try:
-                query = "DELETE FROM \"user\" WHERE user_id = %s"
-                self.db.execute_query(query, (user_id,))
-                messagebox.showinfo("Success", "User deleted successfully!")
-                dialog.destroy()
-                self.refresh_users()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete user: {str(e)}")
+        if not messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this user?"):
+            return
+
+        def done(deleted):
+            if not deleted:
+                messagebox.showerror("Error", "Failed to delete user")
+                return
+            messagebox.showinfo("Success", "User deleted successfully!")
+            dialog.destroy()
+            self.refresh_users()
+
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to delete user: {str(e)}")
+
+        self.tasks.submit(self.db.delete_user, user_id, on_success=done, on_error=failed)
 
     def setup_department_tab(self, parent):
         # Buttons frame
@@ -427,13 +565,14 @@ class UserManagementFrame(ttk.Frame):
         self.dept_tree.column('department_name', width=200)
         self.dept_tree.pack(fill=tk.BOTH, expand=True)
         self.refresh_departments()
+        # The list is small and diffed on refresh, so any change just reloads it
+        self.tasks.watch(self.db, 'department', lambda change: self.refresh_departments(), self)
 
     def refresh_departments(self):
-        for item in self.dept_tree.get_children():
-            self.dept_tree.delete(item)
-        departments = self.db.get_all_departments()
-        for dept in departments:
-            self.dept_tree.insert('', tk.END, values=dept)
+        self.tasks.submit(self.db.get_all_departments, key='departments', on_success=self.show_departments)
+
+    def show_departments(self, departments):
+        sync_tree(self.dept_tree, departments)
 
     def add_department_dialog(self):
         dialog = tk.Toplevel(self)
@@ -468,10 +607,22 @@ class UserManagementFrame(ttk.Frame):
             if not name_var.get():
                 messagebox.showerror("Error", "Please enter a department name", parent=dialog)
                 return
-            self.db.execute_query("INSERT INTO department (department_name) VALUES (%s)", (name_var.get(),))
-            messagebox.showinfo("Success", "Department added successfully!", parent=dialog)
-            dialog.destroy()
-            self.refresh_departments()
+
+            def done(success):
+                if not success:
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", "Failed to add department", parent=dialog)
+                    return
+                messagebox.showinfo("Success", "Department added successfully!", parent=dialog)
+                dialog.destroy()
+                self.refresh_departments()
+
+            def failed(e):
+                save_btn.configure(state=tk.NORMAL)
+                messagebox.showerror("Error", f"Failed to add department: {str(e)}", parent=dialog)
+
+            save_btn.configure(state=tk.DISABLED)
+            self.tasks.submit(self.db.create_department, name_var.get(), on_success=done, on_error=failed)
 
     def edit_department_dialog(self):
         selection = self.dept_tree.selection()
@@ -513,10 +664,22 @@ class UserManagementFrame(ttk.Frame):
             if not name_var.get():
                 messagebox.showerror("Error", "Please enter a department name", parent=dialog)
                 return
-            self.db.execute_query("UPDATE department SET department_name = %s WHERE department_id = %s", (name_var.get(), dept_id))
-            messagebox.showinfo("Success", "Department updated successfully!", parent=dialog)
-            dialog.destroy()
-            self.refresh_departments()
+
+            def done(success):
+                if not success:
+                    save_btn.configure(state=tk.NORMAL)
+                    messagebox.showerror("Error", "Failed to update department", parent=dialog)
+                    return
+                messagebox.showinfo("Success", "Department updated successfully!", parent=dialog)
+                dialog.destroy()
+                self.refresh_departments()
+
+            def failed(e):
+                save_btn.configure(state=tk.NORMAL)
+                messagebox.showerror("Error", f"Failed to update department: {str(e)}", parent=dialog)
+
+            save_btn.configure(state=tk.DISABLED)
+            self.tasks.submit(self.db.update_department, dept_id, name_var.get(), on_success=done, on_error=failed)
 
     def delete_department(self):
         selection = self.dept_tree.selection()
@@ -528,16 +691,16 @@ class UserManagementFrame(ttk.Frame):
         dept_id, dept_name = values[0], values[1]
         if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete the department '{dept_name}'?"):
             return
-        try:
-            # Check for references
-            student_count = self.db.fetch_one("SELECT COUNT(*) FROM student WHERE department_id = %s", (dept_id,))[0]
-            teacher_count = self.db.fetch_one("SELECT COUNT(*) FROM teacher WHERE department_id = %s", (dept_id,))[0]
-            course_count = self.db.fetch_one("SELECT COUNT(*) FROM course WHERE department_id = %s", (dept_id,))[0]
-            if student_count > 0 or teacher_count > 0 or course_count > 0:
-                messagebox.showerror("Error", "Cannot delete department: it is still referenced by students, teachers, or courses.")
+
+        def done(result):
+            success, message = result
+            if not success:
+                messagebox.showerror("Error", message)
                 return
-            self.db.execute_query("DELETE FROM department WHERE department_id = %s", (dept_id,))
-            messagebox.showinfo("Success", "Department deleted successfully!")
+            messagebox.showinfo("Success", message)
             self.refresh_departments()
-        except Exception as e:
+
+        def failed(e):
             messagebox.showerror("Error", f"Failed to delete department: {str(e)}")
+
+        self.tasks.submit(self.db.delete_department, dept_id, on_success=done, on_error=failed)
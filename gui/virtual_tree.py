@@ -0,0 +1,375 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+# Shown in rows whose page is still being fetched
+LOADING = 'Loading…'
+
+
+def patch_rows(loaded, key, keys, rows):
+    """Replace the loaded rows whose key is in keys by the matching fresh rows, in place.
+
+    Keys without a fresh row were deleted (or no longer match the list's
+    filters) and are dropped. Rows keep their position.
+    """
+    keys = set(keys)
+    fresh = {row[key]: row for row in rows}
+    loaded[:] = [fresh.get(row[key], row) for row in loaded if row[key] not in keys or row[key] in fresh]
+
+
+class ListRowSource:
+    """Row source over rows already in memory; sorts on any column"""
+
+    def __init__(self, rows):
+        self._rows = list(rows)
+
+    def count(self):
+        return len(self._rows)
+
+    def rows(self, start, stop):
+        return self._rows[start:stop]
+
+    def is_complete(self):
+        return True
+
+    def needs(self, stop):
+        return False
+
+    def patch(self, key, keys, rows):
+        patch_rows(self._rows, key, keys, rows)
+
+    def sort(self, column_index, column, descending):
+        # None sorts first (last when descending) instead of breaking the comparison
+        self._rows.sort(
+            key=lambda row: (row[column_index] is not None, row[column_index]),
+            reverse=descending
+        )
+        return True
+
+
+class PagedRowSource:
+    """Row source that pulls pages on demand from a keyset-paginated query.
+
+    fetch_page(after, limit, order_by, descending) returns (rows, next_after),
+    like the Database.get_*_page methods. sort_keys maps Treeview column names
+    to the order_by keys the query accepts; other columns are not sortable.
+    Rows are fetched only as far as the view has scrolled. fetch_rows(keys),
+    if given, re-reads single rows with the same filters, for patching.
+
+    rows() and count() never query; they answer from the pages loaded so far.
+    load() fetches synchronously (on a worker). For the Tk thread,
+    fetch_next() runs on a worker and add_page() takes its result; a page
+    fetched before a re-sort, or for a cursor that has since moved on, is
+    ignored. Keyset cursors cannot skip ahead, but count() only reaches one
+    page past the loaded rows, so any scroll position is at most a page away.
+    """
+
+    def __init__(self, fetch_page, sort_keys=None, order_by=None, page_size=200, fetch_rows=None):
+        self.fetch_page = fetch_page
+        self.fetch_rows = fetch_rows
+        self.sort_keys = sort_keys or {}
+        self.order_by = order_by
+        self.descending = False
+        self.page_size = page_size
+        self._reset()
+
+    def _reset(self):
+        self._rows = []
+        self._after = None
+        self._complete = False
+        self._generation = getattr(self, '_generation', 0) + 1
+
+    def load(self, stop):
+        """Fetch pages until stop rows are loaded; blocks, so call it on a worker"""
+        while self.needs(stop):
+            self.add_page(self.fetch_next())
+
+    def fetch_next(self):
+        """Fetch the page after the loaded rows without changing the source; safe on a worker"""
+        generation, after = self._generation, self._after
+        return generation, after, self.fetch_page(after, self.page_size, self.order_by, self.descending)
+
+    def add_page(self, page):
+        """Append a page from fetch_next; returns False if it no longer follows the loaded rows"""
+        generation, after, (rows, next_after) = page
+        if generation != self._generation or after != self._after or self._complete:
+            return False
+        self._rows.extend(rows)
+        self._after = next_after
+        if next_after is None:
+            self._complete = True
+        return True
+
+    def needs(self, stop):
+        """True while rows before stop are still to be fetched"""
+        return not self._complete and len(self._rows) < stop
+
+    def count(self):
+        """Rows known so far, plus one page while more may follow (keeps the scrollbar open)"""
+        return len(self._rows) if self._complete else len(self._rows) + self.page_size
+
+    def rows(self, start, stop):
+        return self._rows[start:stop]
+
+    def is_complete(self):
+        return self._complete
+
+    def patch(self, key, keys, rows):
+        patch_rows(self._rows, key, keys, rows)
+
+    def sort(self, column_index, column, descending):
+        if column not in self.sort_keys:
+            return False
+        self.order_by = self.sort_keys[column]
+        self.descending = descending
+        self._reset()
+        return True
+
+
+class VirtualTreeview(ttk.Frame):
+    """Treeview with a built-in scrollbar that only holds the visible rows as Tk items.
+
+    Rows come from a row source (ListRowSource, PagedRowSource). Scrolling
+    re-fills a fixed set of items, so the widget stays responsive at any row
+    count. Clicking a heading sorts by that column when the source supports
+    it. Selection is tracked by the key column and survives scrolling and
+    re-sorting. heading, column, bind, selection, item and focus are passed
+    through to the inner Treeview so it can be used like one.
+
+    With a TaskRunner, pages a PagedRowSource has not loaded yet are fetched
+    on a worker; their rows show as placeholders until the page arrives.
+    Without one they are fetched in place.
+    """
+
+    def __init__(self, parent, columns, source=None, key=0, formatter=None, tasks=None, **tree_options):
+        super().__init__(parent)
+        self.columns = tuple(columns)
+        self.tasks = tasks
+        self.key = key
+        self.formatter = formatter
+        self.source = source or ListRowSource([])
+        self.offset = 0
+        self._visible = 1
+        self._rows = []              # source rows currently shown, parallel to _items
+        self._items = []
+        self._selected = set()       # keys of selected rows, visible or not
+        self._headings = {}
+        self._sort_column = None
+        self._descending = False
+        self._rendering = False
+        self._loading = None         # source with a page fetch in flight
+
+        tree_options.setdefault('show', 'headings')
+        self.tree = ttk.Treeview(self, columns=self.columns, **tree_options)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        for column in self.columns:
+            self.tree.heading(column, command=lambda c=column: self.sort_by(c))
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Up>', lambda e: self._on_arrow(-1))
+        self.tree.bind('<Down>', lambda e: self._on_arrow(1))
+        self.tree.bind('<Prior>', lambda e: self._on_page(-1))
+        self.tree.bind('<Next>', lambda e: self._on_page(1))
+
+    # Treeview pass-throughs
+    def heading(self, column, option=None, **kw):
+        if 'text' in kw:
+            self._headings[column] = kw['text']
+        return self.tree.heading(column, option, **kw)
+
+    def column(self, column, option=None, **kw):
+        return self.tree.column(column, option, **kw)
+
+    def bind(self, sequence=None, func=None, add=None):
+        return self.tree.bind(sequence, func, add)
+
+    def selection(self):
+        return self.tree.selection()
+
+    def item(self, item, option=None, **kw):
+        return self.tree.item(item, option, **kw)
+
+    def focus(self, item=None):
+        return self.tree.focus(item)
+
+    # Data
+    def set_source(self, source):
+        """Show a new row source from the top, keeping the current sort if the source supports it"""
+        self.source = source
+        self.offset = 0
+        if self._sort_column is not None and not source.sort(
+                self.columns.index(self._sort_column), self._sort_column, self._descending):
+            self._sort_column = None
+            self._update_headings()
+        self.render()
+
+    def refresh(self):
+        self.render()
+
+    def patch(self, keys, rows):
+        """Show fresh versions of the rows with these keys; keys missing from rows are removed"""
+        self.source.patch(self.key, keys, rows)
+        self._selected -= set(keys) - {row[self.key] for row in rows}
+        self.render()
+
+    def selected_keys(self):
+        return set(self._selected)
+
+    def selected_rows(self):
+        """Selected rows among those currently shown"""
+        return [row for row in self._rows if row[self.key] in self._selected]
+
+    def sort_by(self, column):
+        descending = not self._descending if column == self._sort_column else False
+        if not self.source.sort(self.columns.index(column), column, descending):
+            return
+        self._sort_column = column
+        self._descending = descending
+        self.offset = 0
+        self._update_headings()
+        self.render()
+
+    def _update_headings(self):
+        for column in self.columns:
+            text = self._headings.get(column, column)
+            if column == self._sort_column:
+                text += ' ▼' if self._descending else ' ▲'
+            self.tree.heading(column, text=text)
+
+    # Scrolling
+    def scroll(self, delta):
+        total = self.source.count()
+        offset = max(0, min(self.offset + delta, total - self._visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            # count() ends a page past the loaded rows, so a jump only waits for that page
+            self.offset = int(float(value) * self.source.count())
+            self.render()
+        elif action == 'scroll':
+            step = self._visible if unit == 'pages' else 1
+            self.scroll(int(value) * step)
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-delta * 3)
+        return 'break'
+
+    def _on_arrow(self, direction):
+        focus = self.tree.focus()
+        if focus not in self._items:
+            return None
+        index = self._items.index(focus)
+        if (direction < 0 and index > 0) or (direction > 0 and index < len(self._items) - 1):
+            return None  # Treeview moves within the window itself
+        before = self.offset
+        self.scroll(direction)
+        if self.offset == before:
+            return 'break'
+        self._move_focus(index)
+        return 'break'
+
+    def _on_page(self, direction):
+        self.scroll(direction * self._visible)
+        return 'break'
+
+    def _move_focus(self, index):
+        if index < len(self._items):
+            item = self._items[index]
+            self.tree.focus(item)
+            self.tree.selection_set(item)
+
+    def _on_resize(self, event):
+        visible = self._visible_rows()
+        if visible != self._visible:
+            self._visible = visible
+            self.render()
+
+    def _visible_rows(self):
+        style = ttk.Style(self)
+        row_height = int(style.lookup('Treeview', 'rowheight') or 20)
+        if self._items:
+            box = self.tree.bbox(self._items[0])
+            if box:
+                return max(1, (self.tree.winfo_height() - box[1]) // box[3])
+        # Before the first row is drawn, assume a one-row heading
+        return max(1, self.tree.winfo_height() // row_height - 1)
+
+    # Rendering
+    def render(self):
+        """Fill the Tk items with the rows at the current offset"""
+        total = self.source.count()
+        self.offset = max(0, min(self.offset, total - self._visible))
+        stop = self.offset + self._visible
+        if self.source.needs(stop):
+            self._request_page(stop)
+        self._rows = self.source.rows(self.offset, stop)
+        # Rows of a page still in flight get placeholder items
+        shown = len(self._rows) if not self.source.needs(stop) else min(self._visible, max(0, total - self.offset))
+        self._rendering = True
+        try:
+            while len(self._items) < shown:
+                self._items.append(self.tree.insert('', tk.END))
+            while len(self._items) > shown:
+                self.tree.delete(self._items.pop())
+            selected = []
+            for item, row in zip(self._items, self._rows):
+                values = self.formatter(row) if self.formatter else row
+                self.tree.item(item, values=values)
+                if row[self.key] in self._selected:
+                    selected.append(item)
+            placeholder = (LOADING,) + ('',) * (len(self.columns) - 1)
+            for item in self._items[len(self._rows):]:
+                self.tree.item(item, values=placeholder)
+            self.tree.selection_set(selected)
+        finally:
+            self._rendering = False
+        self._update_scrollbar(self.source.count())
+
+    def _request_page(self, stop):
+        """Fetch the next page of the source on a worker and render again when it arrives"""
+        source = self.source
+        if self.tasks is None:
+            source.load(stop)
+            return
+        if self._loading is source:
+            return
+        self._loading = source
+
+        def loaded(page):
+            self._loading = None
+            if source is self.source:
+                source.add_page(page)
+                self.render()   # fetches again if the page was stale or the window is still short
+
+        def failed(e):
+            self._loading = None
+            messagebox.showerror("Error", f"Failed to load rows: {str(e)}")
+
+        self.tasks.submit(source.fetch_next, on_success=loaded, on_error=failed)
+
+    def _update_scrollbar(self, total):
+        if total <= 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self._visible) / total))
+
+    def _on_select(self, event):
+        if self._rendering:
+            return
+        shown = {row[self.key] for row in self._rows}
+        chosen = {self._rows[self._items.index(item)][self.key] for item in self.tree.selection()
+                  if item in self._items[:len(self._rows)]}
+        if str(self.tree.cget('selectmode')) == 'browse':
+            self._selected = chosen
+        else:
+            self._selected = (self._selected - shown) | chosen
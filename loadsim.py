@@ -0,0 +1,264 @@
+"""Simulate registration day: many students logging in and enrolling at once.
+
+Usage:
+    python loadsim.py                                    500 students against course_management_scale
+    python loadsim.py --students 2000 --arrival-rate 100 --think-time 2
+    python loadsim.py --pool-size 50 --output peak.json
+
+Run it against a database filled by datagen.py (--dbname, default
+course_management_scale, on the server from config.py). The simulation adds
+and drops real enrollments, so it refuses the application database.
+
+Students arrive as a Poisson process (--arrival-rate per second, 0 = all at
+once) and each runs one session on its own thread: authenticate_user and the
+student profile, the dashboard, then --actions enroll or drop attempts
+separated by exponentially distributed think time (mean --think-time
+seconds), reloading the dashboard after every change. Enrollments go through
+the enroll_student() SQL function; students pick among the first --focus
+courses on offer to them, so they compete for the same courses as on a real
+registration day. A student turned away from a full course (datagen.py
+--capacity) joins its waitlist, and drops promote waitlisted students. All
+sessions share one pooled Database (--pool-size connections), checked out per
+step as the GUI's TaskRunner does.
+
+The report gives throughput, latency percentiles per step, enrollment
+outcomes, connection pool waits and the deadlocks (40P01) and serialization
+failures (40001) PostgreSQL raised. Afterwards it checks what concurrent
+enrolling could break: offerings holding more seats than their capacity,
+seats_taken counters that disagree with the offering's enrollments, and
+students both enrolled in and waitlisted for the same offering. Each must
+be zero; if one is not, the exit status is 1.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from config import DB_CONFIG
+from database import Database
+from datagen import database_config
+from query_metrics import QueryMetrics
+
+DEADLOCK = '40P01'
+SERIALIZATION_FAILURE = '40001'
+
+# Each query counts the rows breaking one invariant after the run
+INVARIANT_CHECKS = {
+    'over_capacity': """
+        SELECT count(*) FROM course_offering WHERE capacity IS NOT NULL AND seats_taken > capacity
+    """,
+    'seat_counter_drift': """
+        SELECT count(*) FROM course_offering co
+        LEFT JOIN (SELECT offering_id, count(*) AS n FROM enrolls_in GROUP BY offering_id) e
+            ON e.offering_id = co.offering_id
+        WHERE co.seats_taken <> COALESCE(e.n, 0)
+    """,
+    'enrolled_and_waitlisted': """
+        SELECT count(*) FROM waitlist w
+        JOIN enrolls_in e ON e.offering_id = w.offering_id AND e.student_id = w.student_id
+    """,
+}
+
+
+class Simulation:
+    """Shared state of one run: the database, the settings and what the sessions measured"""
+
+    def __init__(self, db, password='password', actions=5, think_time=1.0, drop_ratio=0.2, focus=5):
+        self.db = db
+        self.password = password
+        self.actions = actions
+        self.think_time = think_time
+        self.drop_ratio = drop_ratio
+        self.focus = focus
+        self.metrics = QueryMetrics(slow_query_threshold=None)
+        self.outcomes = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def step(self, name, func):
+        """Run func on a connection checked out for this step and time it as name"""
+        started = time.perf_counter()
+        error = None
+        try:
+            with self.db.checkout():
+                return func()
+        except Exception as e:  # e.g. PoolTimeout; query errors are handled inside Database
+            error = e
+            raise
+        finally:
+            self.metrics.record(name, time.perf_counter() - started, error=error)
+
+    def think(self, rng):
+        if self.think_time > 0:
+            time.sleep(rng.expovariate(1 / self.think_time))
+
+    def run_session(self, username, rng):
+        """One student's visit; returns normally even if a step failed"""
+        try:
+            self._session(username, rng)
+            self.count('sessions_completed')
+        except Exception as e:
+            self.count(f"sessions_failed:{type(e).__name__}")
+
+    def _session(self, username, rng):
+        db = self.db
+
+        def login():
+            user = db.authenticate_user(username, self.password)
+            return db.get_student(user[0]) if user else None
+
+        profile = self.step('login', login)
+        if not profile:
+            self.count('login_failed')
+            return
+        student_id = profile[0]
+        available, _ = self.step('dashboard', lambda: db.get_student_dashboard(student_id))
+        enrolled_here = []
+        for _ in range(self.actions):
+            self.think(rng)
+            if enrolled_here and rng.random() < self.drop_ratio:
+                course_id = enrolled_here.pop(rng.randrange(len(enrolled_here)))
+                dropped = self.step('drop', lambda: db.drop_course(student_id, course_id))
+                self.count('dropped' if dropped else 'drop_failed')
+            elif available:
+                course_id = rng.choice(available[:self.focus])[0]
+                reason, _ = self.step('enroll', lambda: db.try_enroll(student_id, course_id))
+                self.count(reason)
+                if reason == 'offering_full':
+                    # Queue once instead of retrying; a drop promotes the head of the queue
+                    reason, _, _ = self.step('waitlist', lambda: db.join_waitlist(student_id, course_id))
+                    self.count(f"waitlist:{reason}")
+                if reason == 'enrolled':
+                    enrolled_here.append(course_id)
+            else:
+                self.count('nothing_available')
+                continue
+            available, _ = self.step('dashboard', lambda: db.get_student_dashboard(student_id))
+
+    def run(self, usernames, arrival_rate, seed=1):
+        """Start one session per username at the arrival rate and wait for all; returns the wall time"""
+        rng = random.Random(seed)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, len(usernames)), thread_name_prefix='student') as pool:
+            arrival = started
+            for index, username in enumerate(usernames):
+                if arrival_rate > 0:
+                    arrival += rng.expovariate(arrival_rate)
+                    delay = arrival - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                pool.submit(self.run_session, username, random.Random(seed + index + 1))
+        return time.perf_counter() - started
+
+
+def database_errors(db, codes):
+    """How often PostgreSQL raised each SQLSTATE in codes, over all queries"""
+    totals = Counter()
+    for stats in db.query_stats().values():
+        for code in codes:
+            totals[code] += stats['error_codes'].get(code, 0)
+    return totals
+
+
+def check_invariants(db):
+    """Rows breaking each of INVARIANT_CHECKS (None where the query failed)"""
+    violations = {}
+    for name, query in INVARIANT_CHECKS.items():
+        row = db.fetch_one(query)
+        violations[name] = row[0] if row else None
+    return violations
+
+
+def build_report(sim, elapsed, usernames, violations):
+    steps = {}
+    for name, stats in sorted(sim.metrics.snapshot().items()):
+        steps[name] = {
+            'calls': stats['calls'],
+            'errors': stats['errors'],
+            'p50_ms': stats['p50'] * 1000,
+            'p95_ms': stats['p95'] * 1000,
+            'p99_ms': stats['p99'] * 1000,
+            'max_ms': stats['max'] * 1000,
+        }
+    operations = sum(step['calls'] for step in steps.values())
+    errors = database_errors(sim.db, (DEADLOCK, SERIALIZATION_FAILURE))
+    return {
+        'students': len(usernames),
+        'elapsed_s': elapsed,
+        'sessions_per_s': len(usernames) / elapsed if elapsed else 0.0,
+        'operations_per_s': operations / elapsed if elapsed else 0.0,
+        'steps': steps,
+        'outcomes': dict(sim.outcomes),
+        'deadlocks': errors[DEADLOCK],
+        'serialization_failures': errors[SERIALIZATION_FAILURE],
+        'pool': sim.db.pool_stats(),
+        'invariant_violations': violations,
+    }
+
+
+def print_report(report):
+    print(f"{report['students']} students in {report['elapsed_s']:.1f} s: "
+          f"{report['sessions_per_s']:.1f} sessions/s, {report['operations_per_s']:.1f} operations/s")
+    print(f"{'step':12} {'calls':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, step in report['steps'].items():
+        print(f"{name:12} {step['calls']:>8} {step['errors']:>7} {step['p50_ms']:>9.2f} {step['p95_ms']:>9.2f} "
+              f"{step['p99_ms']:>9.2f} {step['max_ms']:>9.2f}")
+    print("Outcomes: " + ", ".join(f"{name} {count}" for name, count in sorted(report['outcomes'].items())))
+    print(f"Deadlocks (40P01): {report['deadlocks']}, "
+          f"serialization failures (40001): {report['serialization_failures']}")
+    pool = report['pool']
+    if pool:
+        print(f"Pool: {pool['maxconn']} connections, {pool['waits']} waits, {pool['timeouts']} timeouts")
+    print("Invariant violations: " + ", ".join(
+        f"{name} {count}" for name, count in report['invariant_violations'].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate registration-day load from many students")
+    parser.add_argument('--dbname', default='course_management_scale', help="database filled by datagen.py")
+    parser.add_argument('--students', type=int, default=500, help="number of student sessions")
+    parser.add_argument('--arrival-rate', type=float, default=50.0, help="students arriving per second (0: all at once)")
+    parser.add_argument('--think-time', type=float, default=1.0, help="mean seconds between a student's actions")
+    parser.add_argument('--actions', type=int, default=5, help="enroll/drop attempts per student")
+    parser.add_argument('--drop-ratio', type=float, default=0.2, help="share of actions that drop a course")
+    parser.add_argument('--focus', type=int, default=5, help="students choose among their first N courses")
+    parser.add_argument('--pool-size', type=int, default=20, help="database connections shared by all students")
+    parser.add_argument('--password', default='password', help="password of the generated students")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="also write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    if args.dbname == DB_CONFIG.get('dbname'):
+        print("Refusing to simulate against the application database; pass a separate --dbname")
+        return 2
+    db = Database(minconn=1, maxconn=args.pool_size, config=database_config(args.dbname), slow_query_threshold=None)
+    if db.pool is None:
+        print(f"Could not connect to {args.dbname}")
+        return 1
+    try:
+        usernames = [row[0] for row in db.fetch_all(
+            """SELECT username FROM "user" WHERE role = 'student' ORDER BY random() LIMIT %s""", (args.students,))]
+        if not usernames:
+            print(f"No students in {args.dbname}; fill it with datagen.py first")
+            return 1
+        sim = Simulation(db, args.password, args.actions, args.think_time, args.drop_ratio, args.focus)
+        elapsed = sim.run(usernames, args.arrival_rate, args.seed)
+        report = build_report(sim, elapsed, usernames, check_invariants(db))
+    finally:
+        db.disconnect()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(count != 0 for count in report['invariant_violations'].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
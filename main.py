@@ -1,20 +1,61 @@
+import logging
 import tkinter as tk
 from tkinter import ttk, messagebox
 from ttkthemes import ThemedTk
-from database import Database
+from database import Database, DB_POOL
 from gui.student_interface import StudentInterface
 from gui.teacher_interface import TeacherInterface
 from gui.course_management import CourseManagementFrame
 from gui.user_management import UserManagementFrame
+from gui.task_runner import TaskRunner
+from service_client import ServiceClient
+from session import Session
+
+try:
+    from config import SERVICE_URL
+except ImportError:
+    SERVICE_URL = None
+
+# Worker threads for database calls; each holds its own pooled connection
+TASK_WORKERS = 4
 
 class CourseManagementSystem:
     def __init__(self):
         self.root = ThemedTk(theme="arc")
         self.root.title("Course Management System")
         self.root.geometry("800x600")
-        self.db = Database()
+        if SERVICE_URL:
+            # Client mode: every call goes through service.py, no database connection here
+            self.db = ServiceClient(SERVICE_URL)
+        else:
+            # Pooled so the task workers and the Tk thread never share a connection
+            self.db = Database(maxconn=None if DB_POOL else TASK_WORKERS + 1)
+        self.tasks = TaskRunner(self.root, max_workers=TASK_WORKERS)
         self.current_user = None
+        self.setup_status_bar()
         self.setup_login_frame()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def setup_status_bar(self):
+        # Busy indicator shown while database work runs in the background
+        self.status_bar = ttk.Frame(self.root)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.busy_label = ttk.Label(self.status_bar, text="")
+        self.busy_label.pack(side=tk.LEFT, padx=10, pady=2)
+        self.busy_bar = ttk.Progressbar(self.status_bar, mode='indeterminate', length=120)
+        self.tasks.add_busy_listener(self.set_busy)
+
+    def set_busy(self, busy):
+        if busy:
+            self.busy_label.configure(text="Working...")
+            self.busy_bar.pack(side=tk.LEFT, pady=2)
+            self.busy_bar.start(15)
+            self.root.configure(cursor='watch')
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.busy_label.configure(text="")
+            self.root.configure(cursor='')
 
     def setup_login_frame(self):
         # Create and configure the main frame
@@ -62,25 +103,14 @@ class CourseManagementSystem:
             messagebox.showerror("Error", "Invalid username or password")
             return
 
-        # Fetch full name from user table (normalized)
-        role = user[3]
-        full_name = f"{user[4]} {user[5]}"
-
-        print(f"Authenticated user: {user}")
-        self.current_user = {
-            'user_id': user[0],
-            'username': user[1],
-            'role': role,
-            'full_name': full_name
-        }
-        print(f"Current user data: {self.current_user}")
+        # Resolve the student/teacher profile once for the whole session
+        self.current_user = Session(self.db, user)
 
         # Clear login frame and show appropriate interface
         self.login_frame.destroy()
         self.show_main_interface()
 
     def show_main_interface(self):
-        print(f"Showing interface for role: {self.current_user['role']}")
         # Create main interface based on user role
         if self.current_user['role'] == 'student':
             self.show_student_interface()
@@ -91,7 +121,7 @@ class CourseManagementSystem:
 
     def show_student_interface(self):
         # Create student interface
-        student_interface = StudentInterface(self.root, self.db, self.current_user)
+        student_interface = StudentInterface(self.root, self.db, self.current_user, tasks=self.tasks)
         student_interface.pack(fill=tk.BOTH, expand=True)
 
         # Add logout button
@@ -104,7 +134,7 @@ class CourseManagementSystem:
 
     def show_teacher_interface(self):
         # Create teacher interface
-        teacher_interface = TeacherInterface(self.root, self.db, self.current_user)
+        teacher_interface = TeacherInterface(self.root, self.db, self.current_user, tasks=self.tasks)
         teacher_interface.pack(fill=tk.BOTH, expand=True)
 
         # Add logout button
@@ -122,13 +152,13 @@ class CourseManagementSystem:
 
         # Users tab
         users_tab = ttk.Frame(admin_notebook)
-        user_frame = UserManagementFrame(users_tab, self.db, self.current_user, mode='user')
+        user_frame = UserManagementFrame(users_tab, self.db, self.current_user, mode='user', tasks=self.tasks)
         user_frame.pack(fill=tk.BOTH, expand=True)
         admin_notebook.add(users_tab, text="Users")
 
         # Departments tab
         departments_tab = ttk.Frame(admin_notebook)
-        department_frame = UserManagementFrame(departments_tab, self.db, self.current_user, mode='department')
+        department_frame = UserManagementFrame(departments_tab, self.db, self.current_user, mode='department', tasks=self.tasks)
         department_frame.pack(fill=tk.BOTH, expand=True)
         admin_notebook.add(departments_tab, text="Departments")
 
@@ -142,15 +172,22 @@ class CourseManagementSystem:
 
     def logout(self):
         self.current_user = None
-        # Clear all widgets
+        # Clear all widgets except the status bar
         for widget in self.root.winfo_children():
-            widget.destroy()
+            if widget is not self.status_bar:
+                widget.destroy()
         # Show login frame again
         self.setup_login_frame()
 
+    def close(self):
+        self.tasks.shutdown()
+        self.root.destroy()
+        self.db.disconnect()
+
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = CourseManagementSystem()
     app.run() 
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""Apply the numbered SQL migrations in migrations/ and record them in schema_migrations.
+
+Usage:
+    python migrate.py             apply every pending migration
+    python migrate.py --status    list migrations and whether they are applied
+    python migrate.py --target N  apply pending migrations up to version N
+
+Files are named NNN_description.sql and applied in version order. A file runs
+in a single transaction together with its schema_migrations row, unless its
+first line is "-- migrate:no-transaction" (needed for CREATE INDEX
+CONCURRENTLY); such files run statement by statement in autocommit mode and
+must be idempotent, so a failed run can simply be repeated.
+"""
+import argparse
+import os
+import re
+import sys
+import psycopg2
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+NO_TRANSACTION_MARKER = '-- migrate:no-transaction'
+# Arbitrary key shared by all runners so two of them never interleave
+ADVISORY_LOCK_KEY = 727274
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+_CONCURRENT_INDEX = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding='utf-8') as f:
+            self.sql = f.read()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration version in {directory}")
+    return migrations
+
+
+def split_statements(sql):
+    """Split a script on top-level semicolons, respecting quotes, comments and $tag$ bodies"""
+    statements = []
+    current = []
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch == '-' and sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = n if end == -1 else end
+            current.append(sql[i:end])
+            i = end
+        elif ch == '/' and sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            current.append(sql[i:end])
+            i = end
+        elif ch in ("'", '"'):
+            end = i + 1
+            while end < n:
+                if sql[end] == ch:
+                    # A doubled quote is an escaped quote
+                    if end + 1 < n and sql[end + 1] == ch:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif ch == '$':
+            match = re.match(r'\$(\w*)\$', sql[i:])
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, i + len(tag))
+                end = n if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+            else:
+                current.append(ch)
+                i += 1
+        elif ch == ';':
+            statements.append(''.join(current))
+            current = []
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+    statements.append(''.join(current))
+    return [s.strip() for s in statements if _has_code(s)]
+
+
+def _has_code(statement):
+    lines = [line for line in statement.splitlines() if not line.strip().startswith('--')]
+    return bool(''.join(lines).strip())
+
+
+def ensure_version_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+    conn.commit()
+
+
+def applied_versions(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return versions
+
+
+def _drop_invalid_index(cursor, index_name):
+    """A failed CREATE INDEX CONCURRENTLY leaves an INVALID index that IF NOT EXISTS would skip"""
+    cursor.execute("""
+    SELECT 1 FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = %s AND NOT i.indisvalid
+    """, (index_name,))
+    if cursor.fetchone():
+        print(f"  dropping invalid index {index_name} left by an earlier run")
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"')
+
+
+def apply_migration(conn, migration):
+    if migration.transactional:
+        with conn.cursor() as cursor:
+            cursor.execute(migration.sql)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                           (migration.version, migration.name))
+        conn.commit()
+        return
+
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for statement in split_statements(migration.sql):
+                match = _CONCURRENT_INDEX.search(statement)
+                if match:
+                    _drop_invalid_index(cursor, match.group(1))
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                           (migration.version, migration.name))
+    finally:
+        conn.autocommit = False
+
+
+def migrate(conn, target=None, migrations=None):
+    """Apply pending migrations up to target (inclusive); returns the applied ones"""
+    migrations = load_migrations() if migrations is None else migrations
+    ensure_version_table(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+    conn.commit()
+    applied = []
+    try:
+        done = applied_versions(conn)
+        for migration in migrations:
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            print(f"Applying {migration.version:03d}_{migration.name} ...")
+            try:
+                apply_migration(conn, migration)
+            except psycopg2.Error:
+                if not conn.autocommit:
+                    conn.rollback()
+                raise
+            applied.append(migration)
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+        conn.commit()
+    return applied
+
+
+def status(conn, migrations=None):
+    migrations = load_migrations() if migrations is None else migrations
+    ensure_version_table(conn)
+    done = applied_versions(conn)
+    return [(m.version, m.name, m.version in done) for m in migrations]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument('--status', action='store_true', help="show applied and pending migrations")
+    parser.add_argument('--target', type=int, help="apply pending migrations up to this version")
+    args = parser.parse_args(argv)
+
+    from config import DB_CONFIG
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if args.status:
+            for version, name, is_applied in status(conn):
+                print(f"{version:03d}_{name}: {'applied' if is_applied else 'pending'}")
+            return 0
+        applied = migrate(conn, target=args.target)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+        return 0
+    except psycopg2.Error as e:
+        print(f"Migration failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+-- Remove duplicates so the unique indexes in 002 can be built on existing data.
+-- The earliest row of each group is kept.
+DELETE FROM enrolls_in e
+USING enrolls_in keep
+WHERE e.student_id = keep.student_id
+  AND e.course_id = keep.course_id
+  AND e.enrollment_id > keep.enrollment_id;
+
+DELETE FROM course_offering o
+USING course_offering keep
+WHERE o.course_id = keep.course_id
+  AND o.semester_id = keep.semester_id
+  AND o.offering_id > keep.offering_id;
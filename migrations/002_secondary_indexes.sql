@@ -0,0 +1,19 @@
+-- migrate:no-transaction
+-- Built CONCURRENTLY so a populated database keeps serving reads and writes.
+
+-- Enrollment lookups by student (get_student_courses, is_student_enrolled) and by course
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS enrolls_in_student_course_key ON enrolls_in (student_id, course_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS enrolls_in_course_idx ON enrolls_in (course_id);
+
+-- Offerings by course/semester (enrollment checks, duplicate offering check), semester and instructor
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS course_offering_course_semester_key ON course_offering (course_id, semester_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS course_offering_semester_idx ON course_offering (semester_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS course_offering_instructor_idx ON course_offering (instructor_id);
+
+-- Department foreign keys (joins and the department delete reference check)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS student_department_idx ON student (department_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS teacher_department_idx ON teacher (department_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS course_department_idx ON course (department_id);
+
+-- Current semester lookup
+CREATE INDEX CONCURRENTLY IF NOT EXISTS semester_dates_idx ON semester (start_date, end_date);
@@ -0,0 +1,10 @@
+-- Promote the unique indexes from 002 to constraints (no table rebuild)
+ALTER TABLE enrolls_in
+    ADD CONSTRAINT enrolls_in_student_course_key UNIQUE USING INDEX enrolls_in_student_course_key;
+ALTER TABLE course_offering
+    ADD CONSTRAINT course_offering_course_semester_key UNIQUE USING INDEX course_offering_course_semester_key;
+
+-- NOT VALID + VALIDATE avoids holding an exclusive lock while existing rows are checked
+ALTER TABLE semester
+    ADD CONSTRAINT semester_dates_check CHECK (end_date >= start_date) NOT VALID;
+ALTER TABLE semester VALIDATE CONSTRAINT semester_dates_check;
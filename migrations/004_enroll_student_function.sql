@@ -0,0 +1,67 @@
+-- Enrollment validation and insert in one server round trip.
+-- Returns a reason code ('enrolled' on success) plus the student's level for
+-- the level_mismatch message. Concurrent double enrollment is stopped by
+-- enrolls_in_student_course_key (003): the losing insert reports already_enrolled.
+CREATE OR REPLACE FUNCTION enroll_student(p_student_id INTEGER, p_course_id INTEGER)
+RETURNS TABLE (reason TEXT, student_level TEXT)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_student RECORD;
+    v_course RECORD;
+    v_open BOOLEAN;
+BEGIN
+    SELECT s.level, s.department_id INTO v_student
+    FROM student s WHERE s.student_id = p_student_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'student_not_found'::TEXT, NULL::TEXT;
+        RETURN;
+    END IF;
+
+    SELECT c.level, c.type, c.department_id INTO v_course
+    FROM course c WHERE c.course_id = p_course_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'course_not_found'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF v_student.level IS DISTINCT FROM v_course.level THEN
+        RETURN QUERY SELECT 'level_mismatch'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF v_student.department_id IS DISTINCT FROM v_course.department_id
+       AND v_course.type NOT IN ('Elective', 'Technical Elective') THEN
+        RETURN QUERY SELECT 'department_restricted'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM enrolls_in e WHERE e.student_id = p_student_id AND e.course_id = p_course_id) THEN
+        RETURN QUERY SELECT 'already_enrolled'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    -- NULL: no offering at all; FALSE: only offerings in semesters that have ended
+    SELECT bool_or(sem.end_date >= CURRENT_DATE) INTO v_open
+    FROM course_offering co
+    JOIN semester sem ON co.semester_id = sem.semester_id
+    WHERE co.course_id = p_course_id;
+    IF v_open IS NULL THEN
+        RETURN QUERY SELECT 'not_offered'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+    IF NOT v_open THEN
+        RETURN QUERY SELECT 'semester_ended'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    INSERT INTO enrolls_in (student_id, course_id)
+    VALUES (p_student_id, p_course_id)
+    ON CONFLICT ON CONSTRAINT enrolls_in_student_course_key DO NOTHING;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'already_enrolled'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    RETURN QUERY SELECT 'enrolled'::TEXT, v_student.level::TEXT;
+END;
+$$;
@@ -0,0 +1,7 @@
+-- migrate:no-transaction
+-- Sort keys for the keyset-paginated list screens (PAGE_SORTS in database.py).
+-- Each index ends in the primary key, which breaks ties between equal sort values.
+-- user.username and course.course_code are already covered by their UNIQUE constraints.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS user_role_idx ON "user" (role, user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS course_name_idx ON course (course_name, course_id);
@@ -0,0 +1,119 @@
+-- Enrollments reference the offering (course in a given semester) they belong to,
+-- so student course lists join one offering per enrollment instead of every
+-- offering the course has ever had. course_id stays for the one-enrollment-per-
+-- course rule (enrolls_in_student_course_key); the composite foreign key keeps
+-- it equal to the offering's course.
+
+ALTER TABLE course_offering
+    ADD CONSTRAINT course_offering_offering_course_key UNIQUE (offering_id, course_id);
+
+ALTER TABLE enrolls_in ADD COLUMN IF NOT EXISTS offering_id INTEGER;
+
+-- Backfill: the offering whose semester contains the enrollment date, otherwise
+-- the offering of that course whose semester starts closest to it.
+UPDATE enrolls_in e
+SET offering_id = (
+    SELECT co.offering_id
+    FROM course_offering co
+    JOIN semester s ON s.semester_id = co.semester_id
+    WHERE co.course_id = e.course_id
+    ORDER BY (COALESCE(e.created_at::date, CURRENT_DATE) BETWEEN s.start_date AND s.end_date) DESC,
+             abs(s.start_date - COALESCE(e.created_at::date, CURRENT_DATE)),
+             co.offering_id
+    LIMIT 1
+)
+WHERE e.offering_id IS NULL;
+
+-- Enrollments in courses that were never offered have no offering to point
+-- at. Rather than guess, stop here and let an admin add the missing offerings
+-- (or delete those enrollments) before running the migration again.
+DO $$
+DECLARE
+    v_orphans INTEGER;
+    v_courses TEXT;
+BEGIN
+    SELECT count(*), string_agg(DISTINCT c.course_code, ', ')
+    INTO v_orphans, v_courses
+    FROM enrolls_in e
+    JOIN course c ON c.course_id = e.course_id
+    WHERE e.offering_id IS NULL;
+    IF v_orphans > 0 THEN
+        RAISE EXCEPTION '% enrollment(s) are in courses that were never offered (%); add an offering for each course or delete those enrollments, then migrate again',
+            v_orphans, v_courses;
+    END IF;
+END;
+$$;
+
+ALTER TABLE enrolls_in ALTER COLUMN offering_id SET NOT NULL;
+
+ALTER TABLE enrolls_in
+    ADD CONSTRAINT enrolls_in_offering_fkey FOREIGN KEY (offering_id, course_id)
+    REFERENCES course_offering (offering_id, course_id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE enrolls_in VALIDATE CONSTRAINT enrolls_in_offering_fkey;
+
+-- enroll_student() now records the offering: the course's offering in the
+-- current semester, or else the next one to start
+CREATE OR REPLACE FUNCTION enroll_student(p_student_id INTEGER, p_course_id INTEGER)
+RETURNS TABLE (reason TEXT, student_level TEXT)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_student RECORD;
+    v_course RECORD;
+    v_offering_id INTEGER;
+BEGIN
+    SELECT s.level, s.department_id INTO v_student
+    FROM student s WHERE s.student_id = p_student_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'student_not_found'::TEXT, NULL::TEXT;
+        RETURN;
+    END IF;
+
+    SELECT c.level, c.type, c.department_id INTO v_course
+    FROM course c WHERE c.course_id = p_course_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'course_not_found'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF v_student.level IS DISTINCT FROM v_course.level THEN
+        RETURN QUERY SELECT 'level_mismatch'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF v_student.department_id IS DISTINCT FROM v_course.department_id
+       AND v_course.type NOT IN ('Elective', 'Technical Elective') THEN
+        RETURN QUERY SELECT 'department_restricted'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM enrolls_in e WHERE e.student_id = p_student_id AND e.course_id = p_course_id) THEN
+        RETURN QUERY SELECT 'already_enrolled'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    SELECT co.offering_id INTO v_offering_id
+    FROM course_offering co
+    JOIN semester sem ON co.semester_id = sem.semester_id
+    WHERE co.course_id = p_course_id AND sem.end_date >= CURRENT_DATE
+    ORDER BY sem.end_date, co.offering_id
+    LIMIT 1;
+    IF v_offering_id IS NULL THEN
+        IF EXISTS (SELECT 1 FROM course_offering co WHERE co.course_id = p_course_id) THEN
+            RETURN QUERY SELECT 'semester_ended'::TEXT, v_student.level::TEXT;
+        ELSE
+            RETURN QUERY SELECT 'not_offered'::TEXT, v_student.level::TEXT;
+        END IF;
+        RETURN;
+    END IF;
+
+    INSERT INTO enrolls_in (student_id, course_id, offering_id)
+    VALUES (p_student_id, p_course_id, v_offering_id)
+    ON CONFLICT ON CONSTRAINT enrolls_in_student_course_key DO NOTHING;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'already_enrolled'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    RETURN QUERY SELECT 'enrolled'::TEXT, v_student.level::TEXT;
+END;
+$$;
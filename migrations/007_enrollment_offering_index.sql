@@ -0,0 +1,3 @@
+-- migrate:no-transaction
+-- Enrollments by offering (course roster per semester, ON DELETE CASCADE from course_offering)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS enrolls_in_offering_idx ON enrolls_in (offering_id);
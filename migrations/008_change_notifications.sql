@@ -0,0 +1,81 @@
+-- Change feed for live client updates (Database.subscribe). After every
+-- statement that changes one of the watched tables, one notification goes out
+-- on the cms_changes channel:
+--   {"table": "course", "op": "update", "rows": [{"course_id": 7}, ...]}
+-- rows holds only the key columns named in the trigger arguments. When a
+-- statement touches more than 50 rows (bulk import, cascades) or the table is
+-- truncated, rows is null and listeners reload instead of patching.
+-- Notifications are sent at commit, so rolled back changes are never seen.
+
+CREATE OR REPLACE FUNCTION notify_changes()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_count INTEGER;
+    v_rows JSONB;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        v_count := NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT count(*), jsonb_agg(
+                   (SELECT jsonb_object_agg(col, to_jsonb(t) -> col) FROM unnest(TG_ARGV) AS col))
+        INTO v_count, v_rows
+        FROM (SELECT * FROM old_rows LIMIT 51) t;
+    ELSE
+        SELECT count(*), jsonb_agg(
+                   (SELECT jsonb_object_agg(col, to_jsonb(t) -> col) FROM unnest(TG_ARGV) AS col))
+        INTO v_count, v_rows
+        FROM (SELECT * FROM new_rows LIMIT 51) t;
+    END IF;
+
+    IF v_count = 0 THEN
+        RETURN NULL;  -- statement matched nothing
+    END IF;
+    IF v_count IS NULL OR v_count > 50 THEN
+        v_rows := NULL;
+    END IF;
+
+    PERFORM pg_notify('cms_changes', jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', lower(TG_OP),
+        'rows', v_rows
+    )::text);
+    RETURN NULL;
+END;
+$$;
+
+-- Transition tables allow only one event per trigger, so each table gets one
+-- trigger per event. The arguments are the key columns sent to listeners.
+DO $$
+DECLARE
+    v_table RECORD;
+BEGIN
+    FOR v_table IN
+        SELECT * FROM (VALUES
+            ('course', $a$'course_id'$a$),
+            ('course_offering', $a$'offering_id', 'course_id', 'semester_id', 'instructor_id'$a$),
+            ('enrolls_in', $a$'enrollment_id', 'student_id', 'course_id', 'offering_id'$a$),
+            ('user', $a$'user_id', 'role'$a$),
+            ('department', $a$'department_id'$a$)
+        ) AS t (name, key_columns)
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', v_table.name || '_notify_insert', v_table.name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', v_table.name || '_notify_update', v_table.name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', v_table.name || '_notify_delete', v_table.name);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', v_table.name || '_notify_truncate', v_table.name);
+
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notify_changes(%s)',
+                       v_table.name || '_notify_insert', v_table.name, v_table.key_columns);
+        EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notify_changes(%s)',
+                       v_table.name || '_notify_update', v_table.name, v_table.key_columns);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notify_changes(%s)',
+                       v_table.name || '_notify_delete', v_table.name, v_table.key_columns);
+        EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notify_changes()',
+                       v_table.name || '_notify_truncate', v_table.name);
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,232 @@
+-- Seat limits per offering. capacity is the number of seats (NULL: unlimited);
+-- seats_taken counts the offering's enrollments and is kept up to date by the
+-- statement triggers below, so availability checks read one row instead of
+-- counting enrolls_in. The check constraint makes overbooking impossible
+-- whichever path inserts the enrollment. reconcile_seats() recounts, for
+-- enrollments loaded with triggers disabled or counters that drifted.
+ALTER TABLE course_offering ADD COLUMN IF NOT EXISTS capacity INTEGER;
+ALTER TABLE course_offering ADD COLUMN IF NOT EXISTS seats_taken INTEGER NOT NULL DEFAULT 0;
+
+UPDATE course_offering co
+SET seats_taken = counted.n
+FROM (SELECT offering_id, count(*) AS n FROM enrolls_in GROUP BY offering_id) counted
+WHERE co.offering_id = counted.offering_id;
+
+ALTER TABLE course_offering
+    ADD CONSTRAINT course_offering_capacity_check CHECK (capacity IS NULL OR capacity >= 0);
+ALTER TABLE course_offering
+    ADD CONSTRAINT course_offering_seats_check
+    CHECK (seats_taken >= 0 AND (capacity IS NULL OR seats_taken <= capacity));
+
+-- One UPDATE per statement and offering, so bulk enrollments and cascaded
+-- deletes cost one counter change per offering rather than per row. An
+-- UPDATE of enrolls_in is netted per offering, so moving enrollments between
+-- full offerings does not trip the check and rows that keep their offering
+-- leave the counter alone. The offerings are locked in id order first, so
+-- two statements touching several offerings take their locks in the same
+-- order. The locks are FOR NO KEY UPDATE, like the UPDATE itself: they do not
+-- conflict with the FOR KEY SHARE locks the enrolls_in foreign key checks
+-- (which run before this trigger) hold on the same rows.
+CREATE OR REPLACE FUNCTION count_offering_seats()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_offering_ids INTEGER[];
+    v_changes INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(offering_id ORDER BY offering_id), array_agg(n ORDER BY offering_id)
+        INTO v_offering_ids, v_changes
+        FROM (SELECT offering_id, count(*)::INTEGER AS n FROM new_rows
+              GROUP BY offering_id) taken;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(offering_id ORDER BY offering_id), array_agg(-n ORDER BY offering_id)
+        INTO v_offering_ids, v_changes
+        FROM (SELECT offering_id, count(*)::INTEGER AS n FROM old_rows
+              GROUP BY offering_id) released;
+    ELSE
+        SELECT array_agg(offering_id ORDER BY offering_id), array_agg(n ORDER BY offering_id)
+        INTO v_offering_ids, v_changes
+        FROM (SELECT offering_id, sum(n)::INTEGER AS n
+              FROM (SELECT offering_id, 1 AS n FROM new_rows
+                    UNION ALL
+                    SELECT offering_id, -1 FROM old_rows) moved
+              GROUP BY offering_id
+              HAVING sum(n) <> 0) netted;
+    END IF;
+    IF v_offering_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM 1 FROM course_offering co
+    WHERE co.offering_id = ANY(v_offering_ids)
+    ORDER BY co.offering_id
+    FOR NO KEY UPDATE;
+    UPDATE course_offering co
+    SET seats_taken = co.seats_taken + changed.n
+    FROM unnest(v_offering_ids, v_changes) AS changed(offering_id, n)
+    WHERE co.offering_id = changed.offering_id;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS enrolls_in_seats_insert ON enrolls_in;
+DROP TRIGGER IF EXISTS enrolls_in_seats_update ON enrolls_in;
+DROP TRIGGER IF EXISTS enrolls_in_seats_delete ON enrolls_in;
+CREATE TRIGGER enrolls_in_seats_insert AFTER INSERT ON enrolls_in REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_offering_seats();
+CREATE TRIGGER enrolls_in_seats_update AFTER UPDATE ON enrolls_in
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_offering_seats();
+CREATE TRIGGER enrolls_in_seats_delete AFTER DELETE ON enrolls_in REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_offering_seats();
+
+-- seats_taken changes with every enrollment, which the enrolls_in feed
+-- already reports, so offering updates that only move the counter stay off
+-- the change feed; otherwise every open window would reload on every
+-- enrollment. Same payload as notify_changes() for the columns that matter.
+CREATE OR REPLACE FUNCTION notify_offering_update()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_count INTEGER;
+    v_rows JSONB;
+BEGIN
+    SELECT count(*), jsonb_agg(jsonb_build_object('offering_id', t.offering_id, 'course_id', t.course_id,
+                                                  'semester_id', t.semester_id, 'instructor_id', t.instructor_id))
+    INTO v_count, v_rows
+    FROM (
+        SELECT n.*
+        FROM new_rows n
+        LEFT JOIN old_rows o ON o.offering_id = n.offering_id
+        WHERE o.offering_id IS NULL
+           OR to_jsonb(n) - 'seats_taken' IS DISTINCT FROM to_jsonb(o) - 'seats_taken'
+        LIMIT 51
+    ) t;
+
+    IF v_count = 0 THEN
+        RETURN NULL;
+    END IF;
+    IF v_count > 50 THEN
+        v_rows := NULL;
+    END IF;
+
+    PERFORM pg_notify('cms_changes', jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', 'update',
+        'rows', v_rows
+    )::text);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS course_offering_notify_update ON course_offering;
+CREATE TRIGGER course_offering_notify_update AFTER UPDATE ON course_offering
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_offering_update();
+
+-- Recount seats_taken where it disagrees with enrolls_in; returns the offerings
+-- it corrected. Fails (and changes nothing) if an offering holds more
+-- enrollments than its capacity.
+CREATE OR REPLACE FUNCTION reconcile_seats()
+RETURNS TABLE (offering_id INTEGER, recorded INTEGER, actual INTEGER)
+LANGUAGE plpgsql AS $$
+BEGIN
+    RETURN QUERY
+    WITH counted AS (
+        SELECT co.offering_id, co.seats_taken,
+               (SELECT count(*)::INTEGER FROM enrolls_in e WHERE e.offering_id = co.offering_id) AS n
+        FROM course_offering co
+        ORDER BY co.offering_id
+        FOR NO KEY UPDATE
+    ),
+    fixed AS (
+        UPDATE course_offering co
+        SET seats_taken = counted.n
+        FROM counted
+        WHERE co.offering_id = counted.offering_id AND co.seats_taken <> counted.n
+        RETURNING co.offering_id, counted.seats_taken AS recorded, counted.n AS actual
+    )
+    SELECT f.offering_id, f.recorded, f.actual FROM fixed f ORDER BY f.offering_id;
+END;
+$$;
+
+-- enroll_student() now locks the chosen offering and refuses it when full.
+-- The lock queues concurrent enrollments into the same offering, so each one
+-- sees the seats taken by those that committed before it. It is the same
+-- FOR NO KEY UPDATE lock count_offering_seats() takes, which leaves foreign
+-- key checks of other enrollments unblocked.
+CREATE OR REPLACE FUNCTION enroll_student(p_student_id INTEGER, p_course_id INTEGER)
+RETURNS TABLE (reason TEXT, student_level TEXT)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_student RECORD;
+    v_course RECORD;
+    v_offering_id INTEGER;
+    v_seats RECORD;
+BEGIN
+    SELECT s.level, s.department_id INTO v_student
+    FROM student s WHERE s.student_id = p_student_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'student_not_found'::TEXT, NULL::TEXT;
+        RETURN;
+    END IF;
+
+    SELECT c.level, c.type, c.department_id INTO v_course
+    FROM course c WHERE c.course_id = p_course_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'course_not_found'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF v_student.level IS DISTINCT FROM v_course.level THEN
+        RETURN QUERY SELECT 'level_mismatch'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF v_student.department_id IS DISTINCT FROM v_course.department_id
+       AND v_course.type NOT IN ('Elective', 'Technical Elective') THEN
+        RETURN QUERY SELECT 'department_restricted'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM enrolls_in e WHERE e.student_id = p_student_id AND e.course_id = p_course_id) THEN
+        RETURN QUERY SELECT 'already_enrolled'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    SELECT co.offering_id INTO v_offering_id
+    FROM course_offering co
+    JOIN semester sem ON co.semester_id = sem.semester_id
+    WHERE co.course_id = p_course_id AND sem.end_date >= CURRENT_DATE
+    ORDER BY sem.end_date, co.offering_id
+    LIMIT 1;
+
+    IF v_offering_id IS NULL THEN
+        IF EXISTS (SELECT 1 FROM course_offering co WHERE co.course_id = p_course_id) THEN
+            RETURN QUERY SELECT 'semester_ended'::TEXT, v_student.level::TEXT;
+        ELSE
+            RETURN QUERY SELECT 'not_offered'::TEXT, v_student.level::TEXT;
+        END IF;
+        RETURN;
+    END IF;
+
+    SELECT co.capacity, co.seats_taken INTO v_seats
+    FROM course_offering co WHERE co.offering_id = v_offering_id
+    FOR NO KEY UPDATE;
+    IF v_seats.capacity IS NOT NULL AND v_seats.seats_taken >= v_seats.capacity THEN
+        RETURN QUERY SELECT 'offering_full'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    INSERT INTO enrolls_in (student_id, course_id, offering_id)
+    VALUES (p_student_id, p_course_id, v_offering_id)
+    ON CONFLICT ON CONSTRAINT enrolls_in_student_course_key DO NOTHING;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'already_enrolled'::TEXT, v_student.level::TEXT;
+        RETURN;
+    END IF;
+
+    RETURN QUERY SELECT 'enrolled'::TEXT, v_student.level::TEXT;
+END;
+$$;
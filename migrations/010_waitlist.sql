@@ -0,0 +1,187 @@
+-- FIFO waitlist per offering. A student turned away with 'offering_full' can
+-- queue with join_waitlist(); whenever a seat frees up (a dropped or deleted
+-- enrollment, a cascaded delete, reconcile_seats() or a larger capacity)
+-- promote_waitlist() enrolls the head of the queue in the same transaction,
+-- so a freed seat never sits empty while students wait, a newcomer can never
+-- take it ahead of them, and clients never need to retry. waitlist_id is the
+-- queue order.
+CREATE TABLE IF NOT EXISTS waitlist (
+    waitlist_id SERIAL PRIMARY KEY,
+    offering_id INTEGER NOT NULL REFERENCES course_offering(offering_id) ON DELETE CASCADE,
+    student_id INTEGER NOT NULL REFERENCES student(student_id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT waitlist_offering_student_key UNIQUE (offering_id, student_id)
+);
+
+-- Queue order within an offering: the head for promotion, and a student's
+-- position is an index range count up to their own entry
+CREATE INDEX IF NOT EXISTS waitlist_queue_idx ON waitlist (offering_id, waitlist_id);
+-- A student's own entries (get_waitlist)
+CREATE INDEX IF NOT EXISTS waitlist_student_idx ON waitlist (student_id);
+
+-- Fill the offering's free seats from the head of its queue; returns the
+-- promoted students. Entries of students who no longer meet the
+-- enroll_student() rules, or who got the course some other way, are removed
+-- and skipped. Once the offering's semester has ended its queue is dropped
+-- instead, since nobody can be enrolled any more.
+CREATE OR REPLACE FUNCTION promote_waitlist(p_offering_id INTEGER)
+RETURNS SETOF INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_offering RECORD;
+    v_student_id INTEGER;
+BEGIN
+    SELECT co.course_id, co.capacity, co.seats_taken, sem.end_date >= CURRENT_DATE AS is_open
+    INTO v_offering
+    FROM course_offering co
+    JOIN semester sem ON co.semester_id = sem.semester_id
+    WHERE co.offering_id = p_offering_id
+    FOR NO KEY UPDATE OF co;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    IF NOT v_offering.is_open THEN
+        DELETE FROM waitlist w WHERE w.offering_id = p_offering_id;
+        RETURN;
+    END IF;
+
+    LOOP
+        EXIT WHEN v_offering.capacity IS NOT NULL AND v_offering.seats_taken >= v_offering.capacity;
+
+        DELETE FROM waitlist w
+        WHERE w.waitlist_id = (SELECT q.waitlist_id FROM waitlist q
+                               WHERE q.offering_id = p_offering_id
+                               ORDER BY q.waitlist_id
+                               LIMIT 1)
+        RETURNING w.student_id INTO v_student_id;
+        EXIT WHEN NOT FOUND;
+
+        INSERT INTO enrolls_in (student_id, course_id, offering_id)
+        SELECT s.student_id, c.course_id, p_offering_id
+        FROM student s, course c
+        WHERE s.student_id = v_student_id AND c.course_id = v_offering.course_id
+          AND s.level IS NOT DISTINCT FROM c.level
+          AND (s.department_id IS NOT DISTINCT FROM c.department_id
+               OR c.type IN ('Elective', 'Technical Elective'))
+        ON CONFLICT ON CONSTRAINT enrolls_in_student_course_key DO NOTHING;
+        IF FOUND THEN
+            v_offering.seats_taken := v_offering.seats_taken + 1;
+            RETURN NEXT v_student_id;
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- Enroll if a seat is free, otherwise queue for the offering enroll_student()
+-- picks. reason is 'waitlisted' or 'already_waitlisted' with the student's
+-- queue position (1 = next in line), else enroll_student()'s reason.
+CREATE OR REPLACE FUNCTION join_waitlist(p_student_id INTEGER, p_course_id INTEGER)
+RETURNS TABLE (reason TEXT, student_level TEXT, queue_position INTEGER)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_result RECORD;
+    v_offering_id INTEGER;
+    v_waitlist_id INTEGER;
+    v_reason TEXT := 'waitlisted';
+BEGIN
+    -- enroll_student() keeps the offering locked until commit, so no seat can
+    -- free up between its answer and the insert below
+    SELECT e.reason, e.student_level INTO v_result FROM enroll_student(p_student_id, p_course_id) e;
+    IF v_result.reason <> 'offering_full' THEN
+        RETURN QUERY SELECT v_result.reason, v_result.student_level, NULL::INTEGER;
+        RETURN;
+    END IF;
+
+    SELECT co.offering_id INTO v_offering_id
+    FROM course_offering co
+    JOIN semester sem ON co.semester_id = sem.semester_id
+    WHERE co.course_id = p_course_id AND sem.end_date >= CURRENT_DATE
+    ORDER BY sem.end_date, co.offering_id
+    LIMIT 1;
+
+    INSERT INTO waitlist (offering_id, student_id)
+    VALUES (v_offering_id, p_student_id)
+    ON CONFLICT ON CONSTRAINT waitlist_offering_student_key DO NOTHING
+    RETURNING waitlist_id INTO v_waitlist_id;
+    IF v_waitlist_id IS NULL THEN
+        v_reason := 'already_waitlisted';
+        SELECT w.waitlist_id INTO v_waitlist_id
+        FROM waitlist w WHERE w.offering_id = v_offering_id AND w.student_id = p_student_id;
+    END IF;
+
+    RETURN QUERY
+    SELECT v_reason, v_result.student_level, count(*)::INTEGER
+    FROM waitlist w
+    WHERE w.offering_id = v_offering_id AND w.waitlist_id <= v_waitlist_id;
+END;
+$$;
+
+-- Drop an enrollment; the course_offering_seats_promote trigger hands its
+-- seat to the waitlist in the same statement. promoted lists the students
+-- enrolled in its place.
+CREATE OR REPLACE FUNCTION drop_enrollment(p_student_id INTEGER, p_course_id INTEGER)
+RETURNS TABLE (dropped BOOLEAN, promoted INTEGER[])
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_offering_id INTEGER;
+    v_queue INTEGER[];
+BEGIN
+    SELECT e.offering_id INTO v_offering_id
+    FROM enrolls_in e
+    WHERE e.student_id = p_student_id AND e.course_id = p_course_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT false, ARRAY[]::INTEGER[];
+        RETURN;
+    END IF;
+    -- Hold the offering so the queue read here is the one the trigger promotes from
+    PERFORM 1 FROM course_offering co WHERE co.offering_id = v_offering_id FOR NO KEY UPDATE;
+    v_queue := ARRAY(SELECT w.student_id FROM waitlist w WHERE w.offering_id = v_offering_id);
+
+    DELETE FROM enrolls_in e
+    WHERE e.student_id = p_student_id AND e.course_id = p_course_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT false, ARRAY[]::INTEGER[];
+        RETURN;
+    END IF;
+    RETURN QUERY
+    SELECT true, ARRAY(SELECT e.student_id FROM enrolls_in e
+                       WHERE e.offering_id = v_offering_id AND e.student_id = ANY(v_queue)
+                       ORDER BY e.enrollment_id);
+END;
+$$;
+
+-- Any freed seat goes to the queue: count_offering_seats() lowering
+-- seats_taken (drops, deletes cascading from a student or course, moved
+-- enrollments), reconcile_seats() correcting it, or a raised or removed
+-- capacity
+CREATE OR REPLACE FUNCTION promote_on_free_seats()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM promote_waitlist(NEW.offering_id);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS course_offering_capacity_promote ON course_offering;
+DROP FUNCTION IF EXISTS promote_on_capacity();
+DROP TRIGGER IF EXISTS course_offering_seats_promote ON course_offering;
+CREATE TRIGGER course_offering_seats_promote AFTER UPDATE OF capacity, seats_taken ON course_offering
+    FOR EACH ROW
+    WHEN (NEW.seats_taken < OLD.seats_taken
+          OR (OLD.capacity IS NOT NULL AND (NEW.capacity IS NULL OR NEW.capacity > OLD.capacity)))
+    EXECUTE FUNCTION promote_on_free_seats();
+
+-- Waitlist changes join the change feed (see 008_change_notifications.sql)
+DROP TRIGGER IF EXISTS waitlist_notify_insert ON waitlist;
+DROP TRIGGER IF EXISTS waitlist_notify_update ON waitlist;
+DROP TRIGGER IF EXISTS waitlist_notify_delete ON waitlist;
+DROP TRIGGER IF EXISTS waitlist_notify_truncate ON waitlist;
+CREATE TRIGGER waitlist_notify_insert AFTER INSERT ON waitlist REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('waitlist_id', 'offering_id', 'student_id');
+CREATE TRIGGER waitlist_notify_update AFTER UPDATE ON waitlist REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('waitlist_id', 'offering_id', 'student_id');
+CREATE TRIGGER waitlist_notify_delete AFTER DELETE ON waitlist REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('waitlist_id', 'offering_id', 'student_id');
+CREATE TRIGGER waitlist_notify_truncate AFTER TRUNCATE ON waitlist
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_changes();
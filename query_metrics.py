@@ -0,0 +1,157 @@
+import logging
+import math
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Log-scale latency buckets: bucket i covers up to BASE * GROWTH**i seconds,
+# so percentiles are accurate to within 10% from 10us to well past a minute
+_BASE = 0.00001
+_GROWTH = 1.1
+_BUCKETS = 170
+
+
+def _bucket(elapsed):
+    if elapsed <= _BASE:
+        return 0
+    return min(_BUCKETS - 1, int(math.ceil(math.log(elapsed / _BASE, _GROWTH))))
+
+
+def _bucket_upper(index):
+    return _BASE * _GROWTH ** index
+
+
+def redact_params(params):
+    """Replace parameter values with their type (and length for strings) for logging"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: _redact(value) for key, value in params.items()}
+    return tuple(_redact(value) for value in params)
+
+
+def _redact(value):
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return f"<{type(value).__name__}:{len(value)} items>"
+    return f"<{type(value).__name__}>"
+
+
+# Modules whose frames sit between a query and the code that asked for it
+_PASSTHROUGH_MODULES = {'reference_cache', 'contextlib', 'asyncio.events'}
+
+
+def caller_name(frame, owner_globals, plumbing=()):
+    """Logical query name for metrics, walking outwards from frame.
+
+    Returns the first public function of the owning module (the one whose
+    globals are owner_globals) that is not in plumbing, or module.function
+    for the first frame outside it, e.g. a raw query issued from the GUI.
+    """
+    while frame is not None:
+        name = frame.f_code.co_name
+        if frame.f_globals is owner_globals:
+            if not name.startswith(('_', '<')) and name not in plumbing:
+                return name
+        else:
+            module = frame.f_globals.get('__name__')
+            if module not in _PASSTHROUGH_MODULES:
+                return f"{module}.{name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+class _QueryStats:
+    __slots__ = ('calls', 'errors', 'rows', 'total_time', 'max_time', 'buckets', 'error_codes')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * _BUCKETS
+        self.error_codes = Counter()
+
+    def percentile(self, fraction):
+        if not self.calls:
+            return 0.0
+        target = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return min(_bucket_upper(index), self.max_time)
+        return self.max_time
+
+
+class QueryMetrics:
+    """In-process latency histograms per logical query name, plus a slow-query log"""
+
+    def __init__(self, slow_query_threshold=0.5):
+        self.slow_query_threshold = slow_query_threshold
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed, rows=None, error=None, query=None, params=None):
+        """Record one call; error is the exception raised, if any"""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _QueryStats()
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.buckets[_bucket(elapsed)] += 1
+            if rows:
+                stats.rows += rows
+            if error is not None:
+                stats.errors += 1
+                stats.error_codes[getattr(error, 'pgcode', None) or type(error).__name__] += 1
+
+        if self.slow_query_threshold is not None and elapsed >= self.slow_query_threshold:
+            logger.warning(
+                "Slow query %s: %.1f ms, %s rows%s\n%s\nparams=%s",
+                name, elapsed * 1000, rows if rows is not None else '?',
+                " (failed)" if error is not None else "",
+                " ".join((query or "").split()), redact_params(params)
+            )
+
+    def snapshot(self):
+        """Per query name: calls, errors, rows, total/mean/max and p50/p95/p99 latency in seconds"""
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                result[name] = {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'error_codes': dict(stats.error_codes),
+                    'rows': stats.rows,
+                    'total_time': stats.total_time,
+                    'mean': stats.total_time / stats.calls if stats.calls else 0.0,
+                    'max': stats.max_time,
+                    'p50': stats.percentile(0.50),
+                    'p95': stats.percentile(0.95),
+                    'p99': stats.percentile(0.99),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def report(self):
+        """Text table sorted by total time, for logs or a debug console"""
+        lines = [f"{'query':<50} {'calls':>8} {'errors':>6} {'rows':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'total s':>9}"]
+        snapshot = self.snapshot()
+        for name, stats in sorted(snapshot.items(), key=lambda item: item[1]['total_time'], reverse=True):
+            lines.append(
+                f"{name[:50]:<50} {stats['calls']:>8} {stats['errors']:>6} {stats['rows']:>10} "
+                f"{stats['p50'] * 1000:>9.2f} {stats['p95'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f} "
+                f"{stats['total_time']:>9.2f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ReferenceCache:
+    """Thread-safe TTL + LRU cache for rarely changing reference data.
+
+    Keys are tuples whose first element names the table the value was read
+    from, so a write to that table can drop every dependent entry at once.
+    """
+
+    def __init__(self, ttl=300, maxsize=128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss.
+
+        A loader result of None (query failed) is returned but not cached.
+        """
+        found, value = self._lookup(key)
+        if found:
+            return value
+        # Load outside the lock so a slow query does not block other lookups
+        return self._store(key, loader())
+
+    async def get_async(self, key, loader):
+        """get() for coroutine loaders: awaits loader() on a miss"""
+        found, value = self._lookup(key)
+        if found:
+            return value
+        return self._store(key, await loader())
+
+    def _lookup(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return True, value
+                del self._entries[key]
+                self._stats['expirations'] += 1
+            self._stats['misses'] += 1
+        return False, None
+
+    def _store(self, key, value):
+        if value is None:
+            return None
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return value
+
+    def invalidate(self, table=None):
+        """Drop entries read from table, or everything when table is None"""
+        with self._lock:
+            if table is None:
+                keys = list(self._entries)
+            else:
+                keys = [key for key in self._entries if key[0] == table]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._stats['invalidations'] += len(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+            return stats
@@ -0,0 +1,463 @@
+"""Serve the Database operations over HTTP/JSON, so clients need no database connection.
+
+Usage:
+    python service.py                                listen on 127.0.0.1:8750
+    python service.py --port 9000 --workers 64 --pool-size 20
+
+Requests are handled by a fixed pool of worker threads that share one
+connection pool (--pool-size connections), so thousands of GUI clients (with
+SERVICE_URL set in config.py) use a bounded number of PostgreSQL connections.
+
+    POST /login            {"username": ..., "password": ...} -> {"token": ..., "user": [...]}
+    POST /logout
+    POST /call/<method>    {"args": [...], "kwargs": {...}}  -> {"result": ...}
+    GET  /changes?since=N  change notifications after N      -> {"last": N, "changes": [...]}
+    GET  /health                                             -> {"status": "ok", "pool": {...}}
+
+Everything but /login and /health needs "Authorization: Bearer <token>".
+<method> is a Database method listed in METHOD_ROLES, callable by the roles
+given there; students may only pass their own student_id, teachers their own
+teacher_id. Errors come back as {"error": message} with a 4xx/5xx status.
+Dates are sent as ISO strings. /changes relays the change feed of migration
+008; changes is null when the client fell too far behind and should reload.
+Non-admins only see their own user, enrollment and waitlist rows in it (see
+PRIVATE_CHANGES).
+"""
+import argparse
+import inspect
+import io
+import json
+import logging
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+from database import Database
+from session import Session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8750
+# Idle time after which a token expires
+TOKEN_TTL = 8 * 60 * 60
+MAX_BODY = 10 * 1024 * 1024
+# Tables whose changes are relayed to clients (see migration 008)
+WATCHED_TABLES = ('course', 'course_offering', 'enrolls_in', 'waitlist', 'user', 'department')
+
+ALL = frozenset({'admin', 'teacher', 'student'})
+ADMIN = frozenset({'admin'})
+STAFF = frozenset({'admin', 'teacher'})
+STUDENTS = frozenset({'admin', 'student'})
+
+# Database method -> roles that may call it through the service
+METHOD_ROLES = {
+    # Own profile (checked against OWN_ARGUMENT) and reference data
+    'get_user_by_id': ALL,
+    'get_student': ALL,
+    'get_teacher': ALL,
+    'get_all_departments': ALL,
+    'get_department_name': ALL,
+    'get_all_semesters': ALL,
+    'get_current_semester': ALL,
+    'get_all_courses': ALL,
+    'get_courses_page': ALL,
+    'get_course_by_id': ALL,
+    'get_course_by_code': ALL,
+    'check_course_code_exists': ALL,
+    'get_course_offerings': ALL,
+    'get_course_offerings_page': ALL,
+    'get_course_offering_by_id': ALL,
+    # Enrollment
+    'is_student_enrolled': STUDENTS,
+    'get_student_courses': STUDENTS,
+    'get_student_courses_page': STUDENTS,
+    'get_student_dashboard': STUDENTS,
+    'get_all_offered_courses_for_student': STUDENTS,
+    'try_enroll': STUDENTS,
+    'enroll_student': STUDENTS,
+    'drop_course': STUDENTS,
+    'join_waitlist': STUDENTS,
+    'leave_waitlist': STUDENTS,
+    'get_waitlist_position': STUDENTS,
+    'get_waitlist': STUDENTS,
+    'enroll_students_bulk': ADMIN,
+    # Teaching
+    'get_teaching_courses': STAFF,
+    'create_course': STAFF,
+    'update_course': STAFF,
+    'create_course_offering': STAFF,
+    'update_course_offering': STAFF,
+    'delete_course_offering': STAFF,
+    'set_offering_capacity': STAFF,
+    'reconcile_seats': ADMIN,
+    'delete_course': ADMIN,
+    # User and department administration
+    'get_user': ADMIN,
+    'get_all_users': ADMIN,
+    'get_users_page': ADMIN,
+    'check_username_exists': ADMIN,
+    'create_user': ADMIN,
+    'update_user': ADMIN,
+    'update_user_password': ADMIN,
+    'delete_user': ADMIN,
+    'create_student': ADMIN,
+    'create_teacher': ADMIN,
+    'import_users': ADMIN,
+    'create_department': ADMIN,
+    'update_department': ADMIN,
+    'delete_department': ADMIN,
+}
+# method -> (role, argument index, session attribute): for that role the
+# argument must be the caller's own id
+OWN_ARGUMENT = {
+    'get_user_by_id': [('student', 0, 'user_id'), ('teacher', 0, 'user_id')],
+    'get_student': [('student', 0, 'user_id'), ('teacher', 0, 'user_id')],
+    'get_teacher': [('student', 0, 'user_id'), ('teacher', 0, 'user_id')],
+    'is_student_enrolled': [('student', 0, 'student_id')],
+    'get_student_courses': [('student', 0, 'student_id')],
+    'get_student_courses_page': [('student', 0, 'student_id')],
+    'get_student_dashboard': [('student', 0, 'student_id')],
+    'get_all_offered_courses_for_student': [('student', 0, 'student_id')],
+    'try_enroll': [('student', 0, 'student_id')],
+    'enroll_student': [('student', 0, 'student_id')],
+    'drop_course': [('student', 0, 'student_id')],
+    'join_waitlist': [('student', 0, 'student_id')],
+    'leave_waitlist': [('student', 0, 'student_id')],
+    'get_waitlist_position': [('student', 0, 'student_id')],
+    'get_waitlist': [('student', 0, 'student_id')],
+    'get_teaching_courses': [('teacher', 0, 'teacher_id')],
+    'create_course_offering': [('teacher', 2, 'teacher_id')],
+    'update_course_offering': [('teacher', 3, 'teacher_id')],
+}
+# Change feed tables whose rows name a person: table -> (owner column, session
+# attribute, columns non-admins see of other people's rows). Non-admins get
+# their own rows whole, others reduced to those columns with the owner blanked
+# (enough to tell which offering moved), or dropped when there are none.
+PRIVATE_CHANGES = {
+    'user': ('user_id', 'user_id', ()),
+    'enrolls_in': ('student_id', 'student_id', ('course_id', 'offering_id')),
+    'waitlist': ('student_id', 'student_id', ('offering_id',)),
+}
+
+
+def own_id(session, attribute):
+    return session[attribute] if attribute == 'user_id' else getattr(session, attribute)
+
+
+class ServiceError(Exception):
+    """A request the service refuses; status is the HTTP status to answer with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def to_json(value):
+    """json.dumps default= hook for the values Database methods return"""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if inspect.isgenerator(value) or isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, 'rowcount'):
+        return value.rowcount  # closed cursor from execute_query
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ChangeLog:
+    """Recent change notifications, numbered so clients can poll for what they missed"""
+
+    def __init__(self, size=1000):
+        self._changes = deque(maxlen=size)
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def append(self, change):
+        with self._lock:
+            self._last += 1
+            self._changes.append((self._last, change))
+
+    def since(self, seq):
+        """(last, changes after seq); changes is None when some were already discarded"""
+        with self._lock:
+            if seq is None or seq > self._last:
+                return self._last, []
+            first = self._changes[0][0] if self._changes else self._last + 1
+            if seq + 1 < first:
+                return self._last, None
+            return self._last, [change for number, change in self._changes if number > seq]
+
+
+class CourseService:
+    """Token sessions, access rules and dispatch onto a shared Database"""
+
+    def __init__(self, db):
+        self.db = db
+        self.changes = ChangeLog()
+        self._tokens = {}  # token -> [Session, expires]
+        self._lock = threading.Lock()
+        for table in WATCHED_TABLES:
+            db.subscribe(table, self.changes.append)
+        db.subscribe('user', self._revoke_deleted)
+
+    def login(self, username, password):
+        user = self.db.authenticate_user(username, password)
+        if not user:
+            raise ServiceError(401, "Invalid username or password")
+        session = Session(self.db, user)
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._tokens[token] = [session, time.monotonic() + TOKEN_TTL]
+        return token, (user[0], user[1], None) + tuple(user[3:])
+
+    def logout(self, token):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+    def session(self, token):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None or entry[1] < now:
+                self._tokens.pop(token, None)
+                raise ServiceError(401, "Not logged in")
+            entry[1] = now + TOKEN_TTL
+            return entry[0]
+
+    def _revoke_deleted(self, change):
+        if change['op'] != 'delete' or change['rows'] is None:
+            return
+        deleted = {row['user_id'] for row in change['rows']}
+        with self._lock:
+            for token, (session, _) in list(self._tokens.items()):
+                if session['user_id'] in deleted:
+                    del self._tokens[token]
+
+    def check_access(self, session, method, args, kwargs):
+        role = session['role']
+        if role not in METHOD_ROLES[method]:
+            raise ServiceError(403, f"{method} is not available to {role}s")
+        for owner_role, index, attribute in OWN_ARGUMENT.get(method, ()):
+            if role != owner_role:
+                continue
+            own = own_id(session, attribute)
+            if own is None or index >= len(args) or args[index] != own:
+                raise ServiceError(403, f"{method} is only allowed for your own records")
+        if role != 'teacher':
+            return
+        if method == 'create_course':
+            kwargs['creator_teacher_id'] = session.teacher_id
+        elif method in ('update_course_offering', 'delete_course_offering', 'set_offering_capacity'):
+            # Only the instructor of the offering may change it
+            offering = self.db.get_course_offering_by_id(args[0]) if args else None
+            if not offering or offering[9] != session.teacher_id:
+                raise ServiceError(403, f"{method} is only allowed for your own offerings")
+            # Enrollments reference (offering_id, course_id), so only admins move an offering to another course
+            if method == 'update_course_offering' and (len(args) < 2 or args[1] != offering[7]):
+                raise ServiceError(403, "Offerings cannot be moved to another course")
+        elif method == 'update_course':
+            # Teachers edit their own department's courses and cannot move them out of it
+            course_id = args[0] if args else kwargs.get('course_id')
+            course_data = args[1] if len(args) > 1 else kwargs.get('course_data')
+            department_id = session.department_id
+            rows, _ = (self.db.get_courses_page(department_id=department_id, ids=[course_id])
+                       if department_id and course_id is not None else ([], None))
+            if not rows:
+                raise ServiceError(403, f"{method} is only allowed for courses of your department")
+            if not isinstance(course_data, dict) or course_data.get('department_id') != department_id:
+                raise ServiceError(403, "Courses cannot be moved to another department")
+
+    def visible_changes(self, session, changes):
+        """The part of the change feed session may see (see PRIVATE_CHANGES)"""
+        if changes is None or session['role'] == 'admin':
+            return changes
+        visible = []
+        for change in changes:
+            rule = PRIVATE_CHANGES.get(change['table'])
+            if rule is None or change['rows'] is None:
+                visible.append(change)
+                continue
+            column, attribute, public = rule
+            own = own_id(session, attribute)
+            rows = []
+            for row in change['rows']:
+                if own is not None and row.get(column) == own:
+                    rows.append(row)
+                elif public:
+                    rows.append(dict({key: row.get(key) for key in public}, **{column: None}))
+            if rows:
+                visible.append(dict(change, rows=rows))
+        return visible
+
+    def call(self, token, method, args, kwargs):
+        session = self.session(token)
+        if method not in METHOD_ROLES:
+            raise ServiceError(404, f"Unknown method {method}")
+        if not isinstance(args, list) or not isinstance(kwargs, dict):
+            raise ServiceError(400, "args must be a list and kwargs an object")
+        self.check_access(session, method, args, kwargs)
+        if method == 'import_users':
+            # The client sends the CSV text; never let it name a file on this host
+            if len(args) != 1 or not isinstance(args[0], str):
+                raise ServiceError(400, "import_users takes the CSV text")
+            args = [io.StringIO(args[0])]
+        func = getattr(self.db, method)
+        try:
+            inspect.signature(func).bind(*args, **kwargs)
+        except TypeError as e:
+            raise ServiceError(400, str(e))
+        result = func(*args, **kwargs)
+        if method == 'get_user_by_id' and result and session['role'] != 'admin':
+            result = (result[0], result[1], None) + tuple(result[3:])
+        # Drain streamed results while the connection is still checked out
+        return list(result) if inspect.isgenerator(result) else result
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = 'CourseManagementService/1.0'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _token(self):
+        header = self.headers.get('Authorization', '')
+        return header[7:] if header.startswith('Bearer ') else None
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            raise ServiceError(413, "Request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ServiceError(400, "Request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ServiceError(400, "Request body must be a JSON object")
+        return body
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, default=to_json).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, route, database=True):
+        """Answer with route()'s result; database routes hold a pooled connection while they run"""
+        try:
+            if database:
+                with self.service.db.checkout():
+                    payload = route()
+            else:
+                payload = route()
+            self._send(200, payload)
+        except ServiceError as e:
+            self._send(e.status, {'error': str(e)})
+        except Exception as e:
+            logger.exception("Request %s %s failed", self.command, self.path)
+            self._send(500, {'error': str(e)})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._handle(lambda: {'status': 'ok', 'pool': self.service.db.pool_stats()}, database=False)
+        elif url.path == '/changes':
+            self._handle(lambda: self._changes(parse_qs(url.query)))
+        else:
+            self._send(404, {'error': "Not found"})
+
+    def _changes(self, query):
+        session = self.service.session(self._token())
+        try:
+            since = int(query['since'][0]) if 'since' in query else None
+        except ValueError:
+            raise ServiceError(400, "since must be a number")
+        last, changes = self.service.changes.since(since)
+        return {'last': last, 'changes': self.service.visible_changes(session, changes)}
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path == '/login':
+            self._handle(self._login)
+        elif path == '/logout':
+            self._handle(lambda: self.service.logout(self._token()) or {}, database=False)
+        elif path.startswith('/call/'):
+            self._handle(lambda: self._call(path[len('/call/'):]))
+        else:
+            self._send(404, {'error': "Not found"})
+
+    def _login(self):
+        body = self._body()
+        token, user = self.service.login(str(body.get('username', '')), str(body.get('password', '')))
+        return {'token': token, 'user': user}
+
+    def _call(self, method):
+        body = self._body()
+        result = self.service.call(self._token(), method, body.get('args', []), body.get('kwargs', {}))
+        return {'result': result}
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles each request on a fixed pool of worker threads"""
+
+    def __init__(self, address, handler, service, workers):
+        super().__init__(address, handler)
+        self.service = service
+        self.workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='service-worker')
+
+    def process_request(self, request, client_address):
+        self.workers.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.workers.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the course management operations over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=32, help="request handler threads")
+    parser.add_argument('--pool-size', type=int, default=10, help="database connections shared by the workers")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    db = Database(maxconn=args.pool_size)
+    if db.pool is None:
+        return 1
+    server = PooledHTTPServer((args.host, args.port), ServiceHandler, CourseService(db), args.workers)
+    logger.info("Serving on http://%s:%s with %s workers", args.host, args.port, args.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
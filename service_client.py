@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+import weakref
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of the service's change feed
+CHANGE_POLL_INTERVAL = 2
+
+
+class ServiceError(Exception):
+    """The service refused a call or could not be reached"""
+
+
+def _from_json(value):
+    """Rows back to tuples; lists of rows (and empty lists) stay lists, as Database returns them"""
+    if isinstance(value, list):
+        items = [_from_json(item) for item in value]
+        if all(isinstance(item, (list, tuple)) for item in items):
+            return items
+        return tuple(items)
+    if isinstance(value, dict):
+        return {key: _from_json(item) for key, item in value.items()}
+    return value
+
+
+class ServiceClient:
+    """Stand-in for Database that forwards every call to service.py over HTTP/JSON.
+
+    Set SERVICE_URL in config.py to run the GUI this way. Methods keep their
+    Database names and arguments (db.get_courses_page(...) becomes POST
+    /call/get_courses_page) and return the same shapes, except that dates
+    arrive as ISO strings. authenticate_user logs in and keeps the token for
+    the following calls. Calls the service rejects raise ServiceError.
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.pool = None
+        self._token = None
+        self._sessions = weakref.WeakValueDictionary()
+        self._subscribers = {}
+        self._poller = None
+        self._poller_lock = threading.Lock()
+        self._poller_stop = threading.Event()
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = Request(self.url + path, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self._token:
+            request.add_header('Authorization', f"Bearer {self._token}")
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error') or e.reason
+            except ValueError:
+                message = e.reason
+            raise ServiceError(message) from e
+        except (URLError, OSError) as e:
+            raise ServiceError(f"Course service unavailable: {e}") from e
+
+    def call(self, method, *args, **kwargs):
+        response = self._request('POST', f"/call/{method}", {'args': list(args), 'kwargs': kwargs})
+        return _from_json(response['result'])
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def authenticate_user(self, username, password):
+        self.logout()
+        try:
+            response = self._request('POST', '/login', {'username': username, 'password': password})
+        except ServiceError as e:
+            logger.info("Authentication failed for %s: %s", username, e)
+            return None
+        self._token = response['token']
+        return tuple(response['user'])
+
+    def import_users(self, source):
+        """Send a CSV path or file object to the service's import_users"""
+        if isinstance(source, str):
+            with open(source, newline='', encoding='utf-8') as f:
+                return self.call('import_users', f.read())
+        return self.call('import_users', source.read())
+
+    def register_session(self, session):
+        self._sessions[session['user_id']] = session
+
+    def invalidate_session(self, user_id):
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.invalidate()
+
+    def pool_stats(self):
+        return None
+
+    # Change feed
+    def subscribe(self, table, callback):
+        """Same contract as Database.subscribe, fed by polling the service's /changes"""
+        with self._poller_lock:
+            self._subscribers.setdefault(table, []).append(callback)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller_stop.clear()
+                self._poller = threading.Thread(target=self._poll_changes, name='service-change-poller', daemon=True)
+                self._poller.start()
+
+    def unsubscribe(self, table, callback):
+        with self._poller_lock:
+            callbacks = self._subscribers.get(table, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def _poll_changes(self):
+        last = None
+        delay = 0
+        while not self._poller_stop.wait(delay):
+            delay = CHANGE_POLL_INTERVAL
+            try:
+                query = f"?since={last}" if last is not None else ""
+                response = self._request('GET', f"/changes{query}")
+            except ServiceError as e:
+                logger.warning("Change feed unavailable: %s", e)
+                continue
+            changes = response['changes']
+            if changes is None or (last is not None and response['last'] < last):
+                # Fell behind the service's buffer, or the service restarted
+                with self._poller_lock:
+                    tables = list(self._subscribers)
+                changes = [{'table': table, 'op': 'reload', 'rows': None} for table in tables]
+            if last is not None:
+                self._dispatch(changes)
+            last = response['last']
+
+    def _dispatch(self, changes):
+        for change in changes:
+            table, rows = change['table'], change['rows']
+            if table == 'user':
+                user_ids = [row['user_id'] for row in rows] if rows is not None else list(self._sessions.keys())
+                for user_id in user_ids:
+                    self.invalidate_session(user_id)
+            with self._poller_lock:
+                callbacks = list(self._subscribers.get(table, ()))
+            for callback in callbacks:
+                try:
+                    callback(change)
+                except Exception:
+                    logger.exception("Change subscriber for %s failed", table)
+
+    def disconnect(self):
+        self._poller_stop.set()
+        self.logout()
+
+    def logout(self):
+        """End the service session, if any"""
+        if self._token:
+            try:
+                self._request('POST', '/logout')
+            except ServiceError:
+                pass
+            self._token = None
@@ -0,0 +1,75 @@
+import threading
+
+
+class Session(dict):
+    """The logged-in user, with their student/teacher profile resolved once at login.
+
+    Behaves like the current_user dict the interfaces have always received
+    (user_id, username, role, full_name) and adds the profile row plus
+    student_id/teacher_id, department and level, so interfaces do not look
+    them up again on every action. Database.update_user invalidates the
+    session of the edited user; the next attribute access reloads it.
+    """
+
+    def __init__(self, db, user):
+        """user is the "user" row returned by Database.authenticate_user"""
+        super().__init__()
+        self.db = db
+        self._lock = threading.Lock()
+        self._stale = False
+        self._load(user)
+        db.register_session(self)
+
+    def _load(self, user):
+        role = user[3]
+        self.update(user_id=user[0], username=user[1], role=role, full_name=f"{user[4]} {user[5]}")
+        if role == 'student':
+            self._profile = self.db.get_student(user[0])
+        elif role == 'teacher':
+            self._profile = self.db.get_teacher(user[0])
+        else:
+            self._profile = None
+
+    def invalidate(self):
+        """Mark the session out of date; it is reloaded on next use"""
+        self._stale = True
+
+    @property
+    def profile(self):
+        """The student or teacher row (with department_name last), or None"""
+        with self._lock:
+            if self._stale:
+                self._stale = False
+                user = self.db.get_user_by_id(self['user_id'])
+                if user:
+                    self._load(user)
+                else:
+                    self._profile = None  # the user was deleted
+            return self._profile
+
+    @property
+    def student_id(self):
+        profile = self.profile
+        return profile[0] if profile and self['role'] == 'student' else None
+
+    @property
+    def teacher_id(self):
+        profile = self.profile
+        return profile[0] if profile and self['role'] == 'teacher' else None
+
+    @property
+    def department_id(self):
+        profile = self.profile
+        if not profile:
+            return None
+        return profile[4] if self['role'] == 'student' else profile[3]
+
+    @property
+    def department_name(self):
+        profile = self.profile
+        return profile[-1] if profile else None
+
+    @property
+    def level(self):
+        profile = self.profile
+        return profile[7] if profile and self['role'] == 'student' else None
@@ -0,0 +1,160 @@
+"""Shared fixtures.
+
+Database tests run against course_management_test (override with
+CMS_TEST_DBNAME) on the server from config.py; it is created from
+database_setup.sql and migrated on first use, and the tests are skipped when
+no server is reachable. Without a config.py the connection is taken from the
+usual PG* environment variables.
+"""
+import asyncio
+import inspect
+import os
+import sys
+import types
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType('config')
+    config.DB_CONFIG = {
+        'dbname': os.environ.get('PGDATABASE', 'course_management'),
+        'user': os.environ.get('PGUSER', 'postgres'),
+        'password': os.environ.get('PGPASSWORD', ''),
+        'host': os.environ.get('PGHOST', 'localhost'),
+        'port': os.environ.get('PGPORT', '5432'),
+    }
+    sys.modules['config'] = config
+
+TEST_DBNAME = os.environ.get('CMS_TEST_DBNAME', 'course_management_test')
+
+
+@pytest.fixture(scope='session')
+def db_config():
+    psycopg2 = pytest.importorskip('psycopg2')
+    import datagen
+    import migrate
+    try:
+        datagen.create_database(TEST_DBNAME)
+        config = datagen.database_config(TEST_DBNAME)
+        conn = psycopg2.connect(**config)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+    try:
+        migrate.migrate(conn)
+    finally:
+        conn.close()
+    return config
+
+
+class SyncAdapter:
+    """Drive an AsyncDatabase through Database's blocking interface"""
+
+    def __init__(self, db, loop):
+        self.db = db
+        self.loop = loop
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if inspect.iscoroutinefunction(attr):
+            return lambda *args, **kwargs: self.loop.run_until_complete(attr(*args, **kwargs))
+        return attr
+
+
+@pytest.fixture(params=['sync', 'async'])
+def db(request, db_config):
+    """A Database, or an AsyncDatabase wrapped to look like one"""
+    if request.param == 'sync':
+        from database import Database
+        database = Database(maxconn=2, config=db_config)
+        yield database
+        database.disconnect()
+    else:
+        pytest.importorskip('asyncpg')
+        from async_database import AsyncDatabase
+        loop = asyncio.new_event_loop()
+        database = loop.run_until_complete(AsyncDatabase.create(maxconn=2, config=db_config))
+        yield SyncAdapter(database, loop)
+        loop.run_until_complete(database.disconnect())
+        loop.close()
+
+
+@pytest.fixture
+def university(db_config):
+    """A department with a current semester, a teacher, Bachelor courses and students.
+
+    Names carry a random tag so tests never see each other's rows. Returns a
+    dict of ids: department_id, semester_id, teacher_id, course_ids,
+    offering_ids (one per course, same order) and student_ids.
+    """
+    import psycopg2
+    tag = uuid.uuid4().hex[:8]
+    today = date.today()
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO department (department_name) VALUES (%s) RETURNING department_id",
+                           (f"Dept {tag}",))
+            department_id = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO semester (semester_name, year, start_date, end_date) VALUES (%s, %s, %s, %s) "
+                "RETURNING semester_id",
+                (f"Term {tag}", today.year, today - timedelta(days=30), today + timedelta(days=60))
+            )
+            semester_id = cursor.fetchone()[0]
+            cursor.execute("INSERT INTO \"user\" (username, password, role, first_name, last_name) "
+                           "VALUES (%s, 'pw', 'teacher', 'Tea', 'Cher') RETURNING user_id", (f"t_{tag}",))
+            cursor.execute("INSERT INTO teacher (user_id, email, department_id) VALUES (%s, %s, %s) "
+                           "RETURNING teacher_id", (cursor.fetchone()[0], f"t_{tag}@example.com", department_id))
+            teacher_id = cursor.fetchone()[0]
+            course_ids, offering_ids = [], []
+            for i in range(5):
+                cursor.execute(
+                    "INSERT INTO course (course_name, course_code, credits, ects, level, type, department_id) "
+                    "VALUES (%s, %s, 3, 5, 'Bachelor', 'Must', %s) RETURNING course_id",
+                    (f"Course {i}", f"{tag}-{i}", department_id)
+                )
+                course_ids.append(cursor.fetchone()[0])
+                cursor.execute("INSERT INTO course_offering (course_id, semester_id, instructor_id) "
+                               "VALUES (%s, %s, %s) RETURNING offering_id", (course_ids[-1], semester_id, teacher_id))
+                offering_ids.append(cursor.fetchone()[0])
+            student_ids = []
+            for i in range(3):
+                cursor.execute("INSERT INTO \"user\" (username, password, role, first_name, last_name) "
+                               "VALUES (%s, 'pw', 'student', 'Stu', 'Dent') RETURNING user_id", (f"s{i}_{tag}",))
+                cursor.execute(
+                    "INSERT INTO student (user_id, student_number, email, department_id, first_name, last_name, level) "
+                    "VALUES (%s, %s, %s, %s, 'Stu', 'Dent', 'Bachelor') RETURNING student_id",
+                    (cursor.fetchone()[0], f"{i}{tag}", f"s{i}_{tag}@example.com", department_id)
+                )
+                student_ids.append(cursor.fetchone()[0])
+        conn.commit()
+    finally:
+        conn.close()
+    return {'tag': tag, 'department_id': department_id, 'semester_id': semester_id, 'teacher_id': teacher_id,
+            'course_ids': course_ids, 'offering_ids': offering_ids, 'student_ids': student_ids}
+
+
+@pytest.fixture
+def sql(db_config):
+    """sql(query, params) runs one statement on its own connection, commits and returns its rows (or None)"""
+    import psycopg2
+
+    def run(query, params=None):
+        conn = psycopg2.connect(**db_config)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall() if cursor.description else None
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    return run
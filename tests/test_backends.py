@@ -0,0 +1,37 @@
+"""The same behaviour from Database and AsyncDatabase (see the db fixture)"""
+import inspect
+
+
+def test_backends_offer_the_same_methods():
+    from database import Database
+    from async_database import AsyncDatabase
+
+    def public(cls):
+        return {name for name in dir(cls) if not name.startswith('_')}
+
+    # connection is the calling thread's psycopg2 connection; create is the async constructor
+    assert public(Database) - public(AsyncDatabase) == {'connection'}
+    assert public(AsyncDatabase) - public(Database) == {'create'}
+    for name in public(Database) & public(AsyncDatabase):
+        sync, async_ = getattr(Database, name), getattr(AsyncDatabase, name)
+        if callable(sync):
+            assert list(inspect.signature(sync).parameters) == list(inspect.signature(async_).parameters), name
+
+
+def test_prepared_statement_and_query_reports(db, university):
+    assert db.get_user(f"nobody_{university['tag']}") is None
+    stats = db.prepared_statement_stats()['get_user']
+    assert stats['calls'] >= 1 and stats['errors'] == 0
+    assert 'get_user' in db.query_report()
+
+
+def test_login(db, university):
+    username = f"login_{university['tag']}"
+    assert db.create_user(username, 'secret', 'Admin', 'Ada', 'Min')
+    assert not db.create_user(username, 'other', 'Admin', 'Ada', 'Min')
+
+    user = db.authenticate_user(username, 'secret')
+    assert user[1] == username and user[3] == 'admin'
+    assert db.authenticate_user(username, 'wrong') is None
+    assert db.authenticate_user(f"nobody_{university['tag']}", 'secret') is None
+
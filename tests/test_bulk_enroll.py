@@ -0,0 +1,35 @@
+"""enroll_students_bulk on both backends"""
+
+
+def test_bulk_enroll(db, university):
+    first, second, third = university['student_ids']
+    courses = university['course_ids']
+    assert db.set_offering_capacity(university['offering_ids'][1], 1)[0]
+    db.try_enroll(third, courses[2])
+
+    report = db.enroll_students_bulk([
+        (first, courses[0]),
+        (first, courses[0]),
+        (first, courses[1]),
+        (second, courses[1]),
+        (third, courses[2]),
+        (second, 0),
+    ])
+    assert [reason for _, _, reason in report] == [
+        'enrolled', 'duplicate_request', 'enrolled', 'offering_full', 'already_enrolled', 'course_not_found',
+    ]
+    assert db.is_student_enrolled(first, courses[1])
+    assert not db.is_student_enrolled(second, courses[1])
+    assert db.enroll_students_bulk([]) == []
+
+    # Several pages, one transaction
+    report = db.enroll_students_bulk([(second, courses[3]), (third, courses[3]), (first, courses[4])], page_size=2)
+    assert [reason for _, _, reason in report] == ['enrolled', 'enrolled', 'enrolled']
+
+
+def test_failed_batch_inserts_nothing(db, university):
+    first = university['student_ids'][0]
+    courses = university['course_ids']
+    report = db.enroll_students_bulk([(first, courses[0]), (first, 2 ** 40)])
+    assert [reason for _, _, reason in report] == ['error', 'error']
+    assert not db.is_student_enrolled(first, courses[0])
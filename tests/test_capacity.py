@@ -0,0 +1,63 @@
+"""Seat limits and the seats_taken counter (migration 009) on both backends"""
+from datetime import date
+
+
+def seats(sql, offering_id):
+    return sql("SELECT capacity, seats_taken FROM course_offering WHERE offering_id = %s", (offering_id,))[0]
+
+
+def test_full_offering_turns_students_away(db, university, sql):
+    first, second, _ = university['student_ids']
+    course_id, offering_id = university['course_ids'][0], university['offering_ids'][0]
+    assert db.set_offering_capacity(offering_id, 1) == (True, "Capacity updated")
+
+    assert db.try_enroll(first, course_id)[0] == 'enrolled'
+    assert db.try_enroll(second, course_id)[0] == 'offering_full'
+    assert db.enroll_student(second, course_id) == (False, "This course is full.")
+    assert seats(sql, offering_id) == (1, 1)
+
+    assert db.drop_course(first, course_id)
+    assert seats(sql, offering_id) == (1, 0)
+    assert db.try_enroll(second, course_id)[0] == 'enrolled'
+
+
+def test_capacity_cannot_drop_below_seats_taken(db, university, sql):
+    first, second, _ = university['student_ids']
+    course_id, offering_id = university['course_ids'][0], university['offering_ids'][0]
+    for student in (first, second):
+        assert db.try_enroll(student, course_id)[0] == 'enrolled'
+    assert db.set_offering_capacity(offering_id, 1) == (False, "Capacity cannot be below the 2 seats already taken")
+    assert db.set_offering_capacity(offering_id, 2)[0]
+    assert db.set_offering_capacity(offering_id, None)[0]
+    assert seats(sql, offering_id) == (None, 2)
+    assert db.set_offering_capacity(0, 5) == (False, "Failed to update capacity")
+
+
+def test_seats_left_in_the_available_list(db, university, sql):
+    # Every test adds a current semester; make this one the semester the lists show
+    semester = tuple(sql("SELECT * FROM semester WHERE semester_id = %s", (university['semester_id'],))[0])
+    db.reference_cache.get(('semester', 'current', date.today()), lambda: semester)
+
+    student = university['student_ids'][0]
+    assert db.set_offering_capacity(university['offering_ids'][1], 3)[0]
+    assert db.try_enroll(university['student_ids'][1], university['course_ids'][1])[0] == 'enrolled'
+    seats_left = {row[0]: row[-1] for row in db.get_all_offered_courses_for_student(student)}
+    assert seats_left[university['course_ids'][1]] == 2
+    assert seats_left[university['course_ids'][0]] is None
+
+
+def test_reconcile_seats_fixes_drifted_counters(db, university, sql):
+    first, second, _ = university['student_ids']
+    course_id, offering_id = university['course_ids'][0], university['offering_ids'][0]
+    for student in (first, second):
+        assert db.try_enroll(student, course_id)[0] == 'enrolled'
+    sql("ALTER TABLE enrolls_in DISABLE TRIGGER enrolls_in_seats_delete")
+    try:
+        sql("DELETE FROM enrolls_in WHERE student_id = %s AND course_id = %s", (first, course_id))
+    finally:
+        sql("ALTER TABLE enrolls_in ENABLE TRIGGER enrolls_in_seats_delete")
+    assert seats(sql, offering_id) == (None, 2)
+
+    assert (offering_id, 2, 1) in db.reconcile_seats()
+    assert seats(sql, offering_id) == (None, 1)
+    assert offering_id not in [row[0] for row in db.reconcile_seats()]
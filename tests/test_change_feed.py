@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+import time
+
+from database import parse_changes
+from session import Session
+
+
+def notification(table, op, rows):
+    return json.dumps({'table': table, 'op': op, 'rows': rows})
+
+
+def test_parse_changes_merges_runs_of_the_same_table_and_op():
+    changes = parse_changes([
+        notification('course', 'update', [{'course_id': 1}]),
+        notification('course', 'update', [{'course_id': 2}]),
+        notification('course', 'delete', [{'course_id': 3}]),
+        notification('course', 'update', [{'course_id': 4}]),
+    ])
+    assert changes == [
+        {'table': 'course', 'op': 'update', 'rows': [{'course_id': 1}, {'course_id': 2}]},
+        {'table': 'course', 'op': 'delete', 'rows': [{'course_id': 3}]},
+        {'table': 'course', 'op': 'update', 'rows': [{'course_id': 4}]},
+    ]
+
+
+def test_parse_changes_reload_wins_and_bad_payloads_are_skipped():
+    changes = parse_changes([
+        notification('enrolls_in', 'insert', [{'student_id': 1}]),
+        'not json',
+        json.dumps({'op': 'insert'}),
+        notification('enrolls_in', 'insert', None),
+        notification('enrolls_in', 'insert', [{'student_id': 2}]),
+    ])
+    assert changes == [{'table': 'enrolls_in', 'op': 'insert', 'rows': None}]
+
+
+def test_dispatch_keeps_caches_in_step_and_isolates_subscribers(db, university):
+    departments = db.get_all_departments()
+    session = Session(db, db.authenticate_user(f"s0_{university['tag']}", 'pw'))
+    seen = []
+
+    def broken(change):
+        raise RuntimeError('subscriber bug')
+
+    db._subscribers.setdefault('department', []).extend([broken, seen.append])
+    try:
+        db._dispatch([
+            {'table': 'department', 'op': 'update', 'rows': [{'department_id': university['department_id']}]},
+            {'table': 'user', 'op': 'update', 'rows': [{'user_id': session['user_id']}]},
+        ])
+    finally:
+        db._subscribers['department'].remove(broken)
+        db._subscribers['department'].remove(seen.append)
+    assert [change['op'] for change in seen] == ['update']
+    assert session._stale
+    misses = db.cache_stats()['misses']
+    assert db.get_all_departments() == departments
+    assert db.cache_stats()['misses'] == misses + 1
+
+
+def wait_for(event, touch, timeout=10):
+    """Repeat touch() until event is set; the listener may still be starting up"""
+    deadline = time.monotonic() + timeout
+    while not event.is_set() and time.monotonic() < deadline:
+        touch()
+        event.wait(0.2)
+    return event.is_set()
+
+
+def test_committed_changes_reach_subscribers(db_config, university):
+    from database import Database
+    db = Database(maxconn=2, config=db_config)
+    department_id = university['department_id']
+    received = threading.Event()
+    db.subscribe('department', lambda change: change['rows'] and any(
+        row['department_id'] == department_id for row in change['rows']) and received.set())
+    try:
+        assert wait_for(received, lambda: db.update_department(department_id, f"Live {university['tag']}"))
+    finally:
+        db.disconnect()
+
+
+def test_committed_changes_reach_async_subscribers(db_config, university):
+    from async_database import AsyncDatabase
+    department_id = university['department_id']
+
+    async def run():
+        db = await AsyncDatabase.create(maxconn=2, config=db_config)
+        received = asyncio.Event()
+        await db.subscribe('department', lambda change: change['rows'] and any(
+            row['department_id'] == department_id for row in change['rows']) and received.set())
+        try:
+            for _ in range(50):
+                await db.update_department(department_id, f"Live {university['tag']}")
+                try:
+                    await asyncio.wait_for(received.wait(), 0.2)
+                    return True
+                except asyncio.TimeoutError:
+                    pass
+            return False
+        finally:
+            await db.disconnect()
+
+    assert asyncio.run(run())
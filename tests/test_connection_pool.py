@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from connection_pool import ConnectionPool, PoolTimeout
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        ConnectionPool(2, 1)
+    with pytest.raises(ValueError):
+        ConnectionPool(0, 0)
+
+
+def test_checkout_reuses_returned_connection(db_config):
+    pool = ConnectionPool(0, 2, **db_config)
+    try:
+        conn = pool.getconn()
+        assert pool.stats()['in_use'] == 1
+        pool.putconn(conn)
+        assert pool.getconn() is conn
+        pool.putconn(conn)
+        stats = pool.stats()
+        assert (stats['created'], stats['checkouts'], stats['checkins'], stats['idle']) == (1, 2, 2, 1)
+    finally:
+        pool.closeall()
+
+
+def test_checkout_times_out_when_exhausted(db_config):
+    pool = ConnectionPool(1, 1, **db_config)
+    try:
+        conn = pool.getconn()
+        with pytest.raises(PoolTimeout):
+            pool.getconn(timeout=0.05)
+        assert pool.stats()['timeouts'] == 1
+        pool.putconn(conn)
+    finally:
+        pool.closeall()
+
+
+def test_waiting_checkout_gets_the_returned_connection(db_config):
+    pool = ConnectionPool(1, 1, **db_config)
+    try:
+        conn = pool.getconn()
+        received = []
+        waiter = threading.Thread(target=lambda: received.append(pool.getconn(timeout=5)))
+        waiter.start()
+        timer = threading.Timer(0.1, pool.putconn, (conn,))
+        timer.start()
+        waiter.join(5)
+        assert received == [conn]
+        assert pool.stats()['waits'] == 1
+        pool.putconn(conn)
+    finally:
+        pool.closeall()
+
+
+def test_discarded_connection_frees_its_slot(db_config):
+    pool = ConnectionPool(0, 1, **db_config)
+    try:
+        conn = pool.getconn()
+        pool.putconn(conn, discard=True)
+        assert conn.closed
+        replacement = pool.getconn(timeout=1)
+        assert replacement is not conn
+        pool.putconn(replacement)
+        assert pool.stats()['discarded'] == 1
+    finally:
+        pool.closeall()
@@ -0,0 +1,22 @@
+from database import student_dashboard_query
+
+
+def test_student_dashboard_query_params_follow_placeholders():
+    query, params = student_dashboard_query(42, '2024-10-01', 25)
+    assert query.count('%s') == len(params)
+    assert params[:3] == ['2024-10-01', '2024-10-01', 42]
+    assert params[3] == 42 and params[-1] == 26
+    assert "'available' AS tab" in query and "'enrolled'" in query
+
+
+def test_dashboard_matches_the_separate_queries(db, university):
+    student = university['student_ids'][0]
+    for course_id in university['course_ids'][:2]:
+        assert db.try_enroll(student, course_id)[0] == 'enrolled'
+
+    available, (enrolled, after) = db.get_student_dashboard(student, limit=1)
+    enrolled_ids = set(university['course_ids'][:2])
+    assert sorted(available) == sorted(row for row in db.get_all_offered_courses_for_student(student)
+                                       if row[0] not in enrolled_ids)
+    assert (enrolled, after) == db.get_student_courses_page(student, limit=1)
+    assert after is not None
@@ -0,0 +1,63 @@
+"""enroll_student() reasons, through try_enroll and enroll_student on both backends"""
+import pytest
+
+
+@pytest.fixture
+def courses(university, sql):
+    """Courses that fail one enrollment rule each, next to university's open Bachelor Musts"""
+    tag, department_id = university['tag'], university['department_id']
+    other_department = sql("INSERT INTO department (department_name) VALUES (%s) RETURNING department_id",
+                           (f"Other {tag}",))[0][0]
+    ended_semester = sql(
+        "INSERT INTO semester (semester_name, year, start_date, end_date) "
+        "VALUES (%s, 2000, '2000-01-01', '2000-06-01') RETURNING semester_id", (f"Old {tag}",))[0][0]
+
+    def course(code, level, type_, department, semester_id=None):
+        course_id = sql(
+            "INSERT INTO course (course_name, course_code, credits, ects, level, type, department_id) "
+            "VALUES (%s, %s, 3, 5, %s, %s, %s) RETURNING course_id", (code, f"{tag}-{code}", level, type_, department)
+        )[0][0]
+        if semester_id:
+            sql("INSERT INTO course_offering (course_id, semester_id, instructor_id) VALUES (%s, %s, %s)",
+                (course_id, semester_id, university['teacher_id']))
+        return course_id
+
+    current = university['semester_id']
+    return {
+        'master': course('M', 'Master', 'Must', department_id, current),
+        'other_must': course('OM', 'Bachelor', 'Must', other_department, current),
+        'other_elective': course('OE', 'Bachelor', 'Elective', other_department, current),
+        'never_offered': course('N', 'Bachelor', 'Must', department_id),
+        'ended': course('E', 'Bachelor', 'Must', department_id, ended_semester),
+    }
+
+
+def test_enrollment_reasons(db, university, courses):
+    student = university['student_ids'][0]
+    course_id = university['course_ids'][0]
+    assert db.try_enroll(0, course_id) == ('student_not_found', None)
+    assert db.try_enroll(student, 0) == ('course_not_found', 'Bachelor')
+    assert db.try_enroll(student, courses['master']) == ('level_mismatch', 'Bachelor')
+    assert db.try_enroll(student, courses['other_must']) == ('department_restricted', 'Bachelor')
+    assert db.try_enroll(student, courses['never_offered']) == ('not_offered', 'Bachelor')
+    assert db.try_enroll(student, courses['ended']) == ('semester_ended', 'Bachelor')
+    assert db.try_enroll(student, courses['other_elective']) == ('enrolled', 'Bachelor')
+    assert db.try_enroll(student, course_id) == ('enrolled', 'Bachelor')
+    assert db.try_enroll(student, course_id) == ('already_enrolled', 'Bachelor')
+    assert {row[0] for row in db.get_student_courses(student)} == {course_id, courses['other_elective']}
+
+
+def test_enroll_student_messages(db, university, courses):
+    student = university['student_ids'][0]
+    assert db.enroll_student(student, courses['master']) == (False, "You can only enroll in Bachelor level courses.")
+    assert db.enroll_student(student, courses['ended']) == (False, "Cannot enroll in previous semester courses.")
+    assert db.enroll_student(student, university['course_ids'][0]) == (True, "Successfully enrolled in course")
+
+
+def test_drop_course(db, university):
+    student, course_id = university['student_ids'][0], university['course_ids'][0]
+    assert db.try_enroll(student, course_id)[0] == 'enrolled'
+    assert db.is_student_enrolled(student, course_id)
+    assert db.drop_course(student, course_id)
+    assert not db.drop_course(student, course_id)
+    assert not db.is_student_enrolled(student, course_id)
@@ -0,0 +1,63 @@
+"""import_users on both backends: staged with COPY, validated in SQL"""
+
+
+def person(username, role='student', **fields):
+    record = {'username': username, 'password': 'pw', 'role': role, 'first_name': 'Im', 'last_name': 'Port'}
+    if role in ('student', 'teacher'):
+        record.update(email=f"{username}@example.com", department=fields.pop('department'))
+    if role == 'student':
+        record.update(student_number=username, level='Bachelor')
+    record.update(fields)
+    return record
+
+
+def test_conflicting_rows_are_skipped_and_reported(db, university):
+    tag = university['tag']
+    department = f"Dept {tag}"
+    result = db.import_users([
+        person(f"st_{tag}", department=department),
+        person(f"te_{tag}", 'teacher', department=department),
+        person(f"ad_{tag}", 'Admin'),
+        person(f"nopw_{tag}", 'admin', password=''),
+        person(f"role_{tag}", 'janitor'),
+        person(f"lvl_{tag}", department=department, level='PhD'),
+        person(f"dept_{tag}", department=f"Nowhere {tag}"),
+        person(f"st_{tag}", department=department, email=f"again_{tag}@example.com", student_number=f"again_{tag}"),
+        person(f"s0_{tag}", 'admin'),
+        person(f"mail_{tag}", department=department, email=f"s1_{tag}@example.com"),
+        person(f"num_{tag}", department=department, student_number=f"2{tag}"),
+    ])
+    assert result['error'] is None
+    assert result['imported'] == 3
+    assert [(line_no, reason) for line_no, _, reason in result['conflicts']] == [
+        (4, 'missing_field'), (5, 'invalid_role'), (6, 'invalid_level'), (7, 'unknown_department'),
+        (8, 'duplicate_in_file'), (9, 'username_exists'), (10, 'email_exists'), (11, 'student_number_exists'),
+    ]
+    user = db.authenticate_user(f"st_{tag}", 'pw')
+    assert db.get_student(user[0]) is not None
+    assert db.authenticate_user(f"ad_{tag}", 'pw')[3] == 'admin'
+    assert db.get_user(f"role_{tag}") is None
+
+
+def test_csv_file_line_numbers_count_the_header(db, university, tmp_path):
+    tag = university['tag']
+    path = tmp_path / 'users.csv'
+    path.write_text(
+        "username,password,role,first_name,last_name,email,department,student_number,level\n"
+        f"csv1_{tag},pw,admin,Im,Port,,,,\n"
+        f"csv2_{tag},,admin,Im,Port,,,,\n"
+    )
+    result = db.import_users(str(path))
+    assert result['imported'] == 1
+    assert result['conflicts'] == [(3, f"csv2_{tag}", 'missing_field')]
+
+
+def test_copy_error_rolls_back_the_whole_import(db, university):
+    tag = university['tag']
+    result = db.import_users([
+        person(f"ok_{tag}", 'admin'),
+        person(f"long_{tag}" + 'x' * 60, 'admin'),   # wider than user_import.username
+    ])
+    assert result['imported'] == 0 and result['conflicts'] == []
+    assert result['error']
+    assert db.get_user(f"ok_{tag}") is None
@@ -0,0 +1,73 @@
+import pytest
+
+from migrate import split_statements
+
+
+def test_split_statements_on_top_level_semicolons():
+    assert split_statements("CREATE TABLE a (id int);\nINSERT INTO a VALUES (1);\n") == [
+        "CREATE TABLE a (id int)", "INSERT INTO a VALUES (1)",
+    ]
+
+
+def test_split_statements_ignores_semicolons_in_quotes_and_comments():
+    sql = """
+    -- a comment; not a statement
+    INSERT INTO t VALUES ('a;b', 'it''s; fine');
+    /* block; comment */
+    SELECT "odd;name" FROM t;
+    """
+    statements = split_statements(sql)
+    assert len(statements) == 2
+    assert statements[0].endswith("INSERT INTO t VALUES ('a;b', 'it''s; fine')")
+    assert statements[1].endswith('SELECT "odd;name" FROM t')
+
+
+def test_split_statements_keeps_dollar_quoted_bodies_whole():
+    sql = """
+    CREATE FUNCTION f() RETURNS void LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM 1;
+        RAISE NOTICE 'x;y';
+    END;
+    $$;
+    DO $body$ BEGIN PERFORM 2; END $body$;
+    """
+    statements = split_statements(sql)
+    assert len(statements) == 2
+    assert statements[0].startswith("CREATE FUNCTION f()") and statements[0].endswith("$$")
+    assert statements[1] == "DO $body$ BEGIN PERFORM 2; END $body$"
+
+
+def test_split_statements_drops_comment_only_chunks():
+    assert split_statements("-- nothing here\n;\n  ;SELECT 1") == ["SELECT 1"]
+
+
+def test_enrollments_without_an_offering_stop_the_offering_migration(db_config):
+    import psycopg2
+    import datagen
+    import migrate
+    dbname = db_config['dbname'] + '_orphans'
+    admin = psycopg2.connect(**datagen.database_config('postgres'))
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{dbname}"')
+        datagen.create_database(dbname)
+        conn = psycopg2.connect(**datagen.database_config(dbname))
+        try:
+            migrate.migrate(conn, target=5)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO course (course_name, course_code, credits, ects, level, type, department_id) "
+                    "VALUES ('Never Offered', 'NOPE1', 3, 5, 'Bachelor', 'Must', 1) RETURNING course_id")
+                cursor.execute("INSERT INTO enrolls_in (student_id, course_id) VALUES (1, %s)", (cursor.fetchone()[0],))
+            conn.commit()
+            with pytest.raises(psycopg2.Error, match=r"1 enrollment\(s\) are in courses that were never offered \(NOPE1\)"):
+                migrate.migrate(conn)
+            assert max(migrate.applied_versions(conn)) == 5
+        finally:
+            conn.close()
+    finally:
+        with admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{dbname}"')
+        admin.close()
@@ -0,0 +1,86 @@
+import pytest
+
+from database import COURSE_PAGE_SORTS, STUDENT_COURSE_KEYSET, page_query, page_result, sort_keyset
+
+
+def test_sort_keyset_adds_primary_key_as_tie_breaker():
+    assert sort_keyset(COURSE_PAGE_SORTS, 'course_name', True, ('c.course_id', 0)) == [
+        ('c.course_name', 1, True), ('c.course_id', 0, True),
+    ]
+    assert sort_keyset(COURSE_PAGE_SORTS, 'course_id', False, ('c.course_id', 0)) == [('c.course_id', 0, False)]
+
+
+def test_sort_keyset_rejects_unknown_sort():
+    with pytest.raises(ValueError):
+        sort_keyset(COURSE_PAGE_SORTS, 'credits; DROP TABLE course', False, ('c.course_id', 0))
+
+
+def test_page_query_first_page():
+    keyset = [('c.course_code', 2, False), ('c.course_id', 0, False)]
+    query, params = page_query("SELECT * FROM course c", ["c.level = %s"], ['Bachelor'], keyset, None, 20)
+    assert query == ("SELECT * FROM course c WHERE c.level = %s "
+                     "ORDER BY c.course_code ASC, c.course_id ASC LIMIT %s")
+    assert params == ['Bachelor', 21]
+
+
+def test_page_query_uses_row_comparison_for_one_direction():
+    keyset = [('c.course_code', 2, True), ('c.course_id', 0, True)]
+    query, params = page_query("SELECT * FROM course c", [], [], keyset, ('CS101', 7), 10)
+    assert "WHERE (c.course_code, c.course_id) < (%s, %s)" in query
+    assert params == ['CS101', 7, 11]
+
+
+def test_page_query_expands_mixed_directions():
+    query, params = page_query("SELECT 1", [], [], STUDENT_COURSE_KEYSET, (2024, 'Fall', 3), 5)
+    assert ("WHERE ((s.year < %s) OR (s.year = %s AND s.semester_name > %s) "
+            "OR (s.year = %s AND s.semester_name = %s AND c.course_id > %s))") in query
+    assert params == [2024, 2024, 'Fall', 2024, 'Fall', 3, 6]
+
+
+def test_page_query_rejects_foreign_cursor():
+    with pytest.raises(ValueError):
+        page_query("SELECT 1", [], [], STUDENT_COURSE_KEYSET, (2024,), 5)
+
+
+def test_page_result():
+    keyset = [('c.course_code', 2, False), ('c.course_id', 0, False)]
+    rows = [(1, 'A', 'A1'), (2, 'B', 'B1'), (3, 'C', 'C1')]
+    assert page_result(rows, keyset, 3) == (rows, None)
+    assert page_result(rows, keyset, 2) == (rows[:2], ('B1', 2))
+
+
+def test_pagination(db, university):
+    department_id = university['department_id']
+    everything, after = db.get_courses_page(department_id=department_id, limit=100)
+    assert after is None
+    assert [row[0] for row in everything] == university['course_ids']   # codes sort like the ids
+
+    pages, after = [], None
+    while True:
+        rows, after = db.get_courses_page(after=after, limit=2, department_id=department_id)
+        pages.append(rows)
+        if after is None:
+            break
+    assert [len(rows) for rows in pages] == [2, 2, 1]
+    assert [row for rows in pages for row in rows] == everything
+
+    rows, after = db.get_courses_page(limit=2, order_by='course_code', descending=True, department_id=department_id)
+    assert [row[0] for row in rows] == university['course_ids'][:-3:-1]
+    assert after is not None
+
+
+def test_users_and_student_courses_pages(db, university):
+    tag = university['tag']
+    rows, after = db.get_users_page(role='student', search=tag, limit=2)
+    assert [row[1] for row in rows] == [f"s0_{tag}", f"s1_{tag}"] and after is not None
+    rows, after = db.get_users_page(after=after, role='student', search=tag, limit=2)
+    assert [row[1] for row in rows] == [f"s2_{tag}"] and after is None
+
+    student = university['student_ids'][0]
+    for course_id in university['course_ids'][:3]:
+        assert db.try_enroll(student, course_id)[0] == 'enrolled'
+    first, after = db.get_student_courses_page(student, limit=2)
+    rest, last = db.get_student_courses_page(student, after=after, limit=2)
+    assert last is None
+    assert [row[0] for row in first + rest] == university['course_ids'][:3]
+    assert sorted(first + rest) == sorted(db.get_student_courses(student))
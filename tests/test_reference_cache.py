@@ -0,0 +1,80 @@
+import asyncio
+
+from reference_cache import ReferenceCache
+
+
+def test_hit_after_miss():
+    cache = ReferenceCache()
+    loads = []
+    loader = lambda: loads.append(1) or ['row']
+    assert cache.get(('department', 'all'), loader) == ['row']
+    assert cache.get(('department', 'all'), loader) == ['row']
+    assert len(loads) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size'], stats['hit_ratio']) == (1, 1, 1, 0.5)
+
+
+def test_failed_load_is_not_cached():
+    cache = ReferenceCache()
+    assert cache.get(('semester', 'all'), lambda: None) is None
+    assert cache.get(('semester', 'all'), lambda: ['row']) == ['row']
+    assert cache.stats()['misses'] == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = ReferenceCache(ttl=0)
+    cache.get(('semester', 'all'), lambda: 'old')
+    assert cache.get(('semester', 'all'), lambda: 'new') == 'new'
+    assert cache.stats()['expirations'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ReferenceCache(maxsize=2)
+    cache.get(('department', 1), lambda: 'a')
+    cache.get(('department', 2), lambda: 'b')
+    cache.get(('department', 1), lambda: 'unused')
+    cache.get(('department', 3), lambda: 'c')
+    assert cache.get(('department', 1), lambda: 'unused') == 'a'
+    assert cache.get(('department', 2), lambda: 'reloaded') == 'reloaded'
+    assert cache.stats()['evictions'] == 2
+
+
+def test_invalidate_by_table():
+    cache = ReferenceCache()
+    cache.get(('department', 'all'), lambda: 'departments')
+    cache.get(('semester', 'all'), lambda: 'semesters')
+    cache.invalidate('department')
+    assert cache.get(('department', 'all'), lambda: 'reloaded') == 'reloaded'
+    assert cache.get(('semester', 'all'), lambda: 'unused') == 'semesters'
+    cache.invalidate()
+    assert cache.stats()['size'] == 0
+
+
+def test_get_async_awaits_loader():
+    cache = ReferenceCache()
+
+    async def load():
+        return 'departments'
+
+    async def lookups():
+        first = await cache.get_async(('department', 'all'), load)
+        second = await cache.get_async(('department', 'all'), load)
+        return first, second
+
+    assert asyncio.run(lookups()) == ('departments', 'departments')
+    assert cache.stats()['hits'] == 1
+
+
+def test_reference_data_is_cached_and_invalidated(db, university):
+    departments = db.get_all_departments()
+    assert university['department_id'] in [row[0] for row in departments]
+    hits = db.cache_stats()['hits']
+    assert db.get_all_departments() == departments
+    assert db.cache_stats()['hits'] == hits + 1
+
+    db.update_department(university['department_id'], f"Renamed {university['tag']}")
+    names = {row[0]: row[1] for row in db.get_all_departments()}
+    assert names[university['department_id']] == f"Renamed {university['tag']}"
+
+    current = db.get_current_semester()
+    assert current is not None and db.get_current_semester() == current
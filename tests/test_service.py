@@ -0,0 +1,104 @@
+import pytest
+
+from service import CourseService, ServiceError
+
+
+class FakeSession(dict):
+    """What check_access reads from a Session, without the database lookups"""
+
+    def __init__(self, role, user_id=1, student_id=None, teacher_id=None, department_id=None):
+        super().__init__(user_id=user_id, role=role)
+        self.student_id = student_id
+        self.teacher_id = teacher_id
+        self.department_id = department_id
+
+
+class FakeDatabase:
+    """The lookups check_access makes: offering 10 is taught by teacher 5,
+    course 20 belongs to department 3"""
+
+    def subscribe(self, table, callback):
+        pass
+
+    def get_course_offering_by_id(self, offering_id):
+        return (10, 'Name', 'CODE', 'Fall', 2024, 'Dept', 'Ins Tructor', 20, 1, 5) if offering_id == 10 else None
+
+    def get_courses_page(self, department_id=None, ids=None):
+        return ([(20,)] if department_id == 3 and ids == [20] else []), None
+
+
+@pytest.fixture
+def service():
+    return CourseService(FakeDatabase())
+
+
+STUDENT = FakeSession('student', user_id=7, student_id=70)
+TEACHER = FakeSession('teacher', user_id=8, teacher_id=5, department_id=3)
+ADMIN = FakeSession('admin')
+
+
+def test_role_check(service):
+    service.check_access(ADMIN, 'delete_user', [1], {})
+    with pytest.raises(ServiceError) as e:
+        service.check_access(STUDENT, 'delete_user', [1], {})
+    assert e.value.status == 403
+
+
+def test_students_only_act_on_their_own_records(service):
+    service.check_access(STUDENT, 'try_enroll', [70, 20], {})
+    service.check_access(STUDENT, 'get_user_by_id', [7], {})
+    service.check_access(ADMIN, 'try_enroll', [71, 20], {})
+    for method, args in (('try_enroll', [71, 20]), ('get_user_by_id', [8]), ('get_waitlist', [])):
+        with pytest.raises(ServiceError):
+            service.check_access(STUDENT, method, args, {})
+
+
+def test_teacher_creates_courses_as_themselves(service):
+    kwargs = {'creator_teacher_id': 99}
+    service.check_access(TEACHER, 'create_course', ['Name', 'CODE', 3, 5, 'Bachelor', 'Must', 3], kwargs)
+    assert kwargs['creator_teacher_id'] == 5
+
+
+def test_teacher_changes_only_their_own_offerings(service):
+    service.check_access(TEACHER, 'set_offering_capacity', [10, 30], {})
+    with pytest.raises(ServiceError):
+        service.check_access(TEACHER, 'set_offering_capacity', [11, 30], {})
+    with pytest.raises(ServiceError):
+        service.check_access(TEACHER, 'delete_course_offering', [], {})
+
+
+def test_teacher_cannot_move_an_offering_to_another_course(service):
+    service.check_access(TEACHER, 'update_course_offering', [10, 20, 1, 5], {})
+    service.check_access(ADMIN, 'update_course_offering', [10, 21, 1, 5], {})
+    with pytest.raises(ServiceError) as e:
+        service.check_access(TEACHER, 'update_course_offering', [10, 21, 1, 5], {})
+    assert e.value.status == 403
+
+
+def test_teacher_updates_only_their_department_courses(service):
+    service.check_access(TEACHER, 'update_course', [20, {'department_id': 3}], {})
+    service.check_access(TEACHER, 'update_course', [], {'course_id': 20, 'course_data': {'department_id': 3}})
+    with pytest.raises(ServiceError):
+        service.check_access(TEACHER, 'update_course', [21, {'department_id': 3}], {})
+    with pytest.raises(ServiceError):
+        service.check_access(TEACHER, 'update_course', [20, {'department_id': 4}], {})
+
+
+def test_visible_changes(service):
+    changes = [
+        {'table': 'enrolls_in', 'op': 'insert', 'rows': [
+            {'student_id': 70, 'course_id': 20, 'offering_id': 10},
+            {'student_id': 71, 'course_id': 20, 'offering_id': 10},
+        ]},
+        {'table': 'user', 'op': 'update', 'rows': [{'user_id': 8}]},
+        {'table': 'course', 'op': 'update', 'rows': [{'course_id': 20}]},
+    ]
+    assert service.visible_changes(ADMIN, changes) is changes
+    assert service.visible_changes(STUDENT, changes) == [
+        {'table': 'enrolls_in', 'op': 'insert', 'rows': [
+            {'student_id': 70, 'course_id': 20, 'offering_id': 10},
+            {'student_id': None, 'course_id': 20, 'offering_id': 10},
+        ]},
+        {'table': 'course', 'op': 'update', 'rows': [{'course_id': 20}]},
+    ]
+    assert service.visible_changes(STUDENT, None) is None
@@ -0,0 +1,15 @@
+from service_client import _from_json
+
+
+def test_rows_become_tuples_and_lists_of_rows_stay_lists():
+    assert _from_json([1, 'CS101', None]) == (1, 'CS101', None)
+    assert _from_json([[1, 'a'], [2, 'b']]) == [(1, 'a'), (2, 'b')]
+    assert _from_json([]) == []
+
+
+def test_nested_values():
+    assert _from_json([[[1, 'a']], None]) == ([(1, 'a')], None)
+    assert _from_json({'imported': 2, 'conflicts': [[3, 'bob', 'duplicate']]}) == {
+        'imported': 2, 'conflicts': [(3, 'bob', 'duplicate')],
+    }
+    assert _from_json('text') == 'text'
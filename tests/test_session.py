@@ -0,0 +1,27 @@
+from session import Session
+
+
+def test_profile_is_resolved_at_login(db, university):
+    tag = university['tag']
+    student = Session(db, db.authenticate_user(f"s1_{tag}", 'pw'))
+    assert student['full_name'] == 'Stu Dent' and student['role'] == 'student'
+    assert student.student_id == university['student_ids'][1] and student.teacher_id is None
+    assert student.department_id == university['department_id']
+    assert student.department_name == f"Dept {tag}" and student.level == 'Bachelor'
+
+    teacher = Session(db, db.authenticate_user(f"t_{tag}", 'pw'))
+    assert teacher.teacher_id == university['teacher_id'] and teacher.student_id is None
+    assert teacher.department_id == university['department_id'] and teacher.level is None
+
+
+def test_update_user_invalidates_session(db, university):
+    user = db.authenticate_user(f"s0_{university['tag']}", 'pw')
+    session = Session(db, user)
+    assert session.student_id == university['student_ids'][0]
+
+    assert db.update_user(user[0], user[1], first_name='Renamed')
+    assert session._stale
+    assert session.profile is not None and session['full_name'] == 'Renamed Dent'
+
+    assert db.delete_user(user[0])
+    assert session.student_id is None
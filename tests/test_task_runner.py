@@ -0,0 +1,91 @@
+import threading
+import time
+
+from gui.task_runner import TaskRunner
+
+
+class FakeRoot:
+    """after() without a Tk event loop; tests drive TaskRunner._poll themselves"""
+
+    def after(self, delay, callback):
+        return 'poll'
+
+    def after_cancel(self, poll_id):
+        pass
+
+
+def drain(runner, count):
+    """Wait for count results to be handed back, then poll once"""
+    deadline = time.monotonic() + 5
+    while runner._results.qsize() < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    runner._poll()
+
+
+def test_results_are_delivered_on_poll():
+    runner = TaskRunner(FakeRoot())
+    busy, results, errors = [], [], []
+    runner.add_busy_listener(busy.append)
+    runner.submit(lambda a, b: a + b, 1, 2, on_success=results.append)
+    runner.submit(lambda: 1 / 0, on_success=results.append, on_error=errors.append)
+    assert runner.is_busy()
+    drain(runner, 2)
+    assert results == [3]
+    assert isinstance(errors[0], ZeroDivisionError)
+    assert busy == [True, False] and not runner.is_busy()
+    runner.shutdown()
+
+
+def test_queued_task_superseded_by_key_is_cancelled():
+    runner = TaskRunner(FakeRoot(), max_workers=1)
+    release = threading.Event()
+    results = []
+    runner.submit(release.wait)    # keeps the only worker busy
+    runner.submit(lambda: 'first', key='refresh', on_success=results.append)
+    runner.submit(lambda: 'second', key='refresh', on_success=results.append)
+    release.set()
+    drain(runner, 2)
+    assert results == ['second']
+    assert not runner.is_busy()
+    runner.shutdown()
+
+
+def test_started_task_superseded_by_key_is_dropped():
+    runner = TaskRunner(FakeRoot())
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait()
+        return 'stale'
+
+    runner.submit(slow, key='refresh', on_success=results.append)
+    started.wait(5)
+    runner.submit(lambda: 'fresh', key='refresh', on_success=results.append)
+    release.set()
+    drain(runner, 2)
+    assert results == ['fresh']
+    assert not runner.is_busy()
+    runner.shutdown()
+
+
+def test_cancel_drops_result():
+    runner = TaskRunner(FakeRoot())
+    results = []
+    runner.submit(lambda: 'value', key='details', on_success=results.append)
+    runner.cancel('details')
+    runner.executor.shutdown(wait=True)
+    runner._poll()
+    assert results == [] and not runner.is_busy()
+    runner.shutdown()
+
+
+def test_call_soon_runs_on_poll():
+    runner = TaskRunner(FakeRoot())
+    calls = []
+    runner.call_soon(calls.append, 'change')
+    assert calls == []
+    runner._poll()
+    assert calls == ['change']
+    runner.shutdown()
@@ -0,0 +1,67 @@
+from gui.tree_sync import append_rows, sync_tree
+
+
+class FakeTree:
+    """The flat ttk.Treeview calls sync_tree makes, recorded"""
+
+    def __init__(self):
+        self.order = []
+        self.values = {}
+        self.calls = []
+
+    def get_children(self):
+        return tuple(self.order)
+
+    def insert(self, parent, index, iid, values, tags):
+        self.calls.append(('insert', iid))
+        self.order.insert(index, iid)
+        self.values[iid] = values
+
+    def delete(self, iid):
+        self.calls.append(('delete', iid))
+        self.order.remove(iid)
+        del self.values[iid]
+
+    def item(self, iid, values, tags):
+        self.calls.append(('item', iid))
+        self.values[iid] = values
+
+    def move(self, iid, parent, index):
+        self.calls.append(('move', iid))
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def rows(self):
+        return [self.values[iid] for iid in self.order]
+
+
+def test_fill_and_unchanged_rows_cost_no_calls():
+    tree = FakeTree()
+    rows = [(1, 'a'), (2, 'b'), (3, 'c')]
+    sync_tree(tree, rows)
+    assert tree.rows() == rows and tree.order == ['1', '2', '3']
+    tree.calls.clear()
+    sync_tree(tree, list(rows))
+    assert tree.calls == []
+
+
+def test_only_changed_items_are_touched():
+    tree = FakeTree()
+    sync_tree(tree, [(1, 'a'), (2, 'b'), (3, 'c')])
+    tree.calls.clear()
+    sync_tree(tree, [(3, 'c'), (1, 'A'), (4, 'd')])
+    assert tree.rows() == [(3, 'c'), (1, 'A'), (4, 'd')]
+    assert sorted(tree.calls) == [('delete', '2'), ('insert', '4'), ('item', '1'), ('move', '3')]
+
+
+def test_duplicate_keys_get_their_own_items():
+    tree = FakeTree()
+    sync_tree(tree, [(1, 'a'), (1, 'b')])
+    assert tree.order == ['1', '1#1']
+
+
+def test_key_and_append_rows():
+    tree = FakeTree()
+    sync_tree(tree, [('x', 1)], key=lambda row: row[1])
+    append_rows(tree, [('y', 2)], key=lambda row: row[1])
+    assert tree.order == ['1', '2'] and tree.rows() == [('x', 1), ('y', 2)]
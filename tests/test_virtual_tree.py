@@ -0,0 +1,47 @@
+from gui.virtual_tree import ListRowSource, PagedRowSource
+
+
+def pages(total):
+    """fetch_page over rows (0,) .. (total - 1,), recording each call's cursor"""
+    calls = []
+
+    def fetch_page(after, limit, order_by, descending):
+        calls.append(after)
+        start = 0 if after is None else after[0] + 1
+        rows = [(i,) for i in range(start, min(start + limit, total))]
+        return rows, ((rows[-1][0],) if start + limit < total else None)
+
+    return fetch_page, calls
+
+
+def test_rows_and_count_never_fetch():
+    fetch_page, calls = pages(10)
+    source = PagedRowSource(fetch_page, page_size=4)
+    assert source.rows(0, 4) == [] and source.count() == 4
+    assert source.needs(1) and calls == []
+
+
+def test_pages_are_added_in_order_until_complete():
+    fetch_page, calls = pages(10)
+    source = PagedRowSource(fetch_page, page_size=4)
+    source.load(5)
+    assert calls == [None, (3,)] and source.count() == 8 + 4
+    assert not source.needs(8) and source.needs(9)
+    source.load(100)
+    assert source.is_complete() and source.count() == 10
+    assert source.rows(8, 12) == [(8,), (9,)]
+
+
+def test_stale_pages_are_ignored():
+    fetch_page, calls = pages(10)
+    source = PagedRowSource(fetch_page, sort_keys={'id': 'id'}, page_size=4)
+    first = source.fetch_next()
+    duplicate = source.fetch_next()
+    assert source.add_page(first) and not source.add_page(duplicate)
+    before_sort = source.fetch_next()
+    source.sort(0, 'id', True)
+    assert not source.add_page(before_sort) and source.rows(0, 10) == []
+
+
+def test_list_source_needs_nothing():
+    assert not ListRowSource([(1,)]).needs(100)
@@ -0,0 +1,52 @@
+"""Waitlists and promotion into freed seats (migration 010) on both backends"""
+
+
+def test_waitlist(db, university, sql):
+    first, second, third = university['student_ids']
+    course_id, offering_id = university['course_ids'][0], university['offering_ids'][0]
+    assert db.set_offering_capacity(offering_id, 1)[0]
+    assert db.try_enroll(first, course_id)[0] == 'enrolled'
+
+    assert db.join_waitlist(second, course_id) == ('waitlisted', 'Bachelor', 1)
+    assert db.join_waitlist(third, course_id) == ('waitlisted', 'Bachelor', 2)
+    assert db.join_waitlist(third, course_id) == ('already_waitlisted', 'Bachelor', 2)
+    assert db.join_waitlist(first, course_id) == ('already_enrolled', 'Bachelor', None)
+    assert [row[0] for row in db.get_waitlist(third)] == [course_id]
+
+    assert db.drop_course(first, course_id)
+    assert db.is_student_enrolled(second, course_id)
+    assert db.get_waitlist_position(third, course_id) == 1
+
+    # Once the semester is over the queue is hidden, and dropped by the next promotion
+    sql("UPDATE semester SET end_date = CURRENT_DATE - 1 WHERE semester_id = %s", (university['semester_id'],))
+    assert db.get_waitlist_position(third, course_id) is None
+    assert db.get_waitlist(third) == []
+    assert db.drop_course(second, course_id)
+    assert sql("SELECT count(*) FROM waitlist WHERE offering_id = %s", (offering_id,)) == [(0,)]
+
+
+def test_seat_freed_by_cascading_delete_goes_to_the_waitlist(db, university, sql):
+    first, second, third = university['student_ids']
+    course_id, offering_id = university['course_ids'][0], university['offering_ids'][0]
+    assert db.set_offering_capacity(offering_id, 1)[0]
+    assert db.try_enroll(first, course_id)[0] == 'enrolled'
+    assert db.join_waitlist(second, course_id)[0] == 'waitlisted'
+
+    # Deleting the enrolled student's account cascades to enrolls_in
+    [(user_id,)] = sql("SELECT user_id FROM student WHERE student_id = %s", (first,))
+    assert db.delete_user(user_id)
+
+    assert db.is_student_enrolled(second, course_id)
+    assert db.try_enroll(third, course_id)[0] == 'offering_full'
+
+
+def test_raised_capacity_goes_to_the_waitlist(db, university):
+    first, second, third = university['student_ids']
+    course_id, offering_id = university['course_ids'][0], university['offering_ids'][0]
+    assert db.set_offering_capacity(offering_id, 1)[0]
+    assert db.try_enroll(first, course_id)[0] == 'enrolled'
+    assert db.join_waitlist(second, course_id)[0] == 'waitlisted'
+
+    assert db.set_offering_capacity(offering_id, 2)[0]
+    assert db.is_student_enrolled(second, course_id)
+    assert db.try_enroll(third, course_id)[0] == 'offering_full'